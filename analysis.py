@@ -0,0 +1,218 @@
+import json
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+
+import pandas as pd
+
+from incremental import VolumeDelta
+from savings import CATEGORIES, REPORT_COLUMNS
+
+# Keys used for each category in the summary and the email template.
+SUMMARY_KEYS = {
+    "available_volumes": "available_volumes",
+    "stopped_instance_volumes": "stopped_instance_volumes",
+    "zero_iops_volume": "zero_iops_volumes",
+    "gp2_volumes": "gp2_volumes",
+    "io1_volumes": "io1_volumes",
+    "io2_volumes": "io2_volumes",
+}
+
+
+def summarize(categories: dict) -> dict:
+    summary = dict()
+    for category, frame in categories.items():
+        summary[f"{SUMMARY_KEYS[category]}_count"] = len(frame)
+    for category, frame in categories.items():
+        summary[f"{SUMMARY_KEYS[category]}_size"] = (
+            round(float(frame["Size"].sum()), 2) if not frame.empty else 0
+        )
+    for category, frame in categories.items():
+        summary[f"{SUMMARY_KEYS[category]}_saving"] = (
+            round(float(frame["SavingsPossible"].sum()), 2) if not frame.empty else 0
+        )
+    summary["total_price_saved"] = round(
+        sum(float(frame["SavingsPossible"].sum()) for frame in categories.values()), 2
+    )
+    return summary
+
+
+@dataclass(frozen=True)
+class EBSAnalysis:
+    """Categorized volumes, savings and summary for one account and date.
+
+    Built once per (account, date) and shared by every output format.
+    """
+
+    account_id: str
+    date: str
+    categories: MappingProxyType
+    summary: MappingProxyType
+    # VolumeId -> ConfigHash of every volume seen, reported or not.
+    inventory: pd.DataFrame | None = None
+    delta: VolumeDelta | None = None
+
+    @classmethod
+    def from_categories(
+        cls,
+        account_id: str,
+        date: str,
+        categories: dict,
+        inventory: pd.DataFrame | None = None,
+        delta: VolumeDelta | None = None,
+    ):
+        categories = {
+            category: categories.get(category, pd.DataFrame(columns=REPORT_COLUMNS))
+            for category in CATEGORIES
+        }
+        summary = summarize(categories)
+        if delta is not None:
+            summary.update(delta.summary())
+        return cls(
+            account_id=account_id,
+            date=date,
+            categories=MappingProxyType(categories),
+            summary=MappingProxyType(summary),
+            inventory=inventory,
+            delta=delta,
+        )
+
+    def category(self, name: str) -> pd.DataFrame:
+        return self.categories[name]
+
+    def to_json(self, key: str | None = None) -> str:
+        return json.dumps(
+            {
+                "key": key,
+                "account_id": self.account_id,
+                "date": self.date,
+                "categories": {
+                    category: json.loads(
+                        frame[REPORT_COLUMNS].to_json(
+                            orient="split", index=False, date_format="iso"
+                        )
+                    )
+                    for category, frame in self.categories.items()
+                },
+                "inventory": (
+                    json.loads(self.inventory.to_json(orient="split", index=False))
+                    if self.inventory is not None
+                    else None
+                ),
+                "delta": self.delta.to_dict() if self.delta is not None else None,
+            }
+        )
+
+    @classmethod
+    def from_json(cls, data: str):
+        return cls.from_payload(json.loads(data))
+
+    @classmethod
+    def from_payload(cls, payload: dict):
+        # Analyses stored before a column was added load it as missing.
+        categories = {
+            category: pd.DataFrame(frame["data"], columns=frame["columns"]).reindex(
+                columns=REPORT_COLUMNS
+            )
+            for category, frame in payload["categories"].items()
+        }
+        inventory = payload.get("inventory")
+        delta = payload.get("delta")
+        return cls.from_categories(
+            payload["account_id"],
+            payload["date"],
+            categories,
+            inventory=(
+                pd.DataFrame(inventory["data"], columns=inventory["columns"])
+                if inventory is not None
+                else None
+            ),
+            delta=VolumeDelta.from_dict(delta) if delta is not None else None,
+        )
+
+
+class AnalysisCache:
+    """In-process and on-disk store of EBSAnalysis results per (account, date).
+
+    Each analysis is stored with the key of the inputs and options it was
+    built from (see ``EBSReport.analysis_key``) and only reused for the
+    same key. With ``persist=False`` stored analyses are still read, so a dry
+    run can diff against the previous day, but nothing is written or removed.
+    """
+
+    file_name = "ebs_analysis.json"
+
+    def __init__(self, persist: bool = True):
+        self.persist = persist
+        self._analyses = dict()
+        self._lock = threading.Lock()
+
+    def load(
+        self, account_id: str, date: str, key: str | None = None
+    ) -> EBSAnalysis | None:
+        """The stored analysis for ``key``; with no key, whichever is stored."""
+        with self._lock:
+            stored = self._analyses.get((account_id, date))
+        if stored is not None and key in (None, stored[0]):
+            return stored[1]
+
+        path = os.path.join(account_id, date, self.file_name)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as file:
+                payload = json.load(file)
+            if key is not None and payload.get("key") != key:
+                return None
+            analysis = EBSAnalysis.from_payload(payload)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # A damaged file is a cache miss; the next write replaces it.
+            print(f"Ignoring unreadable {path}: {e}")
+            return None
+        with self._lock:
+            self._analyses[(account_id, date)] = (payload.get("key"), analysis)
+        return analysis
+
+    def get_or_create(
+        self, account_id: str, date: str, analyze, key: str | None = None
+    ) -> EBSAnalysis:
+        analysis = self.load(account_id, date, key)
+        if analysis is not None:
+            return analysis
+
+        analysis = analyze()
+        if self.persist:
+            self._write(os.path.join(account_id, date, self.file_name), analysis, key)
+        with self._lock:
+            self._analyses[(account_id, date)] = (key, analysis)
+        return analysis
+
+    @staticmethod
+    def _write(path: str, analysis: EBSAnalysis, key: str | None):
+        # Written aside and renamed, so a crash or a concurrent run never
+        # leaves a truncated file behind.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            prefix=f"{os.path.basename(path)}.",
+            suffix=".tmp",
+            dir=os.path.dirname(path),
+        )
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write(analysis.to_json(key))
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def invalidate(self, account_id: str, date: str):
+        with self._lock:
+            self._analyses.pop((account_id, date), None)
+        path = os.path.join(account_id, date, self.file_name)
+        if self.persist and os.path.exists(path):
+            os.remove(path)
+
+
+analysis_cache = AnalysisCache()
@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from loaders import ATTACHMENT_COLUMNS, attachment_rows, iter_service_data
+
+
+class AttachmentIndex:
+    """Volume -> instance lookup over every instance of every reservation.
+
+    Multi-attached volumes list all their instances, with their states and
+    attach times in the same order, and only count as stopped when every one
+    of them is stopped.
+    """
+
+    def __init__(self, attachments: pd.DataFrame):
+        attachments = attachments.reindex(columns=ATTACHMENT_COLUMNS).fillna("")
+        stopped = attachments["InstanceState"] == "stopped"
+        attachments = attachments.assign(
+            Stopped=stopped,
+            # Unknown stop times sort as "just now", so they never count as
+            # stopped long ago.
+            StoppedAt=pd.to_datetime(
+                attachments["StoppedAt"].where(stopped), utc=True, errors="coerce"
+            ).fillna(pd.Timestamp.max.tz_localize("UTC")),
+        )
+        grouped = attachments.groupby("VolumeId", sort=False)
+        self.frame = pd.DataFrame(
+            {
+                "InstanceId": grouped["InstanceId"].agg(",".join),
+                "InstanceState": grouped["InstanceState"].agg(",".join),
+                "AttachTime": grouped["AttachTime"].agg(",".join),
+                "Stopped": grouped["Stopped"].all(),
+                "StoppedAt": grouped["StoppedAt"].max(),
+            }
+        )
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @classmethod
+    def from_reservations(cls, reservations):
+        return cls(
+            pd.DataFrame.from_records(
+                (
+                    row
+                    for reservation in reservations
+                    for row in attachment_rows(reservation)
+                ),
+                columns=ATTACHMENT_COLUMNS,
+            )
+        )
+
+    @classmethod
+    def load(cls, account_id: str, date: str, enabled_regions, source: str = "json"):
+        if source == "snapshot":
+            from snapshots import SnapshotStore
+
+            store = SnapshotStore(account_id, date)
+            if not store.is_current(enabled_regions):
+                store.ingest(enabled_regions)
+            return cls(store.read_attachments().to_pandas())
+        return cls.from_reservations(
+            iter_service_data(
+                os.path.join(account_id, date),
+                "instances.json",
+                "Reservations",
+                enabled_regions,
+            )
+        )
+
+    def lookup(self, volume_ids, stopped_before) -> pd.DataFrame:
+        """InstanceId, InstanceState, AttachTime and LongStopped for
+        ``volume_ids``, in order.
+
+        LongStopped marks volumes whose instances were all stopped before
+        ``stopped_before``; unattached volumes get "" and False.
+        """
+        found = self.frame.reindex(pd.Index(volume_ids, name="VolumeId"))
+        return pd.DataFrame(
+            {
+                "InstanceId": found["InstanceId"].fillna("").to_numpy(),
+                "InstanceState": found["InstanceState"].fillna("").to_numpy(),
+                "AttachTime": found["AttachTime"].fillna("").to_numpy(),
+                "LongStopped": (
+                    found["Stopped"].eq(True).to_numpy()
+                    & (found["StoppedAt"] < pd.Timestamp(stopped_before)).to_numpy()
+                ),
+            },
+            index=found.index,
+        )
+
+
+def created_after(volumes: pd.DataFrame, end_time) -> np.ndarray:
+    """Volumes created after ``end_time``, which can have no datapoints yet."""
+    return (
+        pd.to_datetime(volumes["CreateTime"], utc=True, errors="coerce")
+        > pd.Timestamp(end_time)
+    ).to_numpy()
@@ -0,0 +1,442 @@
+"""Synthetic-fleet benchmarks for EBSReport.
+
+Generates volumes.json/instances.json fleets, runs the report stages against
+an in-process CloudWatch stand-in and a stubbed email handler, and records
+wall time, process peak RSS and API calls per stage:
+
+    python benchmark.py --volumes 1000 100000 --latency 0.02 --save bench.json
+    python benchmark.py --volumes 1000 100000 --latency 0.02 --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from types import SimpleNamespace
+
+import numpy as np
+
+from instrumentation import peak_rss_bytes
+
+DEFAULT_REGIONS = ["us-east-1", "us-east-2", "us-west-2"]
+DEFAULT_MIX = {"gp2": 0.4, "gp3": 0.3, "io1": 0.15, "io2": 0.15}
+# GetMetricData returns at most this many datapoints per response.
+MAX_DATAPOINTS_PER_RESPONSE = 100800
+
+
+@lru_cache(maxsize=32)
+def _timestamps(start_time: datetime, period: int, count: int) -> tuple:
+    return tuple(
+        start_time + timedelta(seconds=period * index) for index in range(count)
+    )
+
+
+class FakeThrottlingError(Exception):
+    def __init__(self):
+        super().__init__("Rate exceeded")
+        self.response = {"Error": {"Code": "Throttling", "Message": "Rate exceeded"}}
+
+
+class FakeCloudWatch:
+    """Thread-safe CloudWatch stand-in serving GetMetricData and
+    GetMetricStatistics with injectable latency, throttling and datapoints."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        idle_ratio: float = 0.1,
+        max_iops: float = 5000.0,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.idle_ratio = idle_ratio
+        self.max_iops = max_iops
+        self.seed = seed
+        self.calls = 0
+        self.throttles = 0
+        self.datapoints = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _fraction(self, key: str) -> float:
+        # Deterministic and cheap, so the stand-in does not dominate timings.
+        return zlib.crc32(f"{self.seed}:{key}".encode()) / 0xFFFFFFFF
+
+    def values(self, volume_id: str, metric_name: str, count: int) -> np.ndarray:
+        """Per-second rates of ``metric_name``; reads and writes each make up to
+        half of ``max_iops``, at 16 KiB per operation for byte metrics."""
+        if self._fraction(volume_id) < self.idle_ratio:
+            return np.zeros(count)
+        operation = metric_name.replace("Bytes", "Ops")
+        seed = zlib.crc32(f"{self.seed}:{volume_id}:{operation}".encode())
+        rates = np.random.default_rng(seed).random(count) * self.max_iops / 2
+        return np.round(rates * (16384 if metric_name.endswith("Bytes") else 1), 2)
+
+    def _request(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+            if self._random.random() < self.throttle_rate:
+                self.throttles += 1
+                raise FakeThrottlingError()
+
+    def _series(self, volume_id, metric_name, start_time, end_time, period, stat):
+        count = max(int((end_time - start_time).total_seconds() // period), 0)
+        scale = period if stat == "Sum" else 1
+        values = self.values(volume_id, metric_name, count) * scale
+        return _timestamps(start_time, period, count), values
+
+    def _query_series(self, query, queries, start_time, end_time):
+        if "MetricStat" in query:
+            stat = query["MetricStat"]
+            return self._series(
+                stat["Metric"]["Dimensions"][0]["Value"],
+                stat["Metric"]["MetricName"],
+                start_time,
+                end_time,
+                stat["Period"],
+                stat["Stat"],
+            )
+        # Only the "(FILL(a, 0) + FILL(b, 0)) / PERIOD(a)" sums are supported.
+        query_ids = dict.fromkeys(re.findall(r"\b[a-z]\w*", query["Expression"]))
+        parts = [queries[query_id] for query_id in query_ids if query_id in queries]
+        period = parts[0]["MetricStat"]["Period"]
+        series = [
+            self._query_series(part, queries, start_time, end_time) for part in parts
+        ]
+        return series[0][0], sum(values for _, values in series) / period
+
+    def get_metric_data(
+        self, MetricDataQueries, StartTime, EndTime, NextToken=None, **kwargs
+    ):
+        self._request()
+        offset = int(NextToken or 0)
+        results = list()
+        budget = MAX_DATAPOINTS_PER_RESPONSE
+        queries = {query["Id"]: query for query in MetricDataQueries}
+        returned = [query for query in MetricDataQueries if query["ReturnData"]]
+        for query in returned[offset:]:
+            timestamps, values = self._query_series(
+                query, queries, StartTime, EndTime
+            )
+            if results and len(timestamps) > budget:
+                break
+            budget -= len(timestamps)
+            results.append(
+                {
+                    "Id": query["Id"],
+                    "Timestamps": list(timestamps),
+                    "Values": values.tolist(),
+                    "StatusCode": "Complete",
+                }
+            )
+        with self._lock:
+            self.datapoints += MAX_DATAPOINTS_PER_RESPONSE - budget
+        response = {"MetricDataResults": results}
+        if offset + len(results) < len(returned):
+            response["NextToken"] = str(offset + len(results))
+        return response
+
+    def get_metric_statistics(
+        self, MetricName, Dimensions, StartTime, EndTime, Period, Statistics, **kwargs
+    ):
+        self._request()
+        timestamps, values = self._series(
+            Dimensions[0]["Value"], MetricName, StartTime, EndTime, Period, None
+        )
+        return {
+            "Datapoints": [
+                {"Timestamp": timestamp, **dict.fromkeys(Statistics, value)}
+                for timestamp, value in zip(timestamps, values.tolist())
+            ]
+        }
+
+
+class StubTemplate:
+    def render(self, context: dict) -> str:
+        return json.dumps(context, default=str)
+
+
+class StubEmailHandler:
+    def __init__(self):
+        self.sent = list()
+
+    def get_template(self, name: str) -> StubTemplate:
+        return StubTemplate()
+
+    def send_mail(self, recipients, subject, messages, attachments):
+        self.sent.append(
+            {"recipients": recipients, "subject": subject, "attachments": attachments}
+        )
+
+
+def generate_fleet(
+    root: str,
+    account_id: str,
+    date: str,
+    volumes: int,
+    regions: list = DEFAULT_REGIONS,
+    mix: dict = DEFAULT_MIX,
+    available_ratio: float = 0.05,
+    stopped_ratio: float = 0.05,
+    seed: int = 0,
+):
+    from loaders import region_file_path
+
+    rng = random.Random(seed)
+    types = list(mix)
+    weights = list(mix.values())
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc).isoformat()
+    per_region = {region: [] for region in regions}
+    for index in range(volumes):
+        region = regions[index % len(regions)]
+        volume_type = rng.choices(types, weights)[0]
+        iops = {
+            "gp2": 3 * 100,
+            "gp3": rng.choice([3000, 6000, 16000]),
+            "io1": rng.choice([1000, 16000, 40000]),
+            "io2": rng.choice([1000, 16000, 40000, 80000]),
+        }.get(volume_type, 0)
+        state = "available" if rng.random() < available_ratio else "in-use"
+        per_region[region].append(
+            {
+                "VolumeId": f"vol-{index:017x}",
+                "Size": 100,
+                "VolumeType": volume_type,
+                "Iops": iops,
+                "Throughput": rng.choice([125, 250]) if volume_type == "gp3" else 0,
+                "State": state,
+                "CreateTime": created,
+                "AvailabilityZone": f"{region}a",
+                "SnapshotId": "",
+                "Encrypted": True,
+                "Tags": [{"Key": "Name", "Value": f"volume-{index}"}],
+            }
+        )
+
+    def instance(index, volume):
+        state = {"State": {"Name": "running"}}
+        if rng.random() < stopped_ratio:
+            stopped = datetime.now(timezone.utc) - timedelta(days=rng.randint(1, 60))
+            state = {
+                "State": {"Name": "stopped"},
+                "StateTransitionReason": (
+                    f"User initiated ({stopped:%Y-%m-%d %H:%M:%S} GMT)"
+                ),
+            }
+        return {
+            "InstanceId": f"i-{index:017x}",
+            **state,
+            "BlockDeviceMappings": [
+                {
+                    "DeviceName": "/dev/xvda",
+                    "Ebs": {
+                        "VolumeId": volume["VolumeId"],
+                        "AttachTime": created,
+                        "Status": "attached",
+                    },
+                }
+            ],
+        }
+
+    for region, region_volumes in per_region.items():
+        instances = [
+            instance(index, volume)
+            for index, volume in enumerate(region_volumes)
+            if volume["State"] == "in-use"
+        ]
+        # Launches of up to four instances share a reservation.
+        reservations = list()
+        offset = 0
+        while offset < len(instances):
+            count = rng.randint(1, 4)
+            reservations.append({"Instances": instances[offset : offset + count]})
+            offset += count
+        for file_name, root_element, items in (
+            ("volumes.json", "Volumes", region_volumes),
+            ("instances.json", "Reservations", reservations),
+        ):
+            path = region_file_path(
+                os.path.join(root, account_id, date), region, file_name
+            )
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as file:
+                json.dump({root_element: items}, file)
+
+
+def process_peak_rss_mb() -> float:
+    """Peak RSS of the whole process so far, not of the last stage or run."""
+    return round(peak_rss_bytes() / (1024 * 1024), 1)
+
+
+def run_benchmark(
+    volumes: int,
+    regions: list = DEFAULT_REGIONS,
+    mix: dict = DEFAULT_MIX,
+    latency: float = 0.0,
+    throttle_rate: float = 0.0,
+    idle_ratio: float = 0.1,
+    streaming: bool = True,
+    source: str = "json",
+    seed: int = 0,
+) -> dict:
+    import reporter
+    from analysis import AnalysisCache
+    from cli import configure_path
+    from client_pool import ClientPool
+
+    # generate_report and the JSON loaders come from the project's utils/.
+    configure_path()
+
+    account = SimpleNamespace(
+        accountID="000000000000",
+        aws_enabled_regions=regions,
+        recipients=["benchmark@example.com"],
+    )
+    date = "2024-05-28"
+    cloudwatch = FakeCloudWatch(
+        latency=latency, throttle_rate=throttle_rate, idle_ratio=idle_ratio, seed=seed
+    )
+    email = StubEmailHandler()
+    original = (
+        reporter.client_pool,
+        reporter.email_handler,
+        reporter.analysis_cache,
+        os.getcwd(),
+    )
+    stages = dict()
+
+    def stage(name, func):
+        calls = cloudwatch.calls
+        throttles = cloudwatch.throttles
+        started = time.perf_counter()
+        result = func()
+        stages[name] = {
+            "seconds": round(time.perf_counter() - started, 4),
+            "cloudwatch_calls": cloudwatch.calls - calls,
+            "cloudwatch_throttles": cloudwatch.throttles - throttles,
+            "process_peak_rss_mb": process_peak_rss_mb(),
+        }
+        return result
+
+    with tempfile.TemporaryDirectory() as root:
+        try:
+            os.chdir(root)
+            reporter.client_pool = ClientPool(factory=lambda *args: cloudwatch)
+            reporter.email_handler = email
+            reporter.analysis_cache = AnalysisCache()
+            stage(
+                "generate",
+                lambda: generate_fleet(
+                    root, account.accountID, date, volumes, regions, mix, seed=seed
+                ),
+            )
+            report = reporter.EBSReport(
+                account=account, date=date, streaming=streaming, source=source
+            )
+            stage("analyze", report.analyze)
+            stage("get_report", report.get_report)
+            stage("write_html_report", report.write_html_report)
+            stage("send_report", report.send_report)
+            instrumentation = report.instrumentation.to_dict()
+        finally:
+            (
+                reporter.client_pool,
+                reporter.email_handler,
+                reporter.analysis_cache,
+                cwd,
+            ) = original
+            os.chdir(cwd)
+
+    return {
+        "volumes": volumes,
+        "regions": len(regions),
+        "latency": latency,
+        "throttle_rate": throttle_rate,
+        "streaming": streaming,
+        "source": source,
+        "wall_seconds": round(
+            sum(
+                result["seconds"]
+                for name, result in stages.items()
+                if name != "generate"
+            ),
+            4,
+        ),
+        "process_peak_rss_mb": process_peak_rss_mb(),
+        "cloudwatch_calls": cloudwatch.calls,
+        "cloudwatch_throttles": cloudwatch.throttles,
+        "cloudwatch_datapoints": cloudwatch.datapoints,
+        "emails_sent": len(email.sent),
+        "stages": stages,
+        "instrumentation": instrumentation,
+    }
+
+
+def compare(results: list, baseline: list):
+    baseline_by_size = {result["volumes"]: result for result in baseline}
+    for result in results:
+        previous = baseline_by_size.get(result["volumes"])
+        if previous is None:
+            print(f"{result['volumes']} volumes: no baseline")
+            continue
+        for key in ("wall_seconds", "process_peak_rss_mb", "cloudwatch_calls"):
+            if key not in previous:
+                print(f"{result['volumes']} volumes: {key} not in baseline")
+                continue
+            ratio = result[key] / previous[key] if previous[key] else float("inf")
+            print(
+                f"{result['volumes']} volumes: {key} {previous[key]} -> "
+                f"{result[key]} ({ratio:.2f}x)"
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--volumes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--regions", nargs="+", default=DEFAULT_REGIONS)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--idle-ratio", type=float, default=0.1)
+    parser.add_argument("--source", choices=["json", "snapshot"], default="json")
+    parser.add_argument("--no-streaming", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write results to this baseline file")
+    parser.add_argument("--compare", help="compare results with this baseline file")
+    args = parser.parse_args(argv)
+
+    results = list()
+    for volumes in args.volumes:
+        result = run_benchmark(
+            volumes,
+            regions=args.regions,
+            latency=args.latency,
+            throttle_rate=args.throttle_rate,
+            idle_ratio=args.idle_ratio,
+            streaming=not args.no_streaming,
+            source=args.source,
+            seed=args.seed,
+        )
+        print(json.dumps(result, indent=2))
+        results.append(result)
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Run EBS reports for scheduled jobs.
+
+    python cli.py --dates 2024-05-28 --formats email
+    python cli.py --accounts 111111111111 --dates 2024-05-27 2024-05-28 \\
+        --formats html csv.gz
+    python cli.py --dates 2024-05-28 --dry-run
+    python cli.py --dates 2024-05-28 --metadata-only
+
+Only the standard library is imported up front; pandas, boto and the email
+handler are loaded by the modes that need them, and every run reports its
+own startup time.
+"""
+
+import time
+
+STARTED = time.perf_counter()
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+from datetime import datetime, timezone  # noqa: E402
+
+# Attachment formats handled by EBSReport.write_attachment; "attachment" is
+# the default generate_report output.
+ATTACHMENT_FORMATS = ("attachment", "csv.gz", "parquet")
+# "digest" queues the reports and mails each recipient once for the run.
+FORMATS = ("email", "digest", "html", *ATTACHMENT_FORMATS)
+
+
+def configure_path():
+    # This directory for sibling modules and the project root for settings/
+    # and utils/, which the report modules import on first use.
+    here = os.path.dirname(os.path.abspath(__file__))
+    for path in (here, os.path.dirname(os.path.dirname(here))):
+        if path not in sys.path:
+            sys.path.append(path)
+
+
+def parse_date(value: str) -> str:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {value!r}, expected YYYY-MM-DD")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate EBS optimizer reports.")
+    parser.add_argument(
+        "--accounts",
+        nargs="+",
+        metavar="ACCOUNT_ID",
+        help="account IDs to report on (default: every configured account)",
+    )
+    parser.add_argument(
+        "--dates",
+        nargs="+",
+        type=parse_date,
+        default=[datetime.now(timezone.utc).strftime("%Y-%m-%d")],
+        metavar="YYYY-MM-DD",
+        help="inventory dates to report on (default: today, UTC)",
+    )
+    parser.add_argument(
+        "--formats", nargs="+", choices=FORMATS, default=["email"], metavar="FORMAT"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="analyze and print summaries without sending mail or writing any "
+        "file; metrics are only written with --metrics-dir",
+    )
+    parser.add_argument(
+        "--metadata-only",
+        action="store_true",
+        help="count categories from the inventory files only, without pandas "
+        "or CloudWatch",
+    )
+    parser.add_argument("--source", choices=["json", "snapshot"], default="json")
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="parse volumes.json incrementally in chunks (requires ijson)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="diff against the previous day's stored analysis, also with --dry-run",
+    )
+    parser.add_argument("--max-concurrent-accounts", type=int, default=4)
+    parser.add_argument("--metrics-dir", help="directory for run metrics files")
+    args = parser.parse_args(argv)
+    if args.dry_run and args.source == "snapshot":
+        # Building a missing snapshot would write it.
+        parser.error("--dry-run reads the JSON inventories; drop --source snapshot")
+    return args
+
+
+def load_accounts(account_ids=None) -> list:
+    try:
+        from dotenv import load_dotenv
+
+        load_dotenv(".env", override=True)
+    except ImportError:
+        pass
+    from settings.config import ACCOUNTS
+
+    if not account_ids:
+        return list(ACCOUNTS)
+    accounts = [account for account in ACCOUNTS if account.accountID in account_ids]
+    missing = set(account_ids) - {account.accountID for account in accounts}
+    if missing:
+        raise SystemExit(f"Unknown account(s): {', '.join(sorted(missing))}")
+    return accounts
+
+
+def run_formats(
+    report, formats, dry_run: bool = False, delivery_queue=None
+) -> dict:
+    analysis = report.analyze()
+    result = {"summary": dict(analysis.summary), "outputs": []}
+    if dry_run:
+        return result
+    for output_format in formats:
+        if output_format == "email":
+            report.send_report()
+            result["outputs"].append("email")
+        elif output_format == "digest":
+            report.queue_report(delivery_queue)
+            result["outputs"].append("digest")
+        elif output_format == "html":
+            result["outputs"].append(report.write_html_report())
+        else:
+            result["outputs"].append(
+                report.write_attachment(
+                    analysis,
+                    export_format=None
+                    if output_format == "attachment"
+                    else output_format,
+                )
+            )
+    return result
+
+
+def run_metadata(accounts, dates) -> dict:
+    from metadata import count_categories
+
+    results = dict()
+    for date in dates:
+        for account in accounts:
+            try:
+                results[(account.accountID, date)] = count_categories(
+                    account.accountID, date, account.aws_enabled_regions
+                )
+            except Exception as e:
+                print(f"{account.accountID}: metadata for {date} failed: {e}")
+                results[(account.accountID, date)] = e
+    return results
+
+
+def run_reports(args, accounts) -> dict:
+    from functools import partial, update_wrapper
+
+    from reporter import EBSReport
+    from scheduler import ReportScheduler
+
+    delivery_queue = None
+    if "digest" in args.formats and not args.dry_run:
+        from delivery import DeliveryQueue
+
+        delivery_queue = DeliveryQueue()
+    results = dict()
+    for date in args.dates:
+        scheduled = ReportScheduler(
+            accounts=accounts,
+            date=date,
+            report_class=EBSReport,
+            action=update_wrapper(
+                partial(
+                    run_formats,
+                    formats=args.formats,
+                    dry_run=args.dry_run,
+                    delivery_queue=delivery_queue,
+                ),
+                run_formats,
+            ),
+            max_concurrent_accounts=args.max_concurrent_accounts,
+            metrics_dir=args.metrics_dir,
+            write_metrics=not args.dry_run or args.metrics_dir is not None,
+            report_options={
+                "source": args.source,
+                "streaming": args.streaming,
+                "incremental": args.incremental,
+                "persist": not args.dry_run,
+            },
+        ).run()
+        for account_id, result in scheduled.items():
+            results[(account_id, date)] = result
+    if delivery_queue is not None:
+        print(f"Digest delivery: {delivery_queue.close()}")
+    return results
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    configure_path()
+    accounts = load_accounts(args.accounts)
+    imported = time.perf_counter()
+
+    if args.metadata_only:
+        results = run_metadata(accounts, args.dates)
+    else:
+        results = run_reports(args, accounts)
+    failed = 0
+    for (account_id, date), result in sorted(results.items()):
+        if isinstance(result, Exception):
+            failed += 1
+            continue
+        print(json.dumps({"accountID": account_id, "date": date, **result}))
+
+    finished = time.perf_counter()
+    print(
+        f"Startup {(imported - STARTED) * 1000:.0f} ms, "
+        f"run {finished - imported:.2f}s, "
+        f"pandas {'loaded' if 'pandas' in sys.modules else 'not loaded'}; "
+        f"{len(results) - failed}/{len(results)} report(s) succeeded",
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import threading
+import time
+from functools import lru_cache
+
+# Services whose calls go through throttling.call_with_backoff. botocore must
+# not retry them as well, or the adaptive rate limiter only hears about a
+# throttle after botocore's own attempts are used up.
+BACKOFF_SERVICES = {"cloudwatch"}
+
+
+@lru_cache(maxsize=None)
+def default_client_config(service_name: str | None = None):
+    # botocore and the connection layer are imported on first use, so runs
+    # served entirely from cache never load them.
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=50,
+        tcp_keepalive=True,
+        # total_max_attempts counts the first request, so 1 disables retries.
+        retries=(
+            {"total_max_attempts": 1, "mode": "standard"}
+            if service_name in BACKOFF_SERVICES
+            else {"max_attempts": 3, "mode": "standard"}
+        ),
+    )
+
+
+class ClientPool:
+    """Long-lived boto3 clients shared per (account, service, region).
+
+    boto3 clients are thread-safe once created, so a single client per key is
+    handed to every caller; only creation is serialized.
+    """
+
+    def __init__(self, config=None, factory=None):
+        self.config = config
+        self.factory = factory or self._default_factory
+        self.hits = 0
+        self.misses = 0
+        self.creation_time = 0.0
+        self._clients = dict()
+        self._key_locks = dict()
+        self._lock = threading.Lock()
+
+    def _default_factory(self, account, service_name, region):
+        from utils.connection import AWSConnection
+
+        connection = AWSConnection(
+            service_name=service_name, region=region, account=account
+        )
+        try:
+            return connection.client(
+                config=self.config or default_client_config(service_name)
+            )
+        except TypeError:
+            # Older AWSConnection.client() does not take a botocore config.
+            return connection.client()
+
+    def client(self, account, service_name: str, region: str):
+        key = (account.accountID, service_name, region)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.hits += 1
+                return client
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is not None:
+                    self.hits += 1
+                    return client
+            started = time.perf_counter()
+            client = self.factory(account, service_name, region)
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._clients[key] = client
+                self.misses += 1
+                self.creation_time += elapsed
+        return client
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "hits": self.hits,
+                "misses": self.misses,
+                "creation_time": round(self.creation_time, 6),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+            self._key_locks.clear()
+
+
+client_pool = ClientPool()
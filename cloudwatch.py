@@ -0,0 +1,332 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from client_pool import client_pool as default_client_pool
+from instrumentation import Instrumentation
+from throttling import call_with_backoff, get_rate_limiter, is_throttling_error
+from timeseries import (
+    IOPS_SERIES,
+    STAT_COLUMNS,
+    THROUGHPUT_SERIES,
+    align,
+    concat_series,
+    grid_size,
+    metric_queries,
+    query_count,
+    series_statistics,
+    to_series,
+)
+
+# GetMetricData accepts at most 500 queries per request.
+MAX_QUERIES_PER_REQUEST = 500
+# Hourly datapoints keep bursts visible while 14 days of two series per
+# volume stay at 672 datapoints; pass period=300 for 5-minute resolution.
+DEFAULT_PERIOD = 3600
+# Period for volumes whose recommendation hinges on a peak, such as io1/io2
+# against the gp3 threshold, where hourly sums would average bursts away.
+FINE_PERIOD = 300
+# Windows end on a day boundary, so daily runs share and roll cache keys.
+DEFAULT_ALIGNMENT = 86400
+# Volumes whose hourly series are held at once; statistics are computed per
+# chunk and the series released, so memory does not grow with the fleet.
+# Finer periods use proportionally smaller chunks.
+STATS_CHUNK_SIZE = 1000
+
+
+class CloudWatchMetrics:
+    """Batched EBS metric fetching on top of CloudWatch GetMetricData."""
+
+    def __init__(
+        self,
+        account,
+        days: int = 14,
+        period: int = DEFAULT_PERIOD,
+        fine_period: int = FINE_PERIOD,
+        alignment: int = DEFAULT_ALIGNMENT,
+        batch_size: int = MAX_QUERIES_PER_REQUEST,
+        client_factory=None,
+        cache=None,
+        client_pool=None,
+        max_concurrent_regions: int = 8,
+        max_concurrent_requests: int = 4,
+        instrumentation: Instrumentation | None = None,
+    ):
+        self.account = account
+        self.client_pool = client_pool or default_client_pool
+        self.period = period
+        self.fine_period = fine_period
+        self.alignment = max(alignment, period, fine_period)
+        self.batch_size = min(batch_size, MAX_QUERIES_PER_REQUEST)
+        now = datetime.now(timezone.utc).timestamp()
+        self.end_time = datetime.fromtimestamp(
+            now - now % self.alignment, tz=timezone.utc
+        )
+        self.start_time = self.end_time - timedelta(days=days)
+        self.client_factory = client_factory or self._default_client_factory
+        self.cache = cache
+        self.max_concurrent_regions = max_concurrent_regions
+        self.max_concurrent_requests = max_concurrent_requests
+        self.instrumentation = instrumentation or Instrumentation()
+        self.api_calls = 0
+        self.failed_requests = 0
+        self._counter_lock = threading.Lock()
+
+    def window(self, stat, shift: int = 0, period: int | None = None) -> str:
+        offset = timedelta(seconds=self.alignment * shift)
+        return (
+            f"{(self.start_time - offset).isoformat()}"
+            f"/{(self.end_time - offset).isoformat()}/{period or self.period}/{stat}"
+        )
+
+    def _default_client_factory(self, region):
+        return self.client_pool.client(self.account, "cloudwatch", region)
+
+    def get_volumes_iops(self, volumes) -> dict:
+        volume_ids_by_region = dict()
+        for volume in volumes:
+            volume_ids_by_region.setdefault(volume["Region"], []).append(
+                volume["VolumeId"]
+            )
+        return self.get_iops_by_region(volume_ids_by_region)
+
+    def get_iops_by_region(self, volume_ids_by_region: dict, rolling=False) -> dict:
+        stats = self.get_stats_by_region(volume_ids_by_region, rolling)
+        return stats["PeakIOPS"].to_dict()
+
+    def get_region_iops(self, region, volume_ids, rolling=False) -> dict:
+        return self.get_region_stats(region, volume_ids, rolling)["PeakIOPS"].to_dict()
+
+    def get_stats_by_region(
+        self, volume_ids_by_region: dict, rolling=False, period: int | None = None
+    ) -> pd.DataFrame:
+        if not volume_ids_by_region:
+            return pd.DataFrame(
+                columns=STAT_COLUMNS, index=pd.Index([], name="VolumeId"), dtype=float
+            )
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_concurrent_regions, len(volume_ids_by_region))
+        ) as executor:
+            return pd.concat(
+                executor.map(
+                    lambda item: self.get_region_stats(
+                        *item, rolling=rolling, period=period
+                    ),
+                    volume_ids_by_region.items(),
+                )
+            )
+
+    def get_region_stats(
+        self, region, volume_ids, rolling=False, period: int | None = None
+    ) -> pd.DataFrame:
+        """Peak, p95 and p99 of combined read+write IOPS and throughput per
+        volume over ``period``-second datapoints (the default period when
+        unset); volumes whose metrics could not be fetched are left out rather
+        than reported as zero."""
+        period = period or self.period
+        volume_ids = list(volume_ids)
+        chunk_size = max(STATS_CHUNK_SIZE * period // DEFAULT_PERIOD, 1)
+        return pd.concat(
+            [
+                self._chunk_stats(
+                    region, volume_ids[offset : offset + chunk_size], rolling, period
+                )
+                for offset in range(0, max(len(volume_ids), 1), chunk_size)
+            ]
+        )
+
+    def _chunk_stats(self, region, volume_ids, rolling, period) -> pd.DataFrame:
+        series_names = (IOPS_SERIES, THROUGHPUT_SERIES)
+        grids = self.get_datapoints(
+            region, volume_ids, series_names, "Sum", rolling=rolling, period=period
+        )
+        volume_ids = [
+            volume_id
+            for volume_id in volume_ids
+            if all((volume_id, name) in grids for name in series_names)
+        ]
+        periods = grid_size(self.start_time, self.end_time, period)
+        iops, throughput = (
+            np.vstack(
+                [np.empty((0, periods))]
+                + [grids[(volume_id, name)] for volume_id in volume_ids]
+            )
+            for name in series_names
+        )
+        return series_statistics(volume_ids, iops, throughput)
+
+    def get_datapoints(
+        self,
+        region,
+        volume_ids,
+        metric_names,
+        stat,
+        rolling=False,
+        period: int | None = None,
+    ) -> dict:
+        """Values of every (volume, metric) pair of ``region`` on the window's
+        grid of ``period``-second buckets.
+
+        With ``rolling`` set, pairs cached for the previous window (one
+        ``alignment`` earlier) are rolled forward by fetching only the newest
+        ``alignment`` seconds.
+        """
+        keys = [
+            (volume_id, metric_name)
+            for volume_id in volume_ids
+            for metric_name in metric_names
+        ]
+        period = period or self.period
+        window = self.window(stat, period=period)
+        datapoints = dict()
+        if self.cache is not None:
+            datapoints.update(self.cache.get_many(region, keys, window))
+            keys = [key for key in keys if key not in datapoints]
+        if keys and rolling and self.cache is not None:
+            rolled = self._roll_forward(region, keys, stat, period)
+            datapoints.update(rolled)
+            keys = [key for key in keys if key not in rolled]
+        if keys:
+            datapoints.update(
+                self._fetch(
+                    region, keys, stat, self.start_time, self.end_time, period
+                )
+            )
+        return datapoints
+
+    def _roll_forward(self, region, keys, stat, period: int | None = None) -> dict:
+        period = period or self.period
+        previous = self.cache.get_many(
+            region, keys, self.window(stat, shift=1, period=period)
+        )
+        if not previous:
+            return dict()
+        latest = self._fetch(
+            region,
+            list(previous),
+            stat,
+            self.end_time - timedelta(seconds=self.alignment),
+            self.end_time,
+            period,
+            cache=False,
+        )
+        # Both windows share the grid, shifted by one alignment.
+        shift = self.alignment // period
+        rolled = {
+            key: np.concatenate([previous[key][shift:], values])
+            for key, values in latest.items()
+        }
+        self.cache.set_many(region, rolled, self.window(stat, period=period))
+        return rolled
+
+    def _fetch(
+        self, region, keys, stat, start_time, end_time, period, cache=True
+    ) -> dict:
+        datapoints = dict()
+        cloudwatch_client = self.client_factory(region)
+        rate_limiter = get_rate_limiter(self.account.accountID, "cloudwatch", region)
+        # Combined series take several queries each, all in the same request.
+        keys_per_batch = max(
+            self.batch_size // max(query_count(metric) for _, metric in keys), 1
+        )
+        batches = [
+            keys[offset : offset + keys_per_batch]
+            for offset in range(0, len(keys), keys_per_batch)
+        ]
+
+        def fetch(batch):
+            try:
+                return self._fetch_batch(
+                    cloudwatch_client,
+                    batch,
+                    stat,
+                    start_time,
+                    end_time,
+                    period,
+                    rate_limiter,
+                    region,
+                )
+            except Exception as e:
+                with self._counter_lock:
+                    self.failed_requests += 1
+                self.instrumentation.incr(
+                    "cloudwatch_errors", labels={"region": region}
+                )
+                print(f"{region}: failed to fetch {len(batch)} metrics: {e}")
+                return None
+
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_concurrent_requests, len(batches))
+        ) as executor:
+            for fetched in executor.map(fetch, batches):
+                if fetched is None:
+                    continue
+                if cache and self.cache is not None:
+                    self.cache.set_many(
+                        region, fetched, self.window(stat, period=period)
+                    )
+                datapoints.update(fetched)
+        return datapoints
+
+    def _fetch_batch(
+        self,
+        cloudwatch_client,
+        keys,
+        stat,
+        start_time,
+        end_time,
+        period,
+        rate_limiter=None,
+        region=None,
+    ) -> dict:
+        query_keys = {f"q{index}": key for index, key in enumerate(keys)}
+        queries = [
+            query
+            for query_id, (volume_id, metric_name) in query_keys.items()
+            for query in metric_queries(
+                query_id, volume_id, metric_name, period, stat
+            )
+        ]
+        request = {
+            "MetricDataQueries": queries,
+            "StartTime": start_time,
+            "EndTime": end_time,
+            "ScanBy": "TimestampAscending",
+        }
+
+        labels = {"region": region}
+
+        def get_metric_data():
+            self.instrumentation.incr("cloudwatch_requests", labels=labels)
+            try:
+                return cloudwatch_client.get_metric_data(**request)
+            except Exception as e:
+                if is_throttling_error(e):
+                    self.instrumentation.incr("cloudwatch_throttles", labels=labels)
+                raise
+
+        # A series can be split across pages, so parts are joined at the end.
+        parts = {key: [] for key in keys}
+        while True:
+            response = call_with_backoff(get_metric_data, rate_limiter=rate_limiter)
+            with self._counter_lock:
+                self.api_calls += 1
+            for result in response["MetricDataResults"]:
+                parts[query_keys[result["Id"]]].append(
+                    to_series(result["Timestamps"], result["Values"])
+                )
+            next_token = response.get("NextToken")
+            if not next_token:
+                break
+            request["NextToken"] = next_token
+        grid = align(
+            {key: concat_series(series) for key, series in parts.items()},
+            keys,
+            start_time,
+            end_time,
+            period,
+        )
+        return {key: grid[index] for index, key in enumerate(keys)}
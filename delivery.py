@@ -0,0 +1,294 @@
+import hashlib
+import os
+import queue
+import random
+import shutil
+import smtplib
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from email.message import EmailMessage
+
+from rendering import DEFAULT_MAX_BYTES, DEFAULT_ROW_LIMIT, ReportRenderer
+
+DIGEST_SUBJECT = "AWS Bill Buster Report"
+# SMTP reply codes 4xx are temporary failures the server expects us to retry.
+TRANSIENT_SMTP_CODES = range(400, 500)
+_CLOSE = object()
+
+
+@dataclass(frozen=True)
+class Delivery:
+    """Reports of one account to send to ``recipients``.
+
+    ``reports`` are entries of reporter.html's ``reports`` list and
+    ``attachments`` are (file name, path) pairs.
+    """
+
+    account_id: str
+    recipients: tuple
+    subject: str
+    reports: tuple
+    attachments: tuple = ()
+
+
+def is_transient_error(error: Exception) -> bool:
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code in TRANSIENT_SMTP_CODES
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(
+            code in TRANSIENT_SMTP_CODES for code, _ in error.recipients.values()
+        )
+    if isinstance(error, smtplib.SMTPNotSupportedError):
+        return False
+    # Dropped or refused connections; SMTPException is an OSError too.
+    return isinstance(error, OSError)
+
+
+class SMTPSender:
+    """Sends every message of a run over one SMTP connection, reconnecting
+    when the server drops it."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 25,
+        from_address: str = "",
+        username: str | None = None,
+        password: str | None = None,
+        starttls: bool = False,
+        timeout: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.from_address = from_address or username
+        if not self.from_address:
+            raise ValueError("SMTPSender needs a from address or a username")
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.connections = 0
+        self._connection = None
+
+    @classmethod
+    def from_env(cls):
+        """Sender configured from SMTP_* variables, or None without SMTP_HOST."""
+        if not os.getenv("SMTP_HOST"):
+            return None
+        return cls(
+            host=os.environ["SMTP_HOST"],
+            port=int(os.getenv("SMTP_PORT", "25")),
+            from_address=os.getenv("SMTP_FROM", ""),
+            username=os.getenv("SMTP_USERNAME"),
+            password=os.getenv("SMTP_PASSWORD"),
+            starttls=os.getenv("SMTP_STARTTLS", "").lower() in ("1", "true", "yes"),
+        )
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password or "")
+        self.connections += 1
+        return connection
+
+    def send(self, recipients: list, subject: str, html: str, attachments: list):
+        message = EmailMessage()
+        message["From"] = self.from_address
+        message["To"] = ", ".join(recipients)
+        message["Subject"] = subject
+        message.set_content("This report is best viewed in an HTML mail client.")
+        message.add_alternative(html, subtype="html")
+        for name, path in attachments:
+            with open(path, "rb") as file:
+                message.add_attachment(
+                    file.read(),
+                    maintype="application",
+                    subtype="octet-stream",
+                    filename=name,
+                )
+        if self._connection is None:
+            self._connection = self._connect()
+        try:
+            self._connection.send_message(message, to_addrs=list(recipients))
+        except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+            # The server rejected this message; the connection stays usable.
+            raise
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self._connection is None:
+            return
+        try:
+            self._connection.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._connection = None
+
+
+class EmailHandlerSender:
+    """Sends through utils.email_handler, one connection per message."""
+
+    def __init__(self, handler=None):
+        if handler is None:
+            from utils.email_handler import email_handler as handler
+        self.handler = handler
+
+    def send(self, recipients: list, subject: str, html: str, attachments: list):
+        self.handler.send_mail(
+            recipients=list(recipients),
+            subject=subject,
+            messages=[html],
+            attachments=[path for _, path in attachments],
+        )
+
+    def close(self):
+        pass
+
+
+def default_sender():
+    return SMTPSender.from_env() or EmailHandlerSender()
+
+
+class DeliveryQueue:
+    """Sends queued reports from a background thread, so accounts are
+    analyzed while earlier reports go out.
+
+    In digest mode deliveries are held until ``close()``, then every distinct
+    set of reports is rendered once and mailed to all of its recipients
+    together; otherwise each delivery is sent as soon as it is queued.
+    An attachment file queued by several deliveries is only attached once per
+    message. Rendered digests go to ``output_dir``; a temporary one is removed
+    on ``close()``.
+    """
+
+    def __init__(
+        self,
+        sender=None,
+        digest: bool = True,
+        max_attempts: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        row_limit: int = DEFAULT_ROW_LIMIT,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        output_dir: str | None = None,
+    ):
+        self.sender = sender or default_sender()
+        self.digest = digest
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.renderer = ReportRenderer(row_limit=row_limit, max_bytes=max_bytes)
+        self._owns_output_dir = output_dir is None
+        self.output_dir = output_dir or tempfile.mkdtemp(prefix="report_delivery_")
+        self.sent = 0
+        self.retries = 0
+        self.failed = list()
+        self._pending = list()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="delivery", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def put(self, delivery: Delivery):
+        self._queue.put(delivery)
+
+    def close(self, timeout: float | None = None) -> dict:
+        """Send whatever is still queued and stop the sending thread."""
+        if self._thread.is_alive():
+            self._queue.put(_CLOSE)
+            self._thread.join(timeout)
+        if self._owns_output_dir and not self._thread.is_alive():
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+        return self.stats()
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "retries": self.retries, "failed": len(self.failed)}
+
+    def _run(self):
+        try:
+            while (delivery := self._queue.get()) is not _CLOSE:
+                if self.digest:
+                    self._pending.append(delivery)
+                else:
+                    self._send_all([delivery])
+            self._send_all(self._pending)
+            self._pending = list()
+        finally:
+            self.sender.close()
+
+    def _send_all(self, deliveries: list):
+        for recipients, selected in group_by_recipients(deliveries):
+            try:
+                subject = (
+                    selected[0].subject
+                    if len(selected) == 1
+                    else f"{DIGEST_SUBJECT}: {len(selected)} reports"
+                )
+                html = self._render(recipients, selected)
+                attachments = self._attachments(selected)
+            except Exception as e:
+                print(f"Delivery to {', '.join(recipients)} failed: {e}")
+                self.failed.append((recipients, e))
+                continue
+            self._send(recipients, subject, html, attachments)
+
+    def _render(self, recipients: tuple, deliveries: list) -> str:
+        name = hashlib.sha1("\n".join(recipients).encode()).hexdigest()[:16]
+        path = os.path.join(self.output_dir, f"digest_{name}.html")
+        self.renderer.render_to_file(
+            [report for delivery in deliveries for report in delivery.reports], path
+        )
+        with open(path, encoding="utf-8") as file:
+            return file.read()
+
+    def _attachments(self, deliveries: list) -> list:
+        attachments = dict()
+        for delivery in deliveries:
+            for name, path in delivery.attachments:
+                attachments.setdefault(os.path.abspath(path), (name, path))
+        return list(attachments.values())
+
+    def _send(self, recipients: tuple, subject: str, html: str, attachments: list):
+        for attempt in range(self.max_attempts):
+            try:
+                self.sender.send(list(recipients), subject, html, attachments)
+            except Exception as e:
+                if attempt == self.max_attempts - 1 or not is_transient_error(e):
+                    print(f"Delivery to {', '.join(recipients)} failed: {e}")
+                    self.failed.append((recipients, e))
+                    return
+                self.retries += 1
+                delay = min(self.max_delay, self.base_delay * 2**attempt)
+                time.sleep(random.uniform(delay / 2, delay))
+                continue
+            self.sent += 1
+            return
+
+
+def group_by_recipients(deliveries: list) -> list:
+    """(recipients, deliveries) per distinct set of deliveries, so recipients
+    who get exactly the same reports share one message."""
+    selected_by_recipient = dict()
+    for index, delivery in enumerate(deliveries):
+        for recipient in delivery.recipients:
+            selected = selected_by_recipient.setdefault(recipient, [])
+            if index not in selected:
+                selected.append(index)
+    recipients_by_selection = dict()
+    for recipient, selected in selected_by_recipient.items():
+        recipients_by_selection.setdefault(tuple(selected), []).append(recipient)
+    return [
+        (tuple(recipients), [deliveries[index] for index in selected])
+        for selected, recipients in recipients_by_selection.items()
+    ]
@@ -0,0 +1,98 @@
+import os
+
+from rendering import DEFAULT_MAX_BYTES, DEFAULT_ROW_LIMIT, ReportRenderer
+from rules import RULES
+from service_context import ServiceContext
+
+
+class OptimizerEngine:
+    """Runs the rules of several services over one ServiceContext and renders
+    them as the ``reports`` of a single reporter.html.
+
+    Takes the same arguments as EBSReport, so ReportScheduler can run it with
+    ``report_class=OptimizerEngine, action="write_html_report"``.
+    """
+
+    def __init__(
+        self,
+        account,
+        date: str,
+        services: list | None = None,
+        max_concurrent_regions: int = 8,
+        max_concurrent_requests: int = 4,
+        hooks: list | None = None,
+        rule_options: dict | None = None,
+    ):
+        unknown = set(services or ()) - RULES.keys()
+        if unknown:
+            raise ValueError(f"Unknown service(s): {', '.join(sorted(unknown))}")
+        self.account = account
+        self.date = date
+        self.context = ServiceContext(
+            account,
+            date,
+            max_concurrent_regions=max_concurrent_regions,
+            max_concurrent_requests=max_concurrent_requests,
+            hooks=hooks,
+        )
+        self.instrumentation = self.context.instrumentation
+        rule_options = rule_options or {}
+        self.rules = [
+            RULES[service_name](**rule_options.get(service_name, {}))
+            for service_name in services or RULES
+        ]
+        self._analyses = None
+
+    def analyze(self) -> dict:
+        """Analyses per service name; a failing service is left out so the
+        others are still reported."""
+        if self._analyses is not None:
+            return self._analyses
+        analyses = dict()
+        for rule in self.rules:
+            try:
+                with self.instrumentation.span(f"rule.{rule.service_name}"):
+                    analyses[rule.service_name] = rule.analyze(self.context)
+            except Exception as e:
+                self.instrumentation.incr(
+                    "rule_errors", labels={"service": rule.service_name}
+                )
+                print(f"{self.account.accountID}: {rule.service_name} failed: {e}")
+        self._analyses = analyses
+        return analyses
+
+    def summary(self) -> dict:
+        return {
+            service_name: dict(analysis.summary)
+            for service_name, analysis in self.analyze().items()
+        }
+
+    def get_report(self, row_limit: int = DEFAULT_ROW_LIMIT) -> list:
+        analyses = self.analyze()
+        return [
+            rule.report_context(analyses[rule.service_name], row_limit)
+            for rule in self.rules
+            if rule.service_name in analyses
+        ]
+
+    def write_html_report(
+        self,
+        path: str | None = None,
+        row_limit: int = DEFAULT_ROW_LIMIT,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> str:
+        path = path or os.path.join(
+            self.context.dir_path, f"optimizer_report_{self.date}.html"
+        )
+        reports = self.get_report(row_limit)
+        with self.instrumentation.span("render"):
+            ReportRenderer(row_limit=row_limit, max_bytes=max_bytes).render_to_file(
+                reports, path
+            )
+        return path
+
+    def write_metrics(self, dir_path: str | None = None) -> list:
+        return self.context.write_metrics(
+            dir_path or self.context.dir_path,
+            f"optimizer_metrics_{self.account.accountID}_{self.date}",
+        )
@@ -0,0 +1,163 @@
+import gzip
+import os
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+from savings import REPORT_COLUMNS
+from timeseries import STAT_COLUMNS
+
+# Arrow types of the non-string report columns; the rest are strings.
+_ARROW_TYPES = {
+    "Size": "int64",
+    "Iops": "int64",
+    "Throughput": "int64",
+    **{column: "float64" for column in STAT_COLUMNS},
+    "SavingsPossible": "float64",
+}
+
+
+@lru_cache(maxsize=None)
+def report_schema():
+    """Arrow schema of REPORT_COLUMNS, fixed so that categories whose columns
+    are all null (e.g. stats of available volumes) still match the others."""
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            (column, pa.type_for_alias(_ARROW_TYPES.get(column, "string")))
+            for column in REPORT_COLUMNS
+        ]
+    )
+
+
+@dataclass(frozen=True)
+class ExportResult:
+    format: str
+    path: str
+    rows: int
+    size: int
+    seconds: float
+
+
+class ReportExporter:
+    """Writes a report frame by frame, so the full report is never built in
+    memory. Subclasses implement ``_open``, ``_write`` and ``_close``."""
+
+    format_name = ""
+    extension = ""
+
+    def __init__(self, dir_path: str, base_name: str):
+        self.path = os.path.join(dir_path, f"{base_name}.{self.extension}")
+        self.rows = 0
+        self.seconds = 0.0
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        started = time.perf_counter()
+        self._open()
+        self.seconds += time.perf_counter() - started
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        started = time.perf_counter()
+        try:
+            self._close()
+        except Exception:
+            if exc_type is None:
+                self._remove()
+                raise
+        self.seconds += time.perf_counter() - started
+        if exc_type is not None:
+            # A failed export must not leave a partial file to be mailed.
+            self._remove()
+
+    def _remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def write(self, frame):
+        if frame.empty:
+            return
+        started = time.perf_counter()
+        self._write(frame)
+        self.rows += len(frame)
+        self.seconds += time.perf_counter() - started
+
+    def result(self) -> ExportResult:
+        return ExportResult(
+            format=self.format_name,
+            path=self.path,
+            rows=self.rows,
+            size=os.path.getsize(self.path),
+            seconds=round(self.seconds, 6),
+        )
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _write(self, frame):
+        raise NotImplementedError
+
+    def _close(self):
+        raise NotImplementedError
+
+
+class CsvGzipExporter(ReportExporter):
+    format_name = "csv.gz"
+    extension = "csv.gz"
+
+    def _open(self):
+        self._file = gzip.open(self.path, "wt", newline="", compresslevel=6)
+        self._header_written = False
+
+    def _write(self, frame):
+        frame.to_csv(self._file, header=not self._header_written, index=False)
+        self._header_written = True
+
+    def _close(self):
+        self._file.close()
+
+
+class ParquetExporter(ReportExporter):
+    format_name = "parquet"
+    extension = "parquet"
+
+    def _open(self):
+        self._writer = None
+
+    def _write(self, frame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(
+            frame.reindex(columns=REPORT_COLUMNS), preserve_index=False
+        ).cast(report_schema())
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(
+                self.path, report_schema(), compression="zstd"
+            )
+        self._writer.write_table(table)
+
+    def _close(self):
+        if self._writer is None:
+            import pyarrow.parquet as pq
+
+            pq.write_table(report_schema().empty_table(), self.path)
+        else:
+            self._writer.close()
+
+
+EXPORTERS = {
+    CsvGzipExporter.format_name: CsvGzipExporter,
+    ParquetExporter.format_name: ParquetExporter,
+}
+
+
+def export_report(
+    frames, dir_path: str, base_name: str, export_format: str
+) -> ExportResult:
+    with EXPORTERS[export_format](dir_path, base_name) as exporter:
+        for frame in frames:
+            exporter.write(frame)
+    return exporter.result()
@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+
+import pandas as pd
+
+# Any change to these fields invalidates a volume's carried-forward result.
+CONFIG_COLUMNS = ["VolumeType", "Size", "Iops", "Throughput", "State", "Region"]
+
+
+def config_hashes(volumes: pd.DataFrame) -> pd.Series:
+    config = pd.DataFrame(
+        {
+            column: (
+                volumes[column].fillna(0).astype("int64")
+                if column in ("Size", "Iops", "Throughput")
+                else volumes[column].astype(str)
+            )
+            for column in CONFIG_COLUMNS
+        }
+    )
+    # Stored as int64 so the hashes round-trip through JSON unchanged.
+    return pd.Series(
+        pd.util.hash_pandas_object(config, index=False).to_numpy().view("int64"),
+        index=volumes.index,
+        name="ConfigHash",
+    )
+
+
+def inventory(volumes: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "VolumeId": volumes["VolumeId"].astype(str).to_numpy(),
+            "ConfigHash": config_hashes(volumes).to_numpy(),
+        }
+    )
+
+
+@dataclass(frozen=True)
+class VolumeDelta:
+    previous_date: str
+    new: tuple
+    changed: tuple
+    deleted: tuple
+    unchanged_count: int
+
+    def to_dict(self) -> dict:
+        return {
+            "previous_date": self.previous_date,
+            "new": list(self.new),
+            "changed": list(self.changed),
+            "deleted": list(self.deleted),
+            "unchanged_count": self.unchanged_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            previous_date=data["previous_date"],
+            new=tuple(data["new"]),
+            changed=tuple(data["changed"]),
+            deleted=tuple(data["deleted"]),
+            unchanged_count=data["unchanged_count"],
+        )
+
+    def summary(self) -> dict:
+        return {
+            "new_volumes_count": len(self.new),
+            "changed_volumes_count": len(self.changed),
+            "deleted_volumes_count": len(self.deleted),
+            "unchanged_volumes_count": self.unchanged_count,
+        }
+
+
+def unchanged_volume_ids(volumes: pd.DataFrame, previous: pd.DataFrame) -> set:
+    previous_hashes = previous.set_index("VolumeId")["ConfigHash"]
+    current = inventory(volumes)
+    matches = (
+        current["ConfigHash"].to_numpy()
+        == previous_hashes.reindex(current["VolumeId"]).to_numpy()
+    )
+    return set(current["VolumeId"][matches])
+
+
+def diff_inventories(
+    current: pd.DataFrame, previous: pd.DataFrame, previous_date: str
+) -> VolumeDelta:
+    merged = current.merge(
+        previous, on="VolumeId", how="outer", suffixes=("", "Previous"), indicator=True
+    )
+    both = merged["_merge"] == "both"
+    changed = both & (merged["ConfigHash"] != merged["ConfigHashPrevious"])
+    return VolumeDelta(
+        previous_date=previous_date,
+        new=tuple(merged.loc[merged["_merge"] == "left_only", "VolumeId"]),
+        changed=tuple(merged.loc[changed, "VolumeId"]),
+        deleted=tuple(merged.loc[merged["_merge"] == "right_only", "VolumeId"]),
+        unchanged_count=int((both & ~changed).sum()),
+    )
@@ -0,0 +1,171 @@
+import json
+import os
+import re
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _metric_key(name: str, labels: dict | None) -> tuple:
+    return name, tuple(sorted((labels or {}).items()))
+
+
+def _prometheus_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _prometheus_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{_prometheus_name(key)}="'
+        + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        + '"'
+        for key, value in sorted(labels.items())
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Instrumentation:
+    """Stage spans, counters and gauges for one report run.
+
+    Every recorded value is also passed to each hook as
+    ``hook(kind, name, value, labels)``, with ``kind`` one of "span",
+    "counter" or "gauge", so external collectors can be plugged in.
+    """
+
+    def __init__(self, labels: dict | None = None, hooks: list | None = None):
+        self.labels = dict(labels or {})
+        self.hooks = list(hooks or [])
+        self.spans = dict()
+        self.counters = dict()
+        self.gauges = dict()
+        self._lock = threading.Lock()
+
+    def _emit(self, kind: str, name: str, value: float, labels: dict | None):
+        for hook in self.hooks:
+            try:
+                hook(kind, name, value, {**self.labels, **(labels or {})})
+            except Exception as e:
+                print(f"Instrumentation hook failed: {e}")
+
+    @contextmanager
+    def span(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - started)
+
+    def add_span(self, name: str, seconds: float):
+        with self._lock:
+            span = self.spans.setdefault(name, {"seconds": 0.0, "count": 0})
+            span["seconds"] += seconds
+            span["count"] += 1
+        self._emit("span", name, seconds, None)
+        self.gauge("peak_rss_bytes", peak_rss_bytes())
+
+    def timed(self, iterable, name: str):
+        """Yield from ``iterable``, adding the time spent producing each item
+        to the ``name`` span."""
+        iterator = iter(iterable)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_span(name, time.perf_counter() - started)
+                return
+            self.add_span(name, time.perf_counter() - started)
+            yield item
+
+    def incr(self, name: str, value: float = 1, labels: dict | None = None):
+        key = _metric_key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self._emit("counter", name, value, labels)
+
+    def gauge(self, name: str, value: float, labels: dict | None = None):
+        with self._lock:
+            self.gauges[_metric_key(name, labels)] = value
+        self._emit("gauge", name, value, labels)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "labels": dict(self.labels),
+                "spans": {
+                    name: {"seconds": round(span["seconds"], 6), "count": span["count"]}
+                    for name, span in self.spans.items()
+                },
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self.counters.items()
+                ],
+                "gauges": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self.gauges.items()
+                ],
+            }
+
+    def to_prometheus(self, prefix: str = "reporter") -> str:
+        data = self.to_dict()
+        lines = list()
+
+        def family(name, kind, samples):
+            name = _prometheus_name(f"{prefix}_{name}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                labels = _prometheus_labels({**data["labels"], **labels})
+                lines.append(f"{name}{labels} {value}")
+
+        if data["spans"]:
+            spans = data["spans"].items()
+            family(
+                "stage_seconds",
+                "gauge",
+                [({"stage": name}, span["seconds"]) for name, span in spans],
+            )
+            family(
+                "stage_calls",
+                "gauge",
+                [({"stage": name}, span["count"]) for name, span in spans],
+            )
+        for kind, metrics, suffix in (
+            ("counter", data["counters"], "_total"),
+            ("gauge", data["gauges"], ""),
+        ):
+            grouped = dict()
+            for metric in metrics:
+                grouped.setdefault(metric["name"], []).append(
+                    (metric["labels"], metric["value"])
+                )
+            for name, samples in grouped.items():
+                family(f"{name}{suffix}", kind, samples)
+        return "\n".join(lines) + "\n"
+
+    def write(self, dir_path: str, base_name: str, prefix: str = "reporter") -> list:
+        """Write ``base_name``.json and ``base_name``.prom (Prometheus textfile
+        collector format) into ``dir_path``; returns both paths."""
+        os.makedirs(dir_path, exist_ok=True)
+        paths = list()
+        for extension, content in (
+            ("json", json.dumps(self.to_dict(), indent=2)),
+            ("prom", self.to_prometheus(prefix)),
+        ):
+            path = os.path.join(dir_path, f"{base_name}.{extension}")
+            # The textfile collector may read at any time, so replace atomically.
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w") as file:
+                file.write(content)
+            os.replace(temp_path, path)
+            paths.append(path)
+        return paths
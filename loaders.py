@@ -0,0 +1,91 @@
+import json
+import os
+import re
+from itertools import islice
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def region_file_path(dir_path: str, region: str, file_name: str) -> str:
+    # Same layout load_service_data_v2 reads: <accountID>/<date>/<region>/<file>.
+    return os.path.join(dir_path, region, file_name)
+
+
+def iter_service_data(
+    dir_path: str,
+    file_name: str,
+    root_element: str,
+    enabled_regions,
+    streaming: bool = False,
+):
+    """Yield the items under ``root_element`` of every region's file one by one.
+
+    The streaming counterpart of utils.utils.load_service_data_v2: same files,
+    same items, each tagged with its ``Region``.
+
+    With ijson installed the files are parsed incrementally, so only the item
+    being yielded is held in memory; otherwise each region's file is loaded
+    in full before its items are yielded. ``streaming`` requires ijson, so a
+    streaming run never silently falls back to whole-file loads.
+    """
+    if streaming and ijson is None:
+        raise ImportError("Streaming inventories requires ijson (pip install ijson)")
+    for region in enabled_regions:
+        path = region_file_path(dir_path, region, file_name)
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as file:
+            if ijson is not None:
+                items = ijson.items(file, f"{root_element}.item", use_float=True)
+            else:
+                items = json.load(file).get(root_element, [])
+            for item in items:
+                item["Region"] = region
+                yield item
+
+
+def chunked(iterable, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
+
+
+ATTACHMENT_COLUMNS = [
+    "VolumeId",
+    "InstanceId",
+    "InstanceState",
+    "AttachTime",
+    "StoppedAt",
+    "Region",
+]
+# EC2 records when an instance was stopped only in its transition reason,
+# e.g. "User initiated (2024-05-01 10:00:00 GMT)".
+_TRANSITION_TIME = re.compile(r"\((\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) GMT\)")
+
+
+def stopped_at(instance: dict) -> str:
+    if instance["State"]["Name"] != "stopped":
+        return ""
+    match = _TRANSITION_TIME.search(instance.get("StateTransitionReason") or "")
+    return f"{match.group(1)}+00:00" if match else ""
+
+
+def attachment_rows(reservation: dict):
+    """One row per EBS volume of every instance in ``reservation``."""
+    for instance in reservation["Instances"]:
+        for mapping in instance.get("BlockDeviceMappings", []):
+            if not mapping.get("Ebs"):
+                continue
+            yield {
+                "VolumeId": mapping["Ebs"]["VolumeId"],
+                "InstanceId": instance["InstanceId"],
+                "InstanceState": instance["State"]["Name"],
+                "AttachTime": str(mapping["Ebs"].get("AttachTime", "")),
+                "StoppedAt": stopped_at(instance),
+                "Region": reservation["Region"],
+            }
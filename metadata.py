@@ -0,0 +1,73 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+from loaders import attachment_rows, iter_service_data
+from volumes import compact_volumes
+
+# Same keys and precedence as savings.CATEGORIES, which needs pandas.
+METADATA_CATEGORIES = [
+    "available_volumes",
+    "stopped_instance_volumes",
+    "zero_iops_volume",
+    "gp2_volumes",
+    "io1_volumes",
+    "io2_volumes",
+]
+# Categories decided by measured IOPS, which metadata alone cannot count.
+METRIC_CATEGORIES = ("zero_iops_volume", "io2_volumes")
+
+
+def long_stopped_volume_ids(reservations, stopped_before: datetime) -> set:
+    """Volumes whose instances were all stopped before ``stopped_before``."""
+    stopped = dict()
+    for reservation in reservations:
+        for row in attachment_rows(reservation):
+            stopped_at = (
+                datetime.fromisoformat(row["StoppedAt"]) if row["StoppedAt"] else None
+            )
+            stopped[row["VolumeId"]] = stopped.get(row["VolumeId"], True) and (
+                stopped_at is not None and stopped_at < stopped_before
+            )
+    return {volume_id for volume_id, is_stopped in stopped.items() if is_stopped}
+
+
+def count_categories(
+    account_id: str, date: str, enabled_regions, days: int = 14
+) -> dict:
+    """Count volumes per report category from volumes.json and instances.json
+    only, without pandas or CloudWatch.
+
+    Categories that need IOPS are None; gp2 and io1 counts still include the
+    volumes the full report would move to zero_iops_volume, and
+    io2_candidates counts the in-use io2 volumes an IOPS check would filter.
+    """
+    dir_path = os.path.join(account_id, date)
+    # The metric window CloudWatchMetrics uses: ``days`` up to midnight UTC.
+    now = datetime.now(timezone.utc).timestamp()
+    window_start = datetime.fromtimestamp(
+        now - now % 86400, tz=timezone.utc
+    ) - timedelta(days=days)
+    stopped_ids = long_stopped_volume_ids(
+        iter_service_data(dir_path, "instances.json", "Reservations", enabled_regions),
+        window_start,
+    )
+    counts = dict.fromkeys(METADATA_CATEGORIES, 0)
+    counts["io2_candidates"] = 0
+    total = 0
+    for volume in compact_volumes(
+        iter_service_data(dir_path, "volumes.json", "Volumes", enabled_regions)
+    ):
+        total += 1
+        if volume.State == "available":
+            counts["available_volumes"] += 1
+        elif volume.VolumeId in stopped_ids:
+            counts["stopped_instance_volumes"] += 1
+        elif volume.VolumeType == "gp2":
+            counts["gp2_volumes"] += 1
+        elif volume.VolumeType == "io1":
+            counts["io1_volumes"] += 1
+        elif volume.VolumeType == "io2":
+            counts["io2_candidates"] += 1
+    for category in METRIC_CATEGORIES:
+        counts[category] = None
+    return {"accountID": account_id, "date": date, "total_volumes": total, **counts}
@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+# Two days, so the previous day's window is still around to roll forward.
+DEFAULT_TTL = 2 * 24 * 60 * 60
+# Series kept when there is no SQLite file to hold them.
+DEFAULT_MEMORY_SERIES = 20000
+# Volume IDs per SELECT; older SQLite builds allow 999 bound parameters.
+LOAD_BATCH_SIZE = 500
+
+
+def encode_values(values: np.ndarray) -> bytes:
+    return zlib.compress(values.astype("<f8").tobytes(), 1)
+
+
+def decode_values(blob: bytes) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(blob), dtype="<f8")
+
+
+class MetricsCache:
+    """Series cache keyed by (account, region, volume, metric, window).
+
+    A series is the values of one window's aligned grid, so timestamps are
+    implied by the window; values are stored as zlib-compressed float64.
+
+    With a ``path``, series are persisted to a SQLite file so re-runs for the
+    same account reuse them until ``ttl`` seconds pass, and nothing is held
+    in memory. Without one, at most ``max_memory_series`` recently used
+    series are kept in memory.
+    """
+
+    def __init__(
+        self,
+        account_id: str,
+        path: str | None = None,
+        ttl: int = DEFAULT_TTL,
+        max_memory_series: int = DEFAULT_MEMORY_SERIES,
+    ):
+        self.account_id = account_id
+        self.path = path
+        self.ttl = ttl
+        self.max_memory_series = max_memory_series
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS metric_series (
+                    account_id TEXT NOT NULL,
+                    region TEXT NOT NULL,
+                    volume_id TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    window TEXT NOT NULL,
+                    series_values BLOB NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (account_id, region, volume_id, metric, window)
+                )
+                """
+            )
+            self.evict_expired()
+
+    def get_many(self, region: str, keys: list, window: str) -> dict:
+        with self._lock:
+            if self._connection is not None:
+                found = self._load(region, keys, window)
+            else:
+                found = dict()
+                for volume_id, metric in keys:
+                    cache_key = (region, volume_id, metric, window)
+                    if cache_key in self._memory:
+                        self._memory.move_to_end(cache_key)
+                        found[(volume_id, metric)] = decode_values(
+                            self._memory[cache_key]
+                        )
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, region: str, series: dict, window: str):
+        fetched_at = time.time()
+        with self._lock:
+            if self._connection is None:
+                for (volume_id, metric), values in series.items():
+                    cache_key = (region, volume_id, metric, window)
+                    self._memory[cache_key] = encode_values(values)
+                    self._memory.move_to_end(cache_key)
+                while len(self._memory) > self.max_memory_series:
+                    self._memory.popitem(last=False)
+                return
+            rows = [
+                (
+                    self.account_id,
+                    region,
+                    volume_id,
+                    metric,
+                    window,
+                    encode_values(values),
+                    fetched_at,
+                )
+                for (volume_id, metric), values in series.items()
+            ]
+            if rows:
+                with self._connection:
+                    self._connection.executemany(
+                        "INSERT OR REPLACE INTO metric_series "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+
+    def evict_expired(self):
+        if self._connection is None:
+            return
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM metric_series WHERE fetched_at < ?",
+                (time.time() - self.ttl,),
+            )
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _load(self, region: str, keys: list, window: str) -> dict:
+        found = dict()
+        oldest = time.time() - self.ttl
+        wanted = set(keys)
+        volume_ids = list(dict.fromkeys(volume_id for volume_id, _ in keys))
+        for offset in range(0, len(volume_ids), LOAD_BATCH_SIZE):
+            batch = volume_ids[offset : offset + LOAD_BATCH_SIZE]
+            rows = self._connection.execute(
+                "SELECT volume_id, metric, series_values FROM metric_series "
+                "WHERE account_id = ? AND region = ? AND window = ? "
+                "AND fetched_at >= ? "
+                f"AND volume_id IN ({', '.join('?' * len(batch))})",
+                (self.account_id, region, window, oldest, *batch),
+            )
+            for volume_id, metric, blob in rows:
+                if (volume_id, metric) in wanted:
+                    found[(volume_id, metric)] = decode_values(blob)
+        return found
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+
+PRICING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pricing.json")
+
+_DYNAMODB_SCHEMA = {
+    "PROVISIONED": {
+        "STANDARD": {
+            "perWriteCapacityUnitPerHr": None,
+            "perReadCapacityUnitPerHr": None,
+            "perGBperMnth": None,
+        },
+        "STANDARD-IA": {
+            "perWriteCapacityUnitPerHr": None,
+            "perReadCapacityUnitPerHr": None,
+            "perGBperMnth": None,
+        },
+    },
+    "ON-DEMAND": {
+        "STANDARD": {
+            "perWriteRequestUnit": None,
+            "perReadRequestUnit": None,
+            "perGBperMnth": None,
+        },
+        "STANDARD-IA": {
+            "perWriteRequestUnit": None,
+            "perReadRequestUnit": None,
+            "perGBperMnth": None,
+        },
+    },
+}
+# Expected per-region structure of every service; None marks a numeric price.
+SCHEMA = {
+    "AWSEBS": {
+        "gp3_perGB": None,
+        "gp3_iops": None,
+        "gp3_throughput": None,
+        "gp2_perGB": None,
+        "io2_perGB": None,
+        "io2_iops": {"0_to_32k": None, "32k_to_64k": None, "64k_greater": None},
+        "io1_perGB": None,
+        "io1_iops": None,
+    },
+    "AWSVPN": {"perMonth": None},
+    "AWSElasticIP": {"perMonth": None},
+    "AWSKubernetes": {"standard": None, "extendedSupport": None},
+    "ELB": {"application": None, "network": None, "gateway": None, "classic": None},
+    "AWSDynamoDB": _DYNAMODB_SCHEMA,
+}
+# Misspellings accepted in pricing.json, mapped to their schema key.
+KEY_ALIASES = {"gp3_throughtput": "gp3_throughput"}
+
+
+class PricingSchemaError(ValueError):
+    pass
+
+
+def _flatten(schema: dict, prefix: str = "") -> list:
+    fields = list()
+    for key, value in schema.items():
+        if value is None:
+            fields.append(f"{prefix}{key}")
+        else:
+            fields.extend(_flatten(value, f"{prefix}{key}."))
+    return fields
+
+
+def _validate(prices, schema: dict, path: str, errors: list):
+    if not isinstance(prices, dict):
+        errors.append(f"{path}: expected an object")
+        return
+    prices = {KEY_ALIASES.get(key, key): value for key, value in prices.items()}
+    for key in prices.keys() - schema.keys():
+        errors.append(f"{path}.{key}: unexpected key")
+    for key, expected in schema.items():
+        if key not in prices:
+            errors.append(f"{path}.{key}: missing")
+        elif expected is None:
+            value = prices[key]
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                errors.append(f"{path}.{key}: expected a number, got {value!r}")
+        else:
+            _validate(prices[key], expected, f"{path}.{key}", errors)
+
+
+def _lookup(prices: dict, field: str) -> float:
+    for key in field.split("."):
+        prices = {KEY_ALIASES.get(name, name): value for name, value in prices.items()}
+        prices = prices[key]
+    return float(prices)
+
+
+class ServicePricing:
+    """Prices of one service as a (region x field) float array."""
+
+    def __init__(self, regions: list, fields: list, values: np.ndarray):
+        self.regions = tuple(regions)
+        self.fields = tuple(fields)
+        self.values = values
+        self.region_index = {region: index for index, region in enumerate(regions)}
+        self.field_index = {field: index for index, field in enumerate(fields)}
+
+    def price(self, region: str, field: str) -> float:
+        return self.values[self.region_index[region], self.field_index[field]]
+
+    def unpriced(self, regions) -> np.ndarray:
+        """Mask of ``regions`` that have no prices."""
+        return ~np.isin(np.asarray(regions, dtype=object), self.regions)
+
+    def column(self, field: str) -> np.ndarray:
+        return self.values[:, self.field_index[field]]
+
+    def rows(self, regions) -> np.ndarray:
+        """Price rows for ``regions``; unknown regions get NaN prices, so their
+        costs and savings come out unknown rather than zero."""
+        table = np.vstack([self.values, np.full(len(self.fields), np.nan)])
+        return table[
+            [self.region_index.get(region, len(self.regions)) for region in regions]
+        ]
+
+    def with_fields(self, derived: dict):
+        columns = [self.values] + [
+            np.asarray(values).reshape(-1, 1) for values in derived.values()
+        ]
+        return ServicePricing(
+            self.regions, [*self.fields, *derived], np.hstack(columns)
+        )
+
+
+def _derive_ebs(ebs: ServicePricing) -> ServicePricing:
+    io1_iops = ebs.column("io1_iops")
+    return ebs.with_fields(
+        {
+            "gp2_to_gp3_perGB": ebs.column("gp2_perGB") - ebs.column("gp3_perGB"),
+            "io1_to_gp3_perGB": ebs.column("io1_perGB") - ebs.column("gp3_perGB"),
+            "io1_to_io2_perGB": ebs.column("io1_perGB") - ebs.column("io2_perGB"),
+            "io1_to_io2_iops.0_to_32k": io1_iops - ebs.column("io2_iops.0_to_32k"),
+            "io1_to_io2_iops.32k_to_64k": io1_iops
+            - ebs.column("io2_iops.32k_to_64k"),
+            "io1_to_io2_iops.64k_greater": io1_iops
+            - ebs.column("io2_iops.64k_greater"),
+            "io2_to_gp3_perGB": ebs.column("io2_perGB") - ebs.column("gp3_perGB"),
+        }
+    )
+
+
+class PricingIndex:
+    def __init__(self, services: dict, version: str = ""):
+        self.services = services
+        # Hash of the source prices, so results can be tied to them.
+        self.version = version
+
+    def __getitem__(self, service_name: str) -> ServicePricing:
+        return self.services[service_name]
+
+    @property
+    def ebs(self) -> ServicePricing:
+        return self.services["AWSEBS"]
+
+
+def compile_pricing(pricing: dict) -> PricingIndex:
+    errors = list()
+    for service_name, schema in SCHEMA.items():
+        if service_name not in pricing:
+            errors.append(f"{service_name}: missing")
+            continue
+        for region, prices in pricing[service_name].items():
+            _validate(prices, schema, f"{service_name}.{region}", errors)
+    if errors:
+        raise PricingSchemaError("Invalid pricing: " + "; ".join(errors))
+
+    services = dict()
+    for service_name, schema in SCHEMA.items():
+        fields = _flatten(schema)
+        regions = list(pricing[service_name])
+        values = np.array(
+            [
+                [_lookup(pricing[service_name][region], field) for field in fields]
+                for region in regions
+            ],
+            dtype=float,
+        ).reshape(len(regions), len(fields))
+        services[service_name] = ServicePricing(regions, fields, values)
+    services["AWSEBS"] = _derive_ebs(services["AWSEBS"])
+    version = hashlib.sha1(json.dumps(pricing, sort_keys=True).encode()).hexdigest()
+    return PricingIndex(services, version)
+
+
+@lru_cache(maxsize=None)
+def load_pricing(path: str = PRICING_PATH) -> PricingIndex:
+    """Compile ``path`` once per process."""
+    with open(path) as file:
+        return compile_pricing(json.load(file))
@@ -0,0 +1,94 @@
+import heapq
+import os
+from functools import lru_cache
+
+TEMPLATE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_TEMPLATE = "reporter.html"
+DEFAULT_ROW_LIMIT = 500
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+
+
+class RenderBudgetExceeded(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def get_environment():
+    # Imported here so runs that never render HTML skip loading jinja2.
+    from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+    # Compiled templates are kept in memory by the environment and as bytecode
+    # on disk, so short-lived processes skip recompiling reporter.html. Without
+    # a directory Jinja uses its own per-user cache directory and checks its
+    # ownership and permissions.
+    return Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=True,
+        auto_reload=False,
+        bytecode_cache=FileSystemBytecodeCache(),
+    )
+
+
+def limit_rows(report: dict, row_limit: int, attachment: str | None = None) -> dict:
+    """Keep the ``row_limit`` rows with the highest SavingsPossible per table."""
+    report_data = dict(report.get("report_data", {}))
+    for table_name in report_data.get("table_names", []):
+        table = report_data.get(table_name)
+        if not table or len(table.get("data", [])) <= row_limit:
+            continue
+        report_data[table_name] = {
+            **table,
+            "data": heapq.nlargest(
+                row_limit, table["data"], key=lambda row: row.get("SavingsPossible", 0)
+            ),
+            "total_rows": table.get("total_rows", len(table["data"])),
+            "attachment": attachment or table.get("attachment"),
+        }
+    return {**report, "report_data": report_data}
+
+
+class ReportRenderer:
+    """Streams reporter.html to disk under a row cap and an output byte budget."""
+
+    def __init__(
+        self,
+        template_name: str = DEFAULT_TEMPLATE,
+        row_limit: int = DEFAULT_ROW_LIMIT,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        self.template = get_environment().get_template(template_name)
+        self.row_limit = row_limit
+        self.max_bytes = max_bytes
+
+    def render_to_file(self, reports: list, path: str, attachment: str | None = None):
+        """Render ``reports`` into ``path``, halving the row cap until the
+        output fits in ``max_bytes``. Returns the row cap that was used."""
+        row_limit = self.row_limit
+        while True:
+            limited = [limit_rows(report, row_limit, attachment) for report in reports]
+            try:
+                self._write(path, {"reports": limited})
+                return row_limit
+            except RenderBudgetExceeded:
+                if row_limit == 0:
+                    raise
+                row_limit //= 2
+
+    def _write(self, path: str, context: dict):
+        written = 0
+        temp_path = f"{path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        try:
+            with open(temp_path, "wb") as file:
+                for chunk in self.template.generate(context):
+                    data = chunk.encode("utf-8")
+                    written += len(data)
+                    if written > self.max_bytes:
+                        raise RenderBudgetExceeded(
+                            f"{path} exceeds the {self.max_bytes} byte budget"
+                        )
+                    file.write(data)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
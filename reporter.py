@@ -1,503 +1,466 @@
+import hashlib
+import json
 import os
 import pandas as pd
 from datetime import datetime, timedelta
+from functools import cached_property
 import sys
-
-sys.path.append(
-    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-)
-from utils.connection import AWSConnection
-from settings.config import EBS_PRICING
-from settings.models import AWSProfile
-from utils.email_handler import email_handler
-from utils.utils import load_service_data_v2, generate_report
+from typing import TYPE_CHECKING
+
+# settings/ and utils/ live in the project root, which cli.configure_path
+# puts on sys.path; they are only imported where they are used.
+if TYPE_CHECKING:
+    from settings.models import AWSProfile
+from client_pool import client_pool
+from savings import CATEGORIES, REPORT_COLUMNS, SavingsEngine, volumes_frame
+from analysis import AnalysisCache, EBSAnalysis, analysis_cache
+from loaders import DEFAULT_CHUNK_SIZE, chunked, iter_service_data
+from incremental import diff_inventories, inventory, unchanged_volume_ids
+from rendering import DEFAULT_MAX_BYTES, DEFAULT_ROW_LIMIT, ReportRenderer
+from exporters import export_report
+from attachments import AttachmentIndex, created_after
+from volumes import compact_volumes, volume_records
+from service_context import ServiceContext
+from delivery import Delivery
+
+# Set to replace utils.email_handler, e.g. by the benchmark's stub.
+email_handler = None
+
+
+def get_email_handler():
+    if email_handler is not None:
+        return email_handler
+    from utils.email_handler import email_handler as handler
+
+    return handler
+
+
+TABLE_MESSAGES = {
+    "available_volumes": "List of all available volumes across the organization.",
+    "stopped_instance_volumes": "List of all volumes across the organization attached to instances stopped for over 14 days.",
+    "zero_iops_volume": "List of all volumes across the organization that are unused from last 7 days.",
+    "gp2_volumes": "List of all gp2 volumes across the organization that can be converted to gp3.",
+    "io1_volumes": "List of all io1 volumes across the organization that can be converted to io2.",
+    "io2_volumes": "List of all io2 volumes across the organization that can be converted to gp3.",
+}
+ATTACHMENT_ORDER = [
+    "available_volumes",
+    "stopped_instance_volumes",
+    "gp2_volumes",
+    "io1_volumes",
+    "zero_iops_volume",
+    "io2_volumes",
+]
 
 
 class EBSReport:
-    def __init__(self, account: AWSProfile, date: str):
+    def __init__(
+        self,
+        account: "AWSProfile",
+        date: str,
+        max_concurrent_regions: int = 8,
+        max_concurrent_requests: int = 4,
+        streaming: bool = False,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        source: str = "json",
+        incremental: bool = False,
+        previous_date: str | None = None,
+        export_format: str | None = None,
+        hooks: list | None = None,
+        context: ServiceContext | None = None,
+        persist: bool = True,
+    ):
         self.account = account
         self.date = date
         self.service_name = "ebs"
-        self.data = load_service_data_v2(
-            dir_path=os.path.join(account.accountID, date),
-            file_name="volumes.json",
-            root_element="Volumes",
-            enabled_regions=account.aws_enabled_regions,
-        )
-
-    def get_volume_iops(self, volume_id, region) -> list | int:
-        read_iops = self.get_iops_details(
-            volume_id, metrics_name="VolumeReadOps", stats="Maximum", region=region
+        # Shared with the other services' reports when run from the engine.
+        self.context = context or ServiceContext(
+            account,
+            date,
+            max_concurrent_regions=max_concurrent_regions,
+            max_concurrent_requests=max_concurrent_requests,
+            client_pool=client_pool,
+            hooks=hooks,
+            labels={"service": self.service_name},
+            persist=persist,
         )
-        write_iops = self.get_iops_details(
-            volume_id, metrics_name="VolumeWriteOps", stats="Maximum", region=region
+        # Dry runs keep the analysis in memory instead of ebs_analysis.json.
+        self.analysis_cache = (
+            analysis_cache if self.context.persist else AnalysisCache(persist=False)
         )
-        iops = read_iops + write_iops
-        return iops  # TODO: Get the read and write IOPS of same time and return the sum
-
-    def get_iops_details(self, volume_id, metrics_name, stats, region) -> list | bool:
-        try:
-            cloudwatch_client = AWSConnection(
-                service_name="cloudwatch", region=region, account=self.account
-            ).client()
-            response = cloudwatch_client.get_metric_statistics(
-                Namespace="AWS/EBS",
-                MetricName=metrics_name,
-                Dimensions=[
-                    {"Name": "VolumeId", "Value": volume_id},
-                ],
-                StartTime=datetime.now() - timedelta(days=14),
-                EndTime=datetime.now(),
-                Period=86400,
-                Statistics=[stats],
-            )
-            if stats == "Maximum":
-                datapoints_max = (
-                    max([datapoint["Maximum"] for datapoint in response["Datapoints"]])
-                    if response["Datapoints"]
-                    else 0
-                )
-                return datapoints_max
-            elif stats == "Sum":
-                datapoints_sum = (
-                    sum([datapoint["Sum"] for datapoint in response["Datapoints"]])
-                    if response["Datapoints"]
-                    else 0
+        self.instrumentation = self.context.instrumentation
+        self.streaming = streaming
+        self.chunk_size = chunk_size
+        self.source = source
+        self.incremental = incremental
+        self.export_format = export_format
+        self.export_results = list()
+        self.previous_date = previous_date or (
+            datetime.strptime(date, "%Y-%m-%d") - timedelta(days=1)
+        ).strftime("%Y-%m-%d")
+        self.metrics_cache = self.context.metrics_cache
+        self.client_pool = self.context.client_pool
+        self.metrics = self.context.metrics
+        self.savings_engine = SavingsEngine(self.context.pricing)
+
+    @property
+    def data(self) -> list:
+        # Only compact records are kept; the boto-shaped dicts are dropped.
+        return self.context.inventory("volumes.json", "Volumes", volume_records)
+
+    @cached_property
+    def attachment_index(self) -> AttachmentIndex:
+        with self.instrumentation.span("attachments"):
+            if self.source == "snapshot":
+                return AttachmentIndex.load(
+                    self.account.accountID,
+                    self.date,
+                    self.account.aws_enabled_regions,
+                    source=self.source,
                 )
-            return datapoints_sum
-        except Exception as e:
-            print(f"{e}")
-            return 0
-
-    @staticmethod
-    def create_volume_df(volumes, recommendation_msg):
-        data = [
-            {
-                "VolumeId": volume["VolumeId"],
-                "Size": volume["Size"],
-                "VolumeType": volume["VolumeType"],
-                "Iops": volume["Iops"],
-                "Throughput": volume.get("Throughput", 0),
-                "State": volume["State"],
-                "CreateTime": volume["CreateTime"],
-                "AvailabilityZone": volume["AvailabilityZone"],
-                "SnapshotId": volume["SnapshotId"],
-                "SavingsPossible": volume["Savings"],
-                "Region": volume.get("Region", ""),
-                "Recommendation": volume.get("Recommendation", recommendation_msg),
-            }
-            for volume in volumes
-        ]
-        return pd.DataFrame(data)
-
-    def calculate_savings(self, volumes: list):
-        for volume in volumes:
-            savings = 0
-            if volume["VolumeType"] == "gp2":
-                savings = volume["Size"] * EBS_PRICING[volume["Region"]]["gp2_perGB"]
-            elif volume["VolumeType"] in ["io1", "io2"]:
-                savings = volume["Size"] * EBS_PRICING[volume["Region"]]["io1_perGB"]
-                savings += volume["Iops"] * EBS_PRICING[volume["Region"]]["io1_iops"]
-            elif volume["VolumeType"] == "gp3":
-                savings = volume["Size"] * EBS_PRICING[volume["Region"]]["gp3_perGB"]
-                if volume["Iops"] > 3000:
-                    savings += (volume["Iops"] - 3000) * EBS_PRICING[volume["Region"]][
-                        "gp3_iops"
-                    ]
-                if volume["Throughput"] > 125:
-                    savings += (volume["Throughput"] - 125) * EBS_PRICING[
-                        volume["Region"]
-                    ]["gp3_throughput"]
-            volume["Savings"] = savings
-        return volumes
-
-    def send_report(self):
-        volume_ids_from_instances = set()
-        available_volumes = list()
-        zero_iops_volume = list()
-        gp2_volumes = list()
-        io1_volumes = list()
-        io2_volumes = list()
-
-        instance_data = load_service_data_v2(
-            dir_path=os.path.join(self.account.accountID, self.date),
-            file_name="instances.json",
-            root_element="Reservations",
-            enabled_regions=self.account.aws_enabled_regions,
-        )
-
-        for iData in instance_data:
-            for attachments in iData["Instances"][0]["BlockDeviceMappings"]:
-                if attachments.get("Ebs"):
-                    volume_ids_from_instances.add(attachments["Ebs"]["VolumeId"])
-
-        for volume_data in self.data:
-
-            if volume_data["State"] == "available":
-                available_volumes.append(volume_data)
-            elif (
-                self.get_volume_iops(volume_data["VolumeId"], volume_data["Region"])
-                == 0
-            ):
-                zero_iops_volume.append(volume_data)
-            elif volume_data["VolumeType"] == "gp2":
-                gp2_volumes.append(volume_data)
-            elif volume_data["VolumeType"] == "io1":
-                io1_volumes.append(volume_data)
-            elif (
-                volume_data["VolumeType"] == "io2"
-                and self.get_volume_iops(volume_data["VolumeId"], volume_data["Region"])
-                <= 2500
-            ):
-                io2_volumes.append(volume_data)
-
-        available_volumes = self.calculate_savings(available_volumes)
-        zero_iops_volume = self.calculate_savings(zero_iops_volume)
-
-        for volume in io1_volumes:
-            savings = volume["Size"] * (
-                EBS_PRICING[volume["Region"]]["io1_perGB"]
-                - EBS_PRICING[volume["Region"]]["io2_perGB"]
+            return self.context.inventory(
+                "instances.json",
+                "Reservations",
+                AttachmentIndex.from_reservations,
+                streaming=self.streaming,
             )
-            if self.get_volume_iops(volume["VolumeId"], volume["Region"]) <= 2500:
-                savings = volume["Size"] * (
-                    EBS_PRICING[volume["Region"]]["io1_perGB"]
-                    - EBS_PRICING[volume["Region"]]["gp3_perGB"]
-                ) + volume["Iops"] * (EBS_PRICING[volume["Region"]]["io1_iops"])
-                volume["Recommendation"] = (
-                    "Can be converted to gp3, because it have less than 2500 IOPS"
-                )
 
-            elif volume["Iops"] <= 32000:
-                savings += (
-                    volume["Iops"] * EBS_PRICING[volume["Region"]]["io1_iops"]
-                    - volume["Iops"]
-                    * EBS_PRICING[volume["Region"]]["io2_iops"]["0_to_32k"]
-                )
-            elif volume["Iops"] in range(32001, 64001):
-                savings += (
-                    32000 * EBS_PRICING[volume["Region"]]["io1_iops"]
-                    - 32000 * EBS_PRICING[volume["Region"]]["io2_iops"]["0_to_32k"]
-                )
-                left_iops = volume["Iops"] - 32000
-                savings += (
-                    left_iops * EBS_PRICING[volume["Region"]]["io1_iops"]
-                    - left_iops
-                    * EBS_PRICING[volume["Region"]]["io2_iops"]["32k_to_64k"]
-                )
-            elif volume["Iops"] > 64000:
-                savings += (
-                    32000 * EBS_PRICING[volume["Region"]]["io1_iops"]
-                    - 32000 * EBS_PRICING[volume["Region"]]["io2_iops"]["0_to_32k"]
-                )
-                savings += (
-                    32000 * EBS_PRICING[volume["Region"]]["io1_iops"]
-                    - 32000 * EBS_PRICING[volume["Region"]]["io2_iops"]["32k_to_64k"]
+    def iter_volume_chunks(self):
+        if not self.streaming:
+            yield self.data
+            return
+        yield from chunked(
+            compact_volumes(
+                iter_service_data(
+                    dir_path=os.path.join(self.account.accountID, self.date),
+                    file_name="volumes.json",
+                    root_element="Volumes",
+                    enabled_regions=self.account.aws_enabled_regions,
+                    streaming=True,
                 )
-                left_iops = volume["Iops"] - 64000
-                savings += (
-                    left_iops * EBS_PRICING[volume["Region"]]["io1_iops"]
-                    - left_iops
-                    * EBS_PRICING[volume["Region"]]["io2_iops"]["64k_greater"]
-                )
-            volume["Savings"] = savings
-
-        for volume in io2_volumes:
-            volume["Savings"] = volume["Size"] * (
-                EBS_PRICING[volume["Region"]]["io2_perGB"]
-                - EBS_PRICING[volume["Region"]]["gp3_perGB"]
-            ) + volume["Iops"] * (EBS_PRICING[volume["Region"]]["io2_iops"]["0_to_32k"])
-
-        for volume in gp2_volumes:
-            savings = (
-                volume["Size"] * EBS_PRICING[volume["Region"]]["gp2_perGB"]
-                - volume["Size"] * EBS_PRICING[volume["Region"]]["gp3_perGB"]
-            )
-            if volume["Iops"] > 3000:
-                savings -= volume["Iops"] * EBS_PRICING[volume["Region"]]["gp3_iops"]
-            if volume.get("Throughput", 0) > 125:
-                savings -= (
-                    volume["Throughput"]
-                    * EBS_PRICING[volume["Region"]]["gp3_throughput"]
-                )
-            volume["Savings"] = savings
-
-        available_volumes_df = self.create_volume_df(
-            available_volumes, "Can be removed because the volume is available"
-        )
-        zero_iops_volume_df = self.create_volume_df(
-            zero_iops_volume,
-            "Can be removed, because it have zero IOPS for last 14 days",
-        )
-        gp2_volumes_df = self.create_volume_df(
-            gp2_volumes,
-            "Can be converted to gp3, because gp3 is more cost-effective than gp2",
-        )
-        io1_volumes_df = self.create_volume_df(
-            io1_volumes, "Can be converted to io2, io2 is more efficient than io1"
+            ),
+            self.chunk_size,
         )
-        io2_volumes_df = self.create_volume_df(
-            io2_volumes, "Can be converted to gp3, because it have less than 2500 IOPS"
+
+    def iter_volume_frames(self):
+        if self.source == "snapshot":
+            from snapshots import SnapshotStore
+
+            store = SnapshotStore(self.account.accountID, self.date)
+            if not store.is_current(self.account.aws_enabled_regions):
+                store.ingest(self.account.aws_enabled_regions, self.chunk_size)
+            yield from store.iter_volume_frames()
+            return
+        for chunk in self.iter_volume_chunks():
+            yield volumes_frame(chunk)
+
+    def get_volume_iops(self, volume_id, region) -> int | None:
+        return self.metrics.get_region_iops(region, [volume_id]).get(volume_id)
+
+    def get_volumes_iops(self, volumes=None) -> dict:
+        return self.metrics.get_volumes_iops(
+            volume
+            for volume in (self.data if volumes is None else volumes)
+            if volume["State"] != "available"
         )
 
-        unoptimized_volume_df = pd.concat(
+    def get_frame_iops(
+        self, volumes: pd.DataFrame, rolling_ids=frozenset()
+    ) -> pd.DataFrame:
+        """IOPS and throughput statistics of the in-use ``volumes``.
+
+        io1/io2 volumes are measured at the metrics' fine period, since their
+        gp3 recommendation depends on peaks that hourly datapoints flatten.
+        """
+        in_use = volumes[volumes["State"] != "available"]
+        rolling = in_use["VolumeId"].isin(rolling_ids).to_numpy()
+        fine = in_use["VolumeType"].isin(["io1", "io2"]).to_numpy()
+        # Unchanged volumes only need the newest day to roll their window.
+        return pd.concat(
             [
-                available_volumes_df,
-                gp2_volumes_df,
-                io1_volumes_df,
-                zero_iops_volume_df,
-                io2_volumes_df,
+                self.metrics.get_stats_by_region(
+                    {
+                        str(region): region_group["VolumeId"].tolist()
+                        for region, region_group in in_use[selected].groupby(
+                            "Region", observed=True
+                        )
+                    },
+                    rolling=is_rolling,
+                    period=self.metrics.fine_period if is_fine else None,
+                )
+                for is_fine in (False, True)
+                for is_rolling in (False, True)
+                if (selected := (fine == is_fine) & (rolling == is_rolling)).any()
             ]
+            or [self.metrics.get_stats_by_region({})]
         )
-        report_file_path = generate_report(
-            os.path.join(self.account.accountID, self.date),
-            unoptimized_volume_df,
-            f"ebs_report_{self.date}",
-        )
-        template = email_handler.get_template(self.service_name)
-        context = {
-            "accountID": self.account.accountID,
-            "available_volumes_count": len(available_volumes),
-            "zero_iops_volumes_count": len(zero_iops_volume),
-            "gp2_volumes_count": len(gp2_volumes),
-            "io1_volumes_count": len(io1_volumes),
-            "io2_volumes_count": len(io2_volumes),
-            "available_volumes_size": (
-                round(available_volumes_df["Size"].sum(), 2)
-                if not available_volumes_df.empty
-                else 0
-            ),
-            "zero_iops_volumes_size": (
-                round(zero_iops_volume_df["Size"].sum(), 2)
-                if not zero_iops_volume_df.empty
-                else 0
-            ),
-            "gp2_volumes_size": (
-                round(gp2_volumes_df["Size"].sum(), 2)
-                if not gp2_volumes_df.empty
-                else 0
-            ),
-            "io1_volumes_size": (
-                round(io1_volumes_df["Size"].sum(), 2)
-                if not io1_volumes_df.empty
-                else 0
-            ),
-            "io2_volumes_size": (
-                round(io2_volumes_df["Size"].sum(), 2)
-                if not io2_volumes_df.empty
-                else 0
-            ),
-            "available_volumes_saving": (
-                round(available_volumes_df["SavingsPossible"].sum(), 2)
-                if not available_volumes_df.empty
-                else 0
-            ),
-            "zero_iops_volumes_saving": (
-                round(zero_iops_volume_df["SavingsPossible"].sum(), 2)
-                if not zero_iops_volume_df.empty
-                else 0
-            ),
-            "gp2_volumes_saving": (
-                round(gp2_volumes_df["SavingsPossible"].sum(), 2)
-                if not gp2_volumes_df.empty
-                else 0
-            ),
-            "io1_volumes_saving": (
-                round(io1_volumes_df["SavingsPossible"].sum(), 2)
-                if not io1_volumes_df.empty
-                else 0
-            ),
-            "io2_volumes_saving": (
-                round(io2_volumes_df["SavingsPossible"].sum(), 2)
-                if not io2_volumes_df.empty
-                else 0
-            ),
-            "total_price_saved": (
-                round(unoptimized_volume_df["SavingsPossible"].sum(), 2)
-                if not unoptimized_volume_df.empty
-                else 0
-            ),
-        }
-        rendered_template = template.render(context)
-        email_handler.send_mail(
-            recipients=self.account.recipients,
-            subject="EBS Optimizer Report",
-            messages=[rendered_template],
-            attachments=[report_file_path],
+
+    def build_analysis(self) -> EBSAnalysis:
+        previous = (
+            self.analysis_cache.load(self.account.accountID, self.previous_date)
+            if self.incremental
+            else None
         )
+        previous_inventory = previous.inventory if previous is not None else None
+
+        # Only the reported rows of each chunk are kept, so in streaming mode
+        # memory is bounded by chunk_size raw volumes plus the result frame.
+        evaluated = list()
+        inventories = list()
+        instrumentation = self.instrumentation
+        for volumes in instrumentation.timed(self.iter_volume_frames(), "load"):
+            instrumentation.incr("volumes_loaded", len(volumes))
+            rolling_ids = (
+                unchanged_volume_ids(volumes, previous_inventory)
+                if previous_inventory is not None
+                else frozenset()
+            )
+            # Volumes on instances stopped for the whole window, or created
+            # after it, cannot have datapoints, so they are never queried.
+            attachments = self.attachment_index.lookup(
+                volumes["VolumeId"], stopped_before=self.metrics.start_time
+            )
+            skipped = attachments["LongStopped"].to_numpy() | created_after(
+                volumes, self.metrics.end_time
+            )
+            instrumentation.incr("metric_lookups_skipped", int(skipped.sum()))
+            self.count_unpriced(volumes)
+            with instrumentation.span("cloudwatch"):
+                volume_iops = self.get_frame_iops(volumes[~skipped], rolling_ids)
+            with instrumentation.span("savings"):
+                evaluated.append(
+                    self.savings_engine.evaluate(volumes, volume_iops, attachments)
+                )
+            inventories.append(inventory(volumes))
+
+        with instrumentation.span("dataframes"):
+            if not evaluated:
+                evaluated.append(self.savings_engine.evaluate(volumes_frame([]), {}))
+                inventories.append(inventory(volumes_frame([])))
+            current_inventory = pd.concat(inventories, ignore_index=True)
+            return EBSAnalysis.from_categories(
+                self.account.accountID,
+                self.date,
+                self.savings_engine.category_frames(
+                    pd.concat(evaluated, ignore_index=True)
+                ),
+                inventory=current_inventory,
+                delta=(
+                    diff_inventories(
+                        current_inventory, previous_inventory, previous.date
+                    )
+                    if previous_inventory is not None
+                    else None
+                ),
+            )
 
-    def get_report(self):
-        volume_ids_from_instances = set()
-        available_volumes = list()
-        zero_iops_volume = list()
-        gp2_volumes = list()
-        io1_volumes = list()
-        io2_volumes = list()
-
-        instance_data = load_service_data_v2(
-            dir_path=os.path.join(self.account.accountID, self.date),
-            file_name="instances.json",
-            root_element="Reservations",
-            enabled_regions=self.account.aws_enabled_regions,
+    def count_unpriced(self, volumes: pd.DataFrame):
+        """Count and log volumes in regions missing from pricing.json; their
+        savings are reported as unknown (NaN) instead of zero."""
+        unpriced = self.savings_engine.pricing.unpriced(volumes["Region"])
+        if not unpriced.any():
+            return
+        self.instrumentation.incr("unpriced_volumes", int(unpriced.sum()))
+        regions = sorted(set(volumes["Region"].to_numpy()[unpriced].astype(str)))
+        print(
+            f"{self.account.accountID}: no EBS prices for {', '.join(regions)}; "
+            f"savings of {int(unpriced.sum())} volumes are unknown"
         )
 
-        for iData in instance_data:
-            for attachments in iData["Instances"][0]["BlockDeviceMappings"]:
-                if attachments.get("Ebs"):
-                    volume_ids_from_instances.add(attachments["Ebs"]["VolumeId"])
-
-        for volume_data in self.data:
-
-            if volume_data["State"] == "available":
-                available_volumes.append(volume_data)
-            elif (
-                self.get_volume_iops(volume_data["VolumeId"], volume_data["Region"])
-                == 0
-            ):
-                zero_iops_volume.append(volume_data)
-            elif volume_data["VolumeType"] == "gp2":
-                gp2_volumes.append(volume_data)
-            elif volume_data["VolumeType"] == "io1":
-                io1_volumes.append(volume_data)
-            elif (
-                volume_data["VolumeType"] == "io2"
-                and self.get_volume_iops(volume_data["VolumeId"], volume_data["Region"])
-                <= 2500
-            ):
-                io2_volumes.append(volume_data)
-
-        available_volumes = self.calculate_savings(available_volumes)
-        zero_iops_volume = self.calculate_savings(zero_iops_volume)
-
-        for volume in io1_volumes:
-            savings = volume["Size"] * (
-                EBS_PRICING[volume["Region"]]["io1_perGB"]
-                - EBS_PRICING[volume["Region"]]["io2_perGB"]
+    def analysis_key(self) -> str:
+        """Hash of everything the analysis depends on: the inventory files,
+        prices, metric window, report options and report layout."""
+        inventory_files = list()
+        for region in self.account.aws_enabled_regions:
+            for file_name in ("volumes.json", "instances.json"):
+                path = os.path.join(self.context.dir_path, region, file_name)
+                if os.path.exists(path):
+                    stat = os.stat(path)
+                    inventory_files.append([path, stat.st_mtime_ns, stat.st_size])
+        return hashlib.sha1(
+            json.dumps(
+                {
+                    "inventory": inventory_files,
+                    "pricing": self.context.pricing.version,
+                    "window": self.metrics.window("Sum"),
+                    "fine_window": self.metrics.window(
+                        "Sum", period=self.metrics.fine_period
+                    ),
+                    "source": self.source,
+                    "previous_date": self.previous_date if self.incremental else None,
+                    "categories": list(CATEGORIES),
+                    "columns": REPORT_COLUMNS,
+                }
+            ).encode()
+        ).hexdigest()
+
+    def analyze(self) -> EBSAnalysis:
+        with self.instrumentation.span("analyze"):
+            analysis = self.analysis_cache.get_or_create(
+                self.account.accountID,
+                self.date,
+                self.build_analysis,
+                key=self.analysis_key(),
             )
-            if self.get_volume_iops(volume["VolumeId"], volume["Region"]) <= 2500:
-                savings = volume["Size"] * (
-                    EBS_PRICING[volume["Region"]]["io1_perGB"]
-                    - EBS_PRICING[volume["Region"]]["gp3_perGB"]
-                ) + volume["Iops"] * (EBS_PRICING[volume["Region"]]["io1_iops"])
-                volume["Recommendation"] = (
-                    "Can be converted to gp3, because it have less than 2500 IOPS"
-                )
+        for category, frame in analysis.categories.items():
+            self.instrumentation.gauge(
+                "volumes", len(frame), labels={"category": category}
+            )
+        return analysis
+
+    def build_email_context(self, analysis: EBSAnalysis) -> dict:
+        return {"accountID": analysis.account_id, **analysis.summary}
+
+    def build_report_context(
+        self,
+        analysis: EBSAnalysis,
+        row_limit: int | None = None,
+        attachment: str | None = None,
+    ) -> dict:
+        with self.instrumentation.span("report_context"):
+            return self._build_report_context(analysis, row_limit, attachment)
+
+    def _build_report_context(
+        self, analysis: EBSAnalysis, row_limit: int | None, attachment: str | None
+    ) -> dict:
+        report_data = dict()
+        for table_name, message in TABLE_MESSAGES.items():
+            volumes_df = analysis.category(table_name)
+            table = {
+                "columns": volumes_df.columns.tolist(),
+                "message": message,
+                "summary": [],
+            }
+            if row_limit is not None and len(volumes_df) > row_limit:
+                # Only the rendered rows are converted to records.
+                volumes_df = volumes_df.nlargest(row_limit, "SavingsPossible")
+                table["total_rows"] = len(analysis.category(table_name))
+                table["attachment"] = attachment
+            table["data"] = volumes_df.to_dict(orient="records")
+            report_data[table_name] = table
+        report_data["table_names"] = list(TABLE_MESSAGES)
+        return {
+            "date": analysis.date,
+            "report_data": report_data,
+            "title": "EBS Optimizer Report",
+            "delta": analysis.delta.to_dict() if analysis.delta is not None else None,
+        }
 
-            elif volume["Iops"] <= 32000:
-                savings += (
-                    volume["Iops"] * EBS_PRICING[volume["Region"]]["io1_iops"]
-                    - volume["Iops"]
-                    * EBS_PRICING[volume["Region"]]["io2_iops"]["0_to_32k"]
-                )
-            elif volume["Iops"] in range(32001, 64001):
-                savings += (
-                    32000 * EBS_PRICING[volume["Region"]]["io1_iops"]
-                    - 32000 * EBS_PRICING[volume["Region"]]["io2_iops"]["0_to_32k"]
-                )
-                left_iops = volume["Iops"] - 32000
-                savings += (
-                    left_iops * EBS_PRICING[volume["Region"]]["io1_iops"]
-                    - left_iops
-                    * EBS_PRICING[volume["Region"]]["io2_iops"]["32k_to_64k"]
-                )
-            elif volume["Iops"] > 64000:
-                savings += (
-                    32000 * EBS_PRICING[volume["Region"]]["io1_iops"]
-                    - 32000 * EBS_PRICING[volume["Region"]]["io2_iops"]["0_to_32k"]
-                )
-                savings += (
-                    32000 * EBS_PRICING[volume["Region"]]["io1_iops"]
-                    - 32000 * EBS_PRICING[volume["Region"]]["io2_iops"]["32k_to_64k"]
-                )
-                left_iops = volume["Iops"] - 64000
-                savings += (
-                    left_iops * EBS_PRICING[volume["Region"]]["io1_iops"]
-                    - left_iops
-                    * EBS_PRICING[volume["Region"]]["io2_iops"]["64k_greater"]
-                )
-            volume["Savings"] = savings
-
-        for volume in io2_volumes:
-            volume["Savings"] = volume["Size"] * (
-                EBS_PRICING[volume["Region"]]["io2_perGB"]
-                - EBS_PRICING[volume["Region"]]["gp3_perGB"]
-            ) + volume["Iops"] * (EBS_PRICING[volume["Region"]]["io2_iops"]["0_to_32k"])
-
-        for volume in gp2_volumes:
-            savings = (
-                volume["Size"] * EBS_PRICING[volume["Region"]]["gp2_perGB"]
-                - volume["Size"] * EBS_PRICING[volume["Region"]]["gp3_perGB"]
+    def write_attachment(
+        self, analysis: EBSAnalysis, export_format: str | None = None
+    ) -> str:
+        with self.instrumentation.span("attachment"):
+            return self._write_attachment(
+                analysis, export_format or self.export_format
             )
-            if volume["Iops"] > 3000:
-                savings -= volume["Iops"] * EBS_PRICING[volume["Region"]]["gp3_iops"]
-            if volume.get("Throughput", 0) > 125:
-                savings -= (
-                    volume["Throughput"]
-                    * EBS_PRICING[volume["Region"]]["gp3_throughput"]
-                )
-            volume["Savings"] = savings
 
-        available_volumes_df = self.create_volume_df(
-            available_volumes, "Can be removed because the volume is available"
+    def _write_attachment(
+        self, analysis: EBSAnalysis, export_format: str | None
+    ) -> str:
+        report_dir = os.path.join(self.account.accountID, self.date)
+        if export_format is None:
+            from utils.utils import generate_report
+
+            return generate_report(
+                report_dir,
+                pd.concat(
+                    [analysis.category(table_name) for table_name in ATTACHMENT_ORDER]
+                ),
+                f"ebs_report_{self.date}",
+            )
+        # Exporters write category by category, without the concatenated frame.
+        result = export_report(
+            (analysis.category(table_name) for table_name in ATTACHMENT_ORDER),
+            report_dir,
+            f"ebs_report_{self.date}",
+            export_format,
         )
-        zero_iops_volume_df = self.create_volume_df(
-            zero_iops_volume,
-            "Can be removed, because it have zero IOPS for last 14 days",
+        self.export_results.append(result)
+        labels = {"format": result.format}
+        self.instrumentation.gauge("export_rows", result.rows, labels=labels)
+        self.instrumentation.gauge("export_bytes", result.size, labels=labels)
+        self.instrumentation.gauge("export_seconds", result.seconds, labels=labels)
+        return result.path
+
+    def send_report(self):
+        analysis = self.analyze()
+        report_file_path = self.write_attachment(analysis)
+        handler = get_email_handler()
+        with self.instrumentation.span("render"):
+            template = handler.get_template(self.service_name)
+            rendered_template = template.render(self.build_email_context(analysis))
+        with self.instrumentation.span("email"):
+            handler.send_mail(
+                recipients=self.account.recipients,
+                subject="EBS Optimizer Report",
+                messages=[rendered_template],
+                attachments=[report_file_path],
+            )
+        self.instrumentation.incr("emails_sent")
+
+    def queue_report(self, delivery_queue, row_limit: int = DEFAULT_ROW_LIMIT):
+        """Hand the report to ``delivery_queue`` instead of mailing it here."""
+        analysis = self.analyze()
+        report_file_path = self.write_attachment(analysis)
+        # Every account's attachment has the same base name, so digests
+        # carry them under the account ID.
+        attachment = f"{self.account.accountID}_{os.path.basename(report_file_path)}"
+        context = self.build_report_context(
+            analysis, row_limit=row_limit, attachment=attachment
         )
-        gp2_volumes_df = self.create_volume_df(
-            gp2_volumes,
-            "Can be converted to gp3, because gp3 is more cost-effective than gp2",
+        delivery_queue.put(
+            Delivery(
+                account_id=self.account.accountID,
+                recipients=tuple(self.account.recipients),
+                subject="EBS Optimizer Report",
+                reports=(
+                    {**context, "title": f"{context['title']} ({analysis.account_id})"},
+                ),
+                attachments=((attachment, report_file_path),),
+            )
         )
-        io1_volumes_df = self.create_volume_df(
-            io1_volumes, "Can be converted to io2, io2 is more efficient than io1"
+        self.instrumentation.incr("reports_queued")
+
+    def get_report(self):
+        return self.build_report_context(self.analyze())
+
+    def build_html_context(self, analysis: EBSAnalysis, row_limit: int) -> dict:
+        """Report context capped at ``row_limit`` rows per table; the full
+        tables are written as an attachment when any of them is cut."""
+        attachment = None
+        if any(len(frame) > row_limit for frame in analysis.categories.values()):
+            attachment = self.write_attachment(analysis)
+        return self.build_report_context(
+            analysis,
+            row_limit=row_limit,
+            attachment=os.path.basename(attachment) if attachment else None,
         )
-        io2_volumes_df = self.create_volume_df(
-            io2_volumes, "Can be converted to gp3, because it have less than 2500 IOPS"
+
+    def write_html_report(
+        self,
+        path: str | None = None,
+        row_limit: int = DEFAULT_ROW_LIMIT,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> str:
+        path = path or os.path.join(
+            self.account.accountID, self.date, f"ebs_report_{self.date}.html"
+        )
+        context = self.build_html_context(self.analyze(), row_limit)
+        with self.instrumentation.span("render"):
+            ReportRenderer(row_limit=row_limit, max_bytes=max_bytes).render_to_file(
+                [context], path
+            )
+        return path
+
+    def write_metrics(self, dir_path: str | None = None) -> list:
+        """Export this run's instrumentation as JSON and a Prometheus textfile."""
+        return self.context.write_metrics(
+            dir_path or self.context.dir_path,
+            f"{self.service_name}_metrics_{self.account.accountID}_{self.date}",
         )
-        context = {
-                "date": self.date,
-                "report_data": {
-                    "available_volumes": {
-                        "data": available_volumes_df.to_dict(orient="records"),
-                        "columns": available_volumes_df.columns.tolist(),
-                        "message": "List of all available volumes across the organization.",
-                        "summary": [],
-                    },
-                    "zero_iops_volume": {
-                        "data": zero_iops_volume_df.to_dict(orient="records"),
-                        "columns": zero_iops_volume_df.columns.tolist(),
-                        "message": "List of all volumes across the organization that are unused from last 7 days.",
-                        "summary": [],
-                    },
-                    "gp2_volumes": {
-                        "data": gp2_volumes_df.to_dict(orient="records"),
-                        "columns": gp2_volumes_df.columns.tolist(),
-                        "message": "List of all gp2 volumes across the organization that can be converted to gp3.",
-                        "summary": [],
-                    },
-                    "io1_volumes": {
-                        "data": io1_volumes_df.to_dict(orient="records"),
-                        "columns": io1_volumes_df.columns.tolist(),
-                        "message": "List of all io1 volumes across the organization that can be converted to io2.",
-                        "summary": [],
-                    },
-                    "io2_volumes": {
-                        "data": io2_volumes_df.to_dict(orient="records"),
-                        "columns": io2_volumes_df.columns.tolist(),
-                        "message": "List of all io2 volumes across the organization that can be converted to gp3.",
-                        "summary": [],
-                    },
-                    "table_names": ["available_volumes", "zero_iops_volume", "gp2_volumes", "io1_volumes", "io2_volumes"],
-                },
-                "title": "EBS Optimizer Report",
-            }
-        return context
 
 
 if __name__ == "__main__":
-    from dotenv import load_dotenv
-    from settings.config import ACCOUNTS
+    from cli import main
 
-    load_dotenv(".env", override=True)
-    ebs = EBSReport(account=ACCOUNTS[0], date="2024-05-28")
-    ebs.send_report()
+    sys.exit(main())
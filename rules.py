@@ -0,0 +1,204 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+
+import pandas as pd
+
+from service_context import ServiceContext
+
+RULE_COLUMNS = ["SavingsPossible", "Region", "Recommendation"]
+
+
+@dataclass(frozen=True)
+class ServiceAnalysis:
+    """Flagged resources and savings of one service for one account and date."""
+
+    service_name: str
+    account_id: str
+    date: str
+    categories: MappingProxyType
+    summary: MappingProxyType
+
+
+def summarize(categories: dict) -> dict:
+    summary = dict()
+    for table_name, frame in categories.items():
+        summary[f"{table_name}_count"] = len(frame)
+        summary[f"{table_name}_saving"] = (
+            round(float(frame["SavingsPossible"].sum()), 2) if not frame.empty else 0
+        )
+    summary["total_price_saved"] = round(
+        sum(float(frame["SavingsPossible"].sum()) for frame in categories.values()), 2
+    )
+    return summary
+
+
+class ServiceRule:
+    """Checks of one service, run over a shared ServiceContext.
+
+    ``analyze`` returns an analysis with ``categories`` and ``summary``;
+    ``report_context`` turns it into one entry of reporter.html's ``reports``.
+    """
+
+    service_name = ""
+    title = ""
+    table_messages = {}
+
+    def analyze(self, context: ServiceContext):
+        raise NotImplementedError
+
+    def report_context(self, analysis, row_limit: int) -> dict:
+        report_data = dict()
+        for table_name, message in self.table_messages.items():
+            frame = analysis.categories[table_name]
+            table = {
+                "columns": frame.columns.tolist(),
+                "message": message,
+                "summary": [],
+            }
+            if len(frame) > row_limit:
+                table["total_rows"] = len(frame)
+                frame = frame.nlargest(row_limit, "SavingsPossible")
+            table["data"] = frame.to_dict(orient="records")
+            report_data[table_name] = table
+        report_data["table_names"] = list(self.table_messages)
+        return {"date": analysis.date, "report_data": report_data, "title": self.title}
+
+
+class EBSRule(ServiceRule):
+    """The EBS report, reading volumes, instances and metrics from the context."""
+
+    service_name = "ebs"
+    title = "EBS Optimizer Report"
+
+    def __init__(self, **options):
+        # EBSReport options such as streaming, source or incremental.
+        self.options = options
+        self.report = None
+
+    def analyze(self, context: ServiceContext):
+        # Imported here so loading the rules does not load the EBS report.
+        from reporter import EBSReport
+
+        self.report = EBSReport(
+            context.account, context.date, context=context, **self.options
+        )
+        return self.report.analyze()
+
+    def report_context(self, analysis, row_limit: int) -> dict:
+        return self.report.build_html_context(analysis, row_limit)
+
+
+class InventoryRule(ServiceRule):
+    """Flags idle resources of one inventory file; each one saves its
+    region's ``price_field`` of ``pricing_service``."""
+
+    file_name = ""
+    root_element = ""
+    pricing_service = ""
+    price_field = "perMonth"
+    table_name = ""
+    message = ""
+    columns = []
+    recommendation = ""
+
+    def is_idle(self, item: dict) -> bool:
+        raise NotImplementedError
+
+    def row(self, item: dict) -> tuple:
+        """Values of ``columns`` for ``item``."""
+        raise NotImplementedError
+
+    @property
+    def table_messages(self) -> dict:
+        return {self.table_name: self.message}
+
+    def analyze(self, context: ServiceContext) -> ServiceAnalysis:
+        frame = pd.DataFrame.from_records(
+            [
+                (*self.row(item), item["Region"])
+                for item in context.inventory(self.file_name, self.root_element)
+                if self.is_idle(item)
+            ],
+            columns=[*self.columns, "Region"],
+        )
+        pricing = context.pricing[self.pricing_service]
+        unpriced = int(pricing.unpriced(frame["Region"]).sum())
+        if unpriced:
+            context.instrumentation.incr(
+                "unpriced_resources", unpriced, labels={"service": self.service_name}
+            )
+            print(
+                f"{context.account.accountID}: {unpriced} {self.service_name} "
+                "resources are in regions without prices"
+            )
+        frame["SavingsPossible"] = pricing.rows(frame["Region"])[
+            :, pricing.field_index[self.price_field]
+        ]
+        frame["Recommendation"] = self.recommendation
+        categories = {self.table_name: frame[[*self.columns, *RULE_COLUMNS]]}
+        return ServiceAnalysis(
+            service_name=self.service_name,
+            account_id=context.account.accountID,
+            date=context.date,
+            categories=MappingProxyType(categories),
+            summary=MappingProxyType(summarize(categories)),
+        )
+
+
+class ElasticIPRule(InventoryRule):
+    service_name = "elastic_ip"
+    title = "Elastic IP Optimizer Report"
+    file_name = "addresses.json"
+    root_element = "Addresses"
+    pricing_service = "AWSElasticIP"
+    table_name = "unassociated_elastic_ips"
+    message = (
+        "List of all Elastic IPs across the organization that are not associated "
+        "with any instance or network interface."
+    )
+    columns = ["AllocationId", "PublicIp", "Domain"]
+    recommendation = "Can be released, because the Elastic IP is not associated"
+
+    def is_idle(self, item: dict) -> bool:
+        return not (
+            item.get("AssociationId")
+            or item.get("InstanceId")
+            or item.get("NetworkInterfaceId")
+        )
+
+    def row(self, item: dict) -> tuple:
+        return (item.get("AllocationId", ""), item["PublicIp"], item.get("Domain", ""))
+
+
+class VPNRule(InventoryRule):
+    service_name = "vpn"
+    title = "VPN Optimizer Report"
+    file_name = "vpn_connections.json"
+    root_element = "VpnConnections"
+    pricing_service = "AWSVPN"
+    table_name = "idle_vpn_connections"
+    message = (
+        "List of all Site-to-Site VPN connections across the organization with no "
+        "tunnel up."
+    )
+    columns = ["VpnConnectionId", "Type", "State", "CustomerGatewayId", "GatewayId"]
+    recommendation = "Can be deleted, because none of its tunnels are up"
+
+    def is_idle(self, item: dict) -> bool:
+        # Connections are billed while available, whether or not traffic flows.
+        return item["State"] == "available" and not any(
+            tunnel.get("Status") == "UP" for tunnel in item.get("VgwTelemetry", [])
+        )
+
+    def row(self, item: dict) -> tuple:
+        return (
+            item["VpnConnectionId"],
+            item.get("Type", ""),
+            item["State"],
+            item.get("CustomerGatewayId", ""),
+            item.get("VpnGatewayId") or item.get("TransitGatewayId", ""),
+        )
+
+
+# Services in report order.
+RULES = {rule.service_name: rule for rule in (EBSRule, ElasticIPRule, VPNRule)}
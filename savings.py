@@ -0,0 +1,240 @@
+import numpy as np
+import pandas as pd
+
+from pricing import PricingIndex, load_pricing
+from timeseries import STAT_COLUMNS
+from volumes import compact_volumes
+
+GP3_CONVERSION_IOPS = 2500
+GP3_BASELINE_IOPS = 3000
+GP3_BASELINE_THROUGHPUT = 125
+IO2_TIER_SIZE = 32000
+
+IO1_TO_GP3_RECOMMENDATION = (
+    "Can be converted to gp3, because it have less than 2500 IOPS"
+)
+CATEGORIES = {
+    "available_volumes": "Can be removed because the volume is available",
+    "stopped_instance_volumes": (
+        "Can be snapshotted and removed, because it is attached to an instance "
+        "stopped for over 14 days"
+    ),
+    "zero_iops_volume": "Can be removed, because it have zero IOPS for last 14 days",
+    "gp2_volumes": "Can be converted to gp3, because gp3 is more cost-effective than gp2",
+    "io1_volumes": "Can be converted to io2, io2 is more efficient than io1",
+    "io2_volumes": "Can be converted to gp3, because it have less than 2500 IOPS",
+}
+RECOMMENDATIONS = list(
+    dict.fromkeys([*CATEGORIES.values(), IO1_TO_GP3_RECOMMENDATION])
+)
+REPORT_COLUMNS = [
+    "VolumeId",
+    "Size",
+    "VolumeType",
+    "Iops",
+    "Throughput",
+    "State",
+    "InstanceId",
+    "CreateTime",
+    "AvailabilityZone",
+    "SnapshotId",
+    *STAT_COLUMNS,
+    "SavingsPossible",
+    "Region",
+    "Recommendation",
+]
+VOLUME_FIELDS = [
+    column
+    for column in REPORT_COLUMNS
+    if column not in ("InstanceId", "SavingsPossible", "Recommendation", *STAT_COLUMNS)
+]
+_CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORIES)}
+_RECOMMENDATION_CODES = np.array(
+    [RECOMMENDATIONS.index(message) for message in CATEGORIES.values()]
+)
+
+
+def volumes_frame(volumes) -> pd.DataFrame:
+    """Frame of ``volumes``, given as VolumeRecords or volumes.json dicts."""
+    frame = pd.DataFrame.from_records(
+        (volume.astuple() for volume in compact_volumes(volumes)),
+        columns=VOLUME_FIELDS,
+    )
+    for column in ("Region", "VolumeType", "State", "AvailabilityZone"):
+        frame[column] = frame[column].astype("category")
+    return frame
+
+
+class SavingsEngine:
+    """Classifies volumes and computes savings for a whole frame at once."""
+
+    def __init__(self, pricing: PricingIndex | None = None):
+        self.pricing = (pricing or load_pricing()).ebs
+
+    def evaluate(
+        self,
+        volumes: pd.DataFrame,
+        volume_iops: dict | pd.DataFrame,
+        attachments: pd.DataFrame | None = None,
+    ) -> pd.DataFrame:
+        """Return the report rows for ``volumes`` with a ``Category`` column.
+
+        ``volume_iops`` maps volume IDs to their measured IOPS, or is a frame of
+        ``STAT_COLUMNS`` indexed by volume ID whose PeakIOPS is used; volumes
+        missing from it are never treated as idle or below the gp3 threshold.
+        ``attachments`` is an ``AttachmentIndex.lookup`` frame giving each
+        volume's InstanceId and whether its instances are long stopped.
+        """
+        if attachments is None:
+            instance_ids = np.full(len(volumes), "", dtype=object)
+            long_stopped = np.zeros(len(volumes), dtype=bool)
+        else:
+            attachments = attachments.reindex(volumes["VolumeId"])
+            instance_ids = attachments["InstanceId"].fillna("").to_numpy()
+            long_stopped = attachments["LongStopped"].eq(True).to_numpy()
+        if isinstance(volume_iops, pd.DataFrame):
+            stats = volume_iops.reindex(volumes["VolumeId"])
+        else:
+            stats = pd.DataFrame(
+                {"PeakIOPS": pd.Series(volume_iops, dtype=float)},
+                columns=STAT_COLUMNS,
+                dtype=float,
+            ).reindex(volumes["VolumeId"])
+        measured = stats["PeakIOPS"].to_numpy()
+        price = self._row_prices(volumes["Region"])
+
+        size = volumes["Size"].to_numpy(dtype=float)
+        iops = volumes["Iops"].fillna(0).to_numpy(dtype=float)
+        throughput = volumes["Throughput"].fillna(0).to_numpy(dtype=float)
+        is_gp2 = _equals(volumes["VolumeType"], "gp2")
+        is_gp3 = _equals(volumes["VolumeType"], "gp3")
+        is_io1 = _equals(volumes["VolumeType"], "io1")
+        is_io2 = _equals(volumes["VolumeType"], "io2")
+        below_gp3_threshold = measured <= GP3_CONVERSION_IOPS
+
+        # io2 provisioned IOPS are billed per tier: 0-32k, 32k-64k and >64k.
+        tier_1 = np.clip(iops, 0, IO2_TIER_SIZE)
+        tier_2 = np.clip(iops - IO2_TIER_SIZE, 0, IO2_TIER_SIZE)
+        tier_3 = np.clip(iops - 2 * IO2_TIER_SIZE, 0, None)
+        io2_iops_cost = (
+            tier_1 * price["io2_iops.0_to_32k"]
+            + tier_2 * price["io2_iops.32k_to_64k"]
+            + tier_3 * price["io2_iops.64k_greater"]
+        )
+        io1_iops_cost = iops * price["io1_iops"]
+        gp3_cost = (
+            size * price["gp3_perGB"]
+            + np.clip(iops - GP3_BASELINE_IOPS, 0, None) * price["gp3_iops"]
+            + np.clip(throughput - GP3_BASELINE_THROUGHPUT, 0, None)
+            * price["gp3_throughput"]
+        )
+        current_cost = np.select(
+            [is_gp2, is_gp3, is_io1, is_io2],
+            [
+                size * price["gp2_perGB"],
+                gp3_cost,
+                size * price["io1_perGB"] + io1_iops_cost,
+                size * price["io2_perGB"] + io2_iops_cost,
+            ],
+            default=0.0,
+        )
+
+        # Category codes follow the order of CATEGORIES; -1 means not reported.
+        conditions = {
+            "available_volumes": _equals(volumes["State"], "available"),
+            "stopped_instance_volumes": long_stopped,
+            "zero_iops_volume": measured == 0,
+            "gp2_volumes": is_gp2,
+            "io1_volumes": is_io1,
+            "io2_volumes": is_io2 & below_gp3_threshold,
+        }
+        category = np.select(
+            [conditions[name] for name in CATEGORIES],
+            range(len(CATEGORIES)),
+            default=-1,
+        )
+        is_removable = np.isin(
+            category,
+            [
+                _CATEGORY_CODES["available_volumes"],
+                _CATEGORY_CODES["stopped_instance_volumes"],
+                _CATEGORY_CODES["zero_iops_volume"],
+            ],
+        )
+        is_io1_category = category == _CATEGORY_CODES["io1_volumes"]
+        is_io1_to_gp3 = is_io1_category & below_gp3_threshold
+        savings = np.select(
+            [
+                is_removable,
+                category == _CATEGORY_CODES["gp2_volumes"],
+                is_io1_to_gp3,
+                is_io1_category,
+                category == _CATEGORY_CODES["io2_volumes"],
+            ],
+            [
+                current_cost,
+                current_cost - gp3_cost,
+                size * price["io1_to_gp3_perGB"] + io1_iops_cost,
+                size * price["io1_to_io2_perGB"]
+                + tier_1 * price["io1_to_io2_iops.0_to_32k"]
+                + tier_2 * price["io1_to_io2_iops.32k_to_64k"]
+                + tier_3 * price["io1_to_io2_iops.64k_greater"],
+                size * price["io2_to_gp3_perGB"] + io2_iops_cost,
+            ],
+            default=0.0,
+        )
+
+        reported = category >= 0
+        frame = volumes[reported].copy()
+        frame["InstanceId"] = instance_ids[reported]
+        # Rounded for the report only; categories use the measured values.
+        for column in STAT_COLUMNS:
+            frame[column] = stats[column].to_numpy()[reported].round(2)
+        frame["SavingsPossible"] = savings[reported]
+        recommendation = np.where(
+            is_io1_to_gp3,
+            RECOMMENDATIONS.index(IO1_TO_GP3_RECOMMENDATION),
+            _RECOMMENDATION_CODES[category],
+        )
+        frame["Recommendation"] = pd.Categorical.from_codes(
+            recommendation[reported], categories=RECOMMENDATIONS
+        )
+        frame["Category"] = pd.Categorical.from_codes(
+            category[reported], categories=list(CATEGORIES)
+        )
+        return frame
+
+    def _row_prices(self, regions: pd.Series) -> dict:
+        if not isinstance(regions.dtype, pd.CategoricalDtype):
+            regions = regions.astype("category")
+        # One price row per distinct region, then fanned out by category code;
+        # code -1 (missing region) picks the trailing NaN row.
+        table = np.vstack(
+            [
+                self.pricing.rows(regions.cat.categories),
+                np.full(len(self.pricing.fields), np.nan),
+            ]
+        )
+        rows = table[regions.cat.codes.to_numpy()]
+        return {
+            field: rows[:, index] for field, index in self.pricing.field_index.items()
+        }
+
+    @staticmethod
+    def category_frames(frame: pd.DataFrame) -> dict:
+        grouped = dict(tuple(frame.groupby("Category", observed=True)))
+        return {
+            category: grouped[category][REPORT_COLUMNS]
+            if category in grouped
+            else pd.DataFrame(columns=REPORT_COLUMNS)
+            for category in CATEGORIES
+        }
+
+
+def _equals(series: pd.Series, value: str) -> np.ndarray:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        if value not in categories:
+            return np.zeros(len(series), dtype=bool)
+        return series.cat.codes.to_numpy() == categories.get_loc(value)
+    return series.to_numpy() == value
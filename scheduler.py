@@ -0,0 +1,90 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class ReportScheduler:
+    """Fans report generation out across accounts on a thread pool.
+
+    Each report fetches its regions concurrently (``max_concurrent_regions``)
+    with at most ``max_concurrent_requests`` in-flight CloudWatch requests per
+    region; requests are paced by the shared per-account/region rate limiters
+    in ``throttling``, so overlapping accounts never exceed the API limits.
+
+    ``action`` names a report method, or is a callable taking the report;
+    ``report_options`` are passed to every report's constructor. Metrics
+    files are only written with ``write_metrics`` set.
+    """
+
+    def __init__(
+        self,
+        accounts: list,
+        date: str,
+        report_class,
+        action="send_report",
+        max_concurrent_accounts: int = 4,
+        max_concurrent_regions: int = 8,
+        max_concurrent_requests: int = 4,
+        hooks: list | None = None,
+        metrics_dir: str | None = None,
+        report_options: dict | None = None,
+        write_metrics: bool = True,
+    ):
+        self.accounts = accounts
+        self.date = date
+        self.report_class = report_class
+        self.action = action
+        self.max_concurrent_accounts = max_concurrent_accounts
+        self.max_concurrent_regions = max_concurrent_regions
+        self.max_concurrent_requests = max_concurrent_requests
+        self.hooks = hooks
+        # e.g. the node exporter's textfile directory; defaults to the
+        # account/date report directory.
+        self.metrics_dir = metrics_dir
+        self.report_options = report_options or {}
+        self.write_metrics = write_metrics
+        self.action_name = getattr(action, "__name__", None) or str(action)
+
+    def run_account(self, account):
+        report = self.report_class(
+            account=account,
+            date=self.date,
+            max_concurrent_regions=self.max_concurrent_regions,
+            max_concurrent_requests=self.max_concurrent_requests,
+            hooks=self.hooks,
+            **self.report_options,
+        )
+        try:
+            if callable(self.action):
+                return self.action(report)
+            return getattr(report, self.action)()
+        finally:
+            if self.write_metrics:
+                try:
+                    report.write_metrics(self.metrics_dir)
+                except Exception as e:
+                    print(f"{account.accountID}: failed to write metrics: {e}")
+
+    def run(self) -> dict:
+        results = dict()
+        if not self.accounts:
+            return results
+        started = time.perf_counter()
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_concurrent_accounts, len(self.accounts))
+        ) as executor:
+            futures = {
+                executor.submit(self.run_account, account): account
+                for account in self.accounts
+            }
+            for future in as_completed(futures):
+                account = futures[future]
+                try:
+                    results[account.accountID] = future.result()
+                except Exception as e:
+                    print(f"{account.accountID}: {self.action_name} failed: {e}")
+                    results[account.accountID] = e
+        print(
+            f"Finished {self.action_name} for {len(self.accounts)} account(s) "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        return results
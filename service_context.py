@@ -0,0 +1,131 @@
+import os
+import threading
+from functools import cached_property
+
+from client_pool import client_pool as default_client_pool
+from cloudwatch import CloudWatchMetrics
+from instrumentation import Instrumentation
+from loaders import iter_service_data
+from metrics_cache import MetricsCache
+from pricing import PricingIndex, load_pricing
+
+
+class ServiceContext:
+    """Inventories, clients, metrics and pricing for one account and date.
+
+    Every service report of a run reads through the same context, so each
+    inventory file is parsed once, clients come from one pool and CloudWatch
+    lookups share one batched fetcher and on-disk cache.
+    """
+
+    def __init__(
+        self,
+        account,
+        date: str,
+        max_concurrent_regions: int = 8,
+        max_concurrent_requests: int = 4,
+        client_pool=None,
+        pricing: PricingIndex | None = None,
+        hooks: list | None = None,
+        labels: dict | None = None,
+        persist: bool = True,
+    ):
+        self.account = account
+        self.date = date
+        self.max_concurrent_regions = max_concurrent_regions
+        self.max_concurrent_requests = max_concurrent_requests
+        self.client_pool = client_pool or default_client_pool
+        # Without persist, caches stay in memory and nothing is written.
+        self.persist = persist
+        self.pricing = pricing or load_pricing()
+        self.instrumentation = Instrumentation(
+            labels={"account": account.accountID, "date": date, **(labels or {})},
+            hooks=hooks,
+        )
+        self._inventories = dict()
+        self._lock = threading.Lock()
+
+    @property
+    def dir_path(self) -> str:
+        return os.path.join(self.account.accountID, self.date)
+
+    def client(self, service_name: str, region: str):
+        return self.client_pool.client(self.account, service_name, region)
+
+    def inventory(
+        self, file_name: str, root_element: str, convert=list, streaming=False
+    ):
+        """``convert`` applied to the items of every enabled region's
+        ``file_name``, computed once per (file, root element, convert).
+
+        Files are read with utils.utils.load_service_data_v2, as every report
+        did before the context; only ``convert``'s result is kept, so callers
+        that keep a compact form of the items drop the parsed dicts. With
+        ``streaming``, ``convert`` is fed item by item from the incremental
+        parser instead, so whole files are never held in memory.
+        """
+        key = (file_name, root_element, convert)
+        with self._lock:
+            if key in self._inventories:
+                return self._inventories[key]
+            with self.instrumentation.span(f"inventory.{file_name}"):
+                if streaming:
+                    items = convert(
+                        iter_service_data(
+                            self.dir_path,
+                            file_name,
+                            root_element,
+                            self.account.aws_enabled_regions,
+                            streaming=True,
+                        )
+                    )
+                else:
+                    from utils.utils import load_service_data_v2
+
+                    items = convert(
+                        iter(
+                            load_service_data_v2(
+                                dir_path=self.dir_path,
+                                file_name=file_name,
+                                root_element=root_element,
+                                enabled_regions=self.account.aws_enabled_regions,
+                            )
+                        )
+                    )
+            self._inventories[key] = items
+            return items
+
+    @cached_property
+    def metrics_cache(self) -> MetricsCache:
+        return MetricsCache(
+            account_id=self.account.accountID,
+            path=(
+                os.path.join(self.account.accountID, "metrics_cache.sqlite")
+                if self.persist
+                else None
+            ),
+        )
+
+    @cached_property
+    def metrics(self) -> CloudWatchMetrics:
+        return CloudWatchMetrics(
+            account=self.account,
+            cache=self.metrics_cache,
+            client_pool=self.client_pool,
+            max_concurrent_regions=self.max_concurrent_regions,
+            max_concurrent_requests=self.max_concurrent_requests,
+            instrumentation=self.instrumentation,
+        )
+
+    def write_metrics(self, dir_path: str, base_name: str) -> list:
+        """Export the run's instrumentation as JSON and a Prometheus textfile."""
+        self.instrumentation.gauge(
+            "cloudwatch_clients", self.client_pool.stats()["clients"]
+        )
+        # Only reported once a service has opened the cache.
+        if "metrics_cache" in vars(self):
+            self.instrumentation.gauge("metrics_cache_hits", self.metrics_cache.hits)
+            self.instrumentation.gauge(
+                "metrics_cache_misses", self.metrics_cache.misses
+            )
+        return self.instrumentation.write(dir_path, base_name)
@@ -0,0 +1,215 @@
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.ipc
+
+from loaders import (
+    DEFAULT_CHUNK_SIZE,
+    attachment_rows,
+    chunked,
+    iter_service_data,
+    region_file_path,
+)
+
+# Low-cardinality columns are dictionary-encoded so they load as Categoricals.
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+VOLUME_SCHEMA = pa.schema(
+    [
+        ("VolumeId", pa.string()),
+        ("Size", pa.int64()),
+        ("VolumeType", CATEGORY),
+        ("Iops", pa.int64()),
+        ("Throughput", pa.int64()),
+        ("State", CATEGORY),
+        ("CreateTime", pa.string()),
+        ("AvailabilityZone", CATEGORY),
+        ("SnapshotId", pa.string()),
+        ("Region", CATEGORY),
+    ]
+)
+ATTACHMENT_SCHEMA = pa.schema(
+    [
+        ("VolumeId", pa.string()),
+        ("InstanceId", pa.string()),
+        ("InstanceState", pa.string()),
+        ("AttachTime", pa.string()),
+        ("StoppedAt", pa.string()),
+        ("Region", pa.string()),
+    ]
+)
+SOURCE_FILES = ("volumes.json", "instances.json")
+
+
+def _volume_row(volume: dict) -> dict:
+    return {
+        "VolumeId": volume["VolumeId"],
+        "Size": volume["Size"],
+        "VolumeType": volume["VolumeType"],
+        "Iops": volume.get("Iops", 0),
+        "Throughput": volume.get("Throughput", 0),
+        "State": volume["State"],
+        "CreateTime": str(volume["CreateTime"]),
+        "AvailabilityZone": volume["AvailabilityZone"],
+        "SnapshotId": volume.get("SnapshotId", ""),
+        "Region": volume["Region"],
+    }
+
+
+def _record_batch(rows: list, schema: pa.Schema, dictionaries: dict):
+    """Build a batch whose dictionary columns index into ``dictionaries``.
+
+    Each column's dictionary only ever grows, so every batch's dictionary
+    extends the previous one's and can be written as a delta.
+    """
+    arrays = list()
+    for field in schema:
+        values = [row[field.name] for row in rows]
+        if field.name not in dictionaries:
+            arrays.append(pa.array(values, type=field.type))
+            continue
+        dictionary = dictionaries[field.name]
+        indices = [dictionary.setdefault(value, len(dictionary)) for value in values]
+        arrays.append(
+            pa.DictionaryArray.from_arrays(
+                pa.array(indices, type=field.type.index_type),
+                pa.array(list(dictionary), type=field.type.value_type),
+            )
+        )
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class SnapshotStore:
+    """Columnar copy of one day's inventory under ``accountID/date/snapshot``.
+
+    Files are uncompressed Arrow IPC so they can be memory-mapped and read
+    without copying the column buffers.
+    """
+
+    def __init__(self, account_id: str, date: str):
+        self.account_id = account_id
+        self.date = date
+        self.dir_path = os.path.join(account_id, date, "snapshot")
+        self.volumes_path = os.path.join(self.dir_path, "volumes.arrow")
+        self.attachments_path = os.path.join(self.dir_path, "attachments.arrow")
+
+    def exists(self) -> bool:
+        return os.path.exists(self.volumes_path) and os.path.exists(
+            self.attachments_path
+        )
+
+    def is_current(self, enabled_regions) -> bool:
+        """Whether the snapshot was ingested from the JSON files on disk now.
+
+        A day whose JSON was re-dumped after ingestion is stale. When the JSON
+        has been pruned there is nothing to rebuild from, so the snapshot
+        stands.
+        """
+        if not self.exists():
+            return False
+        sources = self.source_files(enabled_regions)
+        if not sources:
+            return True
+        return all(
+            self._read_sources(path) == sources
+            for path in (self.volumes_path, self.attachments_path)
+        )
+
+    def source_files(self, enabled_regions) -> dict:
+        """``{path: [mtime_ns, size]}`` of the JSON files a snapshot is built from."""
+        source_path = os.path.join(self.account_id, self.date)
+        sources = dict()
+        for region in enabled_regions:
+            for file_name in SOURCE_FILES:
+                path = region_file_path(source_path, region, file_name)
+                if os.path.exists(path):
+                    stat = os.stat(path)
+                    sources[path] = [stat.st_mtime_ns, stat.st_size]
+        return sources
+
+    def ingest(self, enabled_regions, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        source_path = os.path.join(self.account_id, self.date)
+        # Taken before reading, so a re-dump during ingestion reads as stale.
+        metadata = {"sources": json.dumps(self.source_files(enabled_regions))}
+        os.makedirs(self.dir_path, exist_ok=True)
+        self._write(
+            self.volumes_path,
+            VOLUME_SCHEMA.with_metadata(metadata),
+            (
+                [_volume_row(volume) for volume in chunk]
+                for chunk in chunked(
+                    iter_service_data(
+                        source_path, "volumes.json", "Volumes", enabled_regions
+                    ),
+                    chunk_size,
+                )
+            ),
+        )
+        self._write(
+            self.attachments_path,
+            ATTACHMENT_SCHEMA.with_metadata(metadata),
+            (
+                [row for reservation in chunk for row in attachment_rows(reservation)]
+                for chunk in chunked(
+                    iter_service_data(
+                        source_path, "instances.json", "Reservations", enabled_regions
+                    ),
+                    chunk_size,
+                )
+            ),
+        )
+
+    @staticmethod
+    def _read_sources(path: str):
+        try:
+            metadata = pa.ipc.open_file(pa.memory_map(path, "r")).schema.metadata
+            return json.loads(metadata[b"sources"])
+        except (OSError, pa.ArrowInvalid, TypeError, KeyError, ValueError):
+            return None
+
+    @staticmethod
+    def _write(path: str, schema: pa.Schema, row_chunks):
+        # Write to a temporary file first so readers never see a partial file.
+        temp_path = f"{path}.tmp"
+        dictionaries = {
+            field.name: dict() for field in schema if pa.types.is_dictionary(field.type)
+        }
+        # IPC files allow one dictionary per column, so batches extend it with
+        # deltas rather than each carrying their own.
+        options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        with pa.OSFile(temp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, schema, options=options) as writer:
+                for rows in row_chunks:
+                    if rows:
+                        writer.write_batch(_record_batch(rows, schema, dictionaries))
+        os.replace(temp_path, path)
+
+    def read_volumes(self) -> pa.Table:
+        return self._read(self.volumes_path)
+
+    def read_attachments(self) -> pa.Table:
+        return self._read(self.attachments_path)
+
+    @staticmethod
+    def _read(path: str) -> pa.Table:
+        return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+    def iter_volume_frames(self):
+        reader = pa.ipc.open_file(pa.memory_map(self.volumes_path, "r"))
+        for index in range(reader.num_record_batches):
+            yield to_volumes_frame(reader.get_batch(index))
+
+
+def to_volumes_frame(data):
+    # Dictionary columns convert straight to Categoricals.
+    return data.to_pandas()
+
+
+def list_snapshot_dates(account_id: str) -> list:
+    if not os.path.isdir(account_id):
+        return []
+    return sorted(
+        date
+        for date in os.listdir(account_id)
+        if SnapshotStore(account_id, date).exists()
+    )
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules are imported by plain name, as reporter.py and cli.py do.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from analysis import AnalysisCache, EBSAnalysis
+
+ACCOUNT_ID = "111111111111"
+DATE = "2024-05-28"
+
+
+def analysis():
+    return EBSAnalysis.from_categories(ACCOUNT_ID, DATE, {})
+
+
+def test_stored_analysis_is_reused_for_its_key(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    AnalysisCache().get_or_create(ACCOUNT_ID, DATE, analysis, key="a")
+    assert os.listdir(tmp_path / ACCOUNT_ID / DATE) == [AnalysisCache.file_name]
+    cache = AnalysisCache()
+    assert cache.load(ACCOUNT_ID, DATE, key="a") is not None
+    assert cache.load(ACCOUNT_ID, DATE, key="b") is None
+
+
+def test_truncated_file_is_a_cache_miss(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    AnalysisCache().get_or_create(ACCOUNT_ID, DATE, analysis, key="a")
+    path = tmp_path / ACCOUNT_ID / DATE / AnalysisCache.file_name
+    path.write_text(path.read_text()[:40])
+
+    cache = AnalysisCache()
+    assert cache.load(ACCOUNT_ID, DATE, key="a") is None
+    calls = list()
+    cache.get_or_create(
+        ACCOUNT_ID, DATE, lambda: calls.append(1) or analysis(), key="a"
+    )
+    assert calls == [1]
+    # The rebuilt analysis replaced the damaged file.
+    assert AnalysisCache().load(ACCOUNT_ID, DATE, key="a") is not None
+
+
+def test_failed_write_keeps_previous_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    AnalysisCache().get_or_create(ACCOUNT_ID, DATE, analysis, key="a")
+
+    def broken_to_json(self, key=None):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(EBSAnalysis, "to_json", broken_to_json)
+    with pytest.raises(RuntimeError):
+        AnalysisCache().get_or_create(ACCOUNT_ID, DATE, analysis, key="b")
+    assert os.listdir(tmp_path / ACCOUNT_ID / DATE) == [AnalysisCache.file_name]
+    assert AnalysisCache().load(ACCOUNT_ID, DATE, key="a") is not None
+
+
+def test_dry_run_reads_but_never_writes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    previous_date = "2024-05-27"
+    AnalysisCache().get_or_create(ACCOUNT_ID, previous_date, analysis, key="a")
+
+    cache = AnalysisCache(persist=False)
+    # --dry-run --incremental diffs against the previous day's analysis.
+    assert cache.load(ACCOUNT_ID, previous_date) is not None
+    cache.get_or_create(ACCOUNT_ID, DATE, analysis, key="a")
+    assert not (tmp_path / ACCOUNT_ID / DATE).exists()
+    cache.invalidate(ACCOUNT_ID, previous_date)
+    assert AnalysisCache().load(ACCOUNT_ID, previous_date, key="a") is not None
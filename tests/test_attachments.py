@@ -0,0 +1,101 @@
+import pandas as pd
+
+from attachments import AttachmentIndex, created_after
+
+STOPPED_BEFORE = "2024-05-01T00:00:00+00:00"
+
+
+def instance(instance_id, state, volume_ids, stopped="2024-04-01 10:00:00"):
+    return {
+        "InstanceId": instance_id,
+        "State": {"Name": state},
+        "StateTransitionReason": f"User initiated ({stopped} GMT)",
+        "BlockDeviceMappings": [
+            {
+                "DeviceName": f"/dev/sd{chr(ord('f') + index)}",
+                "Ebs": {
+                    "VolumeId": volume_id,
+                    "AttachTime": f"2024-01-0{index + 1}T00:00:00+00:00",
+                },
+            }
+            for index, volume_id in enumerate(volume_ids)
+        ],
+    }
+
+
+def reservation(*instances, region="us-east-1"):
+    return {"Instances": list(instances), "Region": region}
+
+
+def test_every_instance_of_a_reservation_is_indexed():
+    index = AttachmentIndex.from_reservations(
+        [
+            reservation(
+                instance("i-1", "running", ["vol-1", "vol-2"]),
+                instance("i-2", "stopped", ["vol-3"]),
+            ),
+            reservation(instance("i-3", "running", ["vol-4"]), region="us-west-2"),
+        ]
+    )
+    assert len(index) == 4
+    found = index.lookup(["vol-1", "vol-2", "vol-3", "vol-4"], STOPPED_BEFORE)
+    assert list(found["InstanceId"]) == ["i-1", "i-1", "i-2", "i-3"]
+    assert list(found["InstanceState"]) == ["running", "running", "stopped", "running"]
+    assert list(found["AttachTime"]) == [
+        "2024-01-01T00:00:00+00:00",
+        "2024-01-02T00:00:00+00:00",
+        "2024-01-01T00:00:00+00:00",
+        "2024-01-01T00:00:00+00:00",
+    ]
+    assert list(found["LongStopped"]) == [False, False, True, False]
+
+
+def test_multi_attached_volume_lists_every_instance():
+    index = AttachmentIndex.from_reservations(
+        [
+            reservation(
+                instance("i-1", "stopped", ["vol-shared", "vol-both"]),
+                instance("i-2", "running", ["vol-shared"]),
+                instance("i-3", "stopped", ["vol-both"], stopped="2024-04-20 10:00:00"),
+            )
+        ]
+    )
+    frame = index.frame
+    assert frame.loc["vol-shared", "InstanceId"] == "i-1,i-2"
+    assert frame.loc["vol-shared", "InstanceState"] == "stopped,running"
+    assert frame.loc["vol-both", "InstanceId"] == "i-1,i-3"
+    assert frame.loc["vol-both", "AttachTime"] == (
+        "2024-01-02T00:00:00+00:00,2024-01-01T00:00:00+00:00"
+    )
+    found = index.lookup(["vol-shared", "vol-both"], STOPPED_BEFORE)
+    # One running instance keeps a shared volume in use.
+    assert list(found["LongStopped"]) == [False, True]
+    # The latest stop decides: i-3 stopped after "2024-04-15".
+    found = index.lookup(["vol-both"], "2024-04-15T00:00:00+00:00")
+    assert not found["LongStopped"].iloc[0]
+
+
+def test_long_stopped_needs_a_known_stop_time_before_the_cutoff():
+    recent = instance("i-2", "stopped", ["vol-2"], stopped="2024-05-10 10:00:00")
+    unknown = instance("i-3", "stopped", ["vol-3"])
+    unknown["StateTransitionReason"] = ""
+    index = AttachmentIndex.from_reservations(
+        [reservation(instance("i-1", "stopped", ["vol-1"]), recent, unknown)]
+    )
+    found = index.lookup(["vol-1", "vol-2", "vol-3", "vol-missing"], STOPPED_BEFORE)
+    assert list(found["LongStopped"]) == [True, False, False, False]
+    assert found.loc["vol-missing", "InstanceId"] == ""
+    assert found.loc["vol-missing", "InstanceState"] == ""
+
+
+def test_created_after():
+    volumes = pd.DataFrame(
+        {
+            "CreateTime": [
+                "2024-04-01T00:00:00+00:00",
+                "2024-05-02T00:00:00+00:00",
+                "not a time",
+            ]
+        }
+    )
+    assert list(created_after(volumes, STOPPED_BEFORE)) == [False, True, False]
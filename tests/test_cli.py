@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cli
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def imports_after(statement: str) -> str:
+    """Run ``statement`` in a fresh interpreter and report what it loaded."""
+    return subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys; path = list(sys.path); {statement}; "
+            "print(sorted({'pandas', 'utils', 'settings'} & sys.modules.keys()), "
+            "sys.path == path)",
+        ],
+        cwd=PACKAGE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+
+
+def test_cli_import_is_light():
+    assert imports_after("import cli") == "[] True"
+
+
+def test_report_modules_leave_sys_path_and_utils_alone():
+    assert imports_after("import reporter, rules, engine") == "['pandas'] True"
+
+
+def test_dry_run_rejects_snapshot_source():
+    with pytest.raises(SystemExit):
+        cli.parse_args(["--dry-run", "--source", "snapshot"])
@@ -0,0 +1,207 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import cloudwatch as cloudwatch_module
+import throttling
+from benchmark import FakeCloudWatch
+from cloudwatch import CloudWatchMetrics
+from metrics_cache import MetricsCache
+from timeseries import BYTES_PER_MIB, STAT_COLUMNS
+
+ACCOUNT = SimpleNamespace(accountID="111111111111")
+VOLUME_IDS = [f"vol-{index}" for index in range(60)]
+
+
+class TimedCloudWatch(FakeCloudWatch):
+    """Datapoints that depend on their timestamp, so shifted windows overlap."""
+
+    def _series(self, volume_id, metric_name, start_time, end_time, period, stat):
+        timestamps, _ = super()._series(
+            volume_id, metric_name, start_time, end_time, period, stat
+        )
+        values = np.array(
+            [
+                self._fraction(f"{volume_id}:{metric_name}:{timestamp.timestamp()}")
+                * self.max_iops
+                for timestamp in timestamps
+            ]
+        )
+        return timestamps, values * (period if stat == "Sum" else 1)
+
+
+@pytest.fixture
+def cloudwatch():
+    return FakeCloudWatch(idle_ratio=0.2)
+
+
+@pytest.fixture
+def timed_cloudwatch():
+    return TimedCloudWatch()
+
+
+def metrics(cloudwatch, cache=None, days_later=0, **options):
+    result = CloudWatchMetrics(
+        ACCOUNT,
+        client_factory=lambda region: cloudwatch,
+        cache=cache if cache is not None else MetricsCache(ACCOUNT.accountID),
+        **options,
+    )
+    result.start_time += timedelta(days=days_later)
+    result.end_time += timedelta(days=days_later)
+    return result
+
+
+def test_region_stats_match_fake_series(cloudwatch):
+    fetcher = metrics(cloudwatch, batch_size=30)
+    stats = fetcher.get_region_stats("us-east-1", VOLUME_IDS)
+    periods = int((fetcher.end_time - fetcher.start_time).total_seconds()) // 3600
+    assert stats.columns.tolist() == STAT_COLUMNS
+    assert stats.index.tolist() == VOLUME_IDS
+    for volume_id in VOLUME_IDS[:10]:
+        iops = cloudwatch.values(
+            volume_id, "VolumeReadOps", periods
+        ) + cloudwatch.values(volume_id, "VolumeWriteOps", periods)
+        throughput = (
+            cloudwatch.values(volume_id, "VolumeReadBytes", periods)
+            + cloudwatch.values(volume_id, "VolumeWriteBytes", periods)
+        ) / BYTES_PER_MIB
+        assert stats.loc[volume_id, "PeakIOPS"] == pytest.approx(iops.max(), abs=0.01)
+        assert stats.loc[volume_id, "P95IOPS"] == pytest.approx(
+            np.percentile(iops, 95), abs=0.01
+        )
+        assert stats.loc[volume_id, "PeakThroughput"] == pytest.approx(
+            throughput.max(), abs=0.01
+        )
+    assert (stats["PeakIOPS"] == 0).any()
+
+
+def test_fine_period_stats(cloudwatch):
+    fetcher = metrics(cloudwatch)
+    hourly = fetcher.get_region_stats("us-east-1", VOLUME_IDS[:5])
+    fine = fetcher.get_region_stats("us-east-1", VOLUME_IDS[:5], period=300)
+    periods = int((fetcher.end_time - fetcher.start_time).total_seconds()) // 300
+    for volume_id in fine.index:
+        iops = cloudwatch.values(
+            volume_id, "VolumeReadOps", periods
+        ) + cloudwatch.values(volume_id, "VolumeWriteOps", periods)
+        assert fine.loc[volume_id, "PeakIOPS"] == pytest.approx(iops.max(), abs=0.01)
+    # Both periods are cached under their own windows.
+    keys = [(volume_id, "TotalIOPS") for volume_id in VOLUME_IDS[:5]]
+    for period in (3600, 300):
+        window = fetcher.window("Sum", period=period)
+        assert fetcher.cache.get_many("us-east-1", keys, window).keys() == set(keys)
+    assert not fine.equals(hourly)
+
+
+def test_cached_series_are_not_refetched(cloudwatch):
+    cache = MetricsCache(ACCOUNT.accountID)
+    first = metrics(cloudwatch, cache).get_region_stats("us-east-1", VOLUME_IDS)
+    calls = cloudwatch.calls
+    second = metrics(cloudwatch, cache).get_region_stats("us-east-1", VOLUME_IDS)
+    assert cloudwatch.calls == calls
+    assert second.equals(first)
+
+
+def test_roll_forward_matches_full_fetch(timed_cloudwatch, tmp_path):
+    cache = MetricsCache(ACCOUNT.accountID, path=str(tmp_path / "metrics.sqlite"))
+    metrics(timed_cloudwatch, cache).get_region_stats("us-east-1", VOLUME_IDS)
+
+    rolled_fetcher = metrics(timed_cloudwatch, cache, days_later=1)
+    keys = [(volume_id, "TotalIOPS") for volume_id in VOLUME_IDS]
+    datapoints = timed_cloudwatch.datapoints
+    rolled = rolled_fetcher._roll_forward("us-east-1", keys, "Sum")
+    # Only the newest day of hourly datapoints is fetched.
+    assert timed_cloudwatch.datapoints - datapoints == len(VOLUME_IDS) * 24
+    assert rolled.keys() == set(keys)
+
+    full = metrics(timed_cloudwatch, days_later=1).get_datapoints(
+        "us-east-1", VOLUME_IDS, ["TotalIOPS"], "Sum"
+    )
+    for key in keys:
+        np.testing.assert_allclose(rolled[key], full[key])
+    # The rolled series are cached under the new window.
+    cached = cache.get_many("us-east-1", keys, rolled_fetcher.window("Sum"))
+    assert cached.keys() == set(keys)
+
+
+def test_roll_forward_without_previous_window(timed_cloudwatch):
+    fetcher = metrics(timed_cloudwatch)
+    assert fetcher._roll_forward("us-east-1", [("vol-1", "TotalIOPS")], "Sum") == {}
+    assert timed_cloudwatch.calls == 0
+
+
+def test_rolling_stats_match_full_stats(timed_cloudwatch):
+    cache = MetricsCache(ACCOUNT.accountID)
+    metrics(timed_cloudwatch, cache).get_region_stats("us-east-1", VOLUME_IDS)
+    rolled = metrics(timed_cloudwatch, cache, days_later=1).get_region_stats(
+        "us-east-1", VOLUME_IDS, rolling=True
+    )
+    full = metrics(timed_cloudwatch, days_later=1).get_region_stats(
+        "us-east-1", VOLUME_IDS
+    )
+    np.testing.assert_allclose(rolled.to_numpy(), full.to_numpy())
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    """No backoff sleeps, and a limiter that never holds requests back."""
+    monkeypatch.setattr(throttling.random, "uniform", lambda low, high: 0.0)
+    limiter = throttling.AdaptiveRateLimiter(rate=1e6, min_rate=1e6, max_rate=1e6)
+    monkeypatch.setattr(cloudwatch_module, "get_rate_limiter", lambda *args: limiter)
+    return limiter
+
+
+class FailingCloudWatch(FakeCloudWatch):
+    """Fails every request that asks for one of ``failing`` volumes."""
+
+    def __init__(self, failing):
+        super().__init__()
+        self.failing = set(failing)
+
+    def get_metric_data(self, MetricDataQueries, **kwargs):
+        for query in MetricDataQueries:
+            dimensions = query.get("MetricStat", {}).get("Metric", {})
+            for dimension in dimensions.get("Dimensions", []):
+                if dimension["Value"] in self.failing:
+                    raise ConnectionError("connection reset")
+        return super().get_metric_data(MetricDataQueries, **kwargs)
+
+
+def test_throttled_requests_are_retried(fast_retries):
+    throttled = FakeCloudWatch(throttle_rate=0.5, seed=3)
+    stats = metrics(throttled, batch_size=30).get_region_stats("us-east-1", VOLUME_IDS)
+    assert throttled.throttles > 0
+    assert fast_retries.throttles == throttled.throttles
+    expected = metrics(FakeCloudWatch(seed=3)).get_region_stats("us-east-1", VOLUME_IDS)
+    assert stats.equals(expected)
+
+
+def test_failed_batches_leave_volumes_out(fast_retries):
+    # Three series per request: vol-1's two series fail in the requests that
+    # also carry vol-0's and vol-2's, so all three lose a series.
+    failing = FailingCloudWatch(["vol-1"])
+    fetcher = metrics(failing, batch_size=9)
+    stats = fetcher.get_region_stats("us-east-1", VOLUME_IDS)
+    assert fetcher.failed_requests == 2
+    assert stats.index.tolist() == VOLUME_IDS[3:]
+    assert set(fetcher.get_iops_by_region({"us-east-1": VOLUME_IDS})) == set(
+        VOLUME_IDS[3:]
+    )
+
+
+def test_failed_region_reports_no_volumes(fast_retries):
+    fetcher = metrics(FailingCloudWatch(VOLUME_IDS))
+    stats = fetcher.get_region_stats("us-east-1", VOLUME_IDS)
+    assert stats.empty
+    assert fetcher.get_region_iops("us-east-1", VOLUME_IDS) == {}
+
+
+def test_exhausted_throttling_leaves_volumes_out(fast_retries):
+    always_throttled = FakeCloudWatch(throttle_rate=1.0)
+    fetcher = metrics(always_throttled)
+    assert fetcher.get_region_stats("us-east-1", VOLUME_IDS[:3]).empty
+    assert always_throttled.calls == 8
+    assert fetcher.failed_requests == 1
@@ -0,0 +1,159 @@
+import os
+import smtplib
+from email import message_from_bytes, policy
+
+import pytest
+
+import delivery
+from delivery import Delivery, DeliveryQueue, SMTPSender, group_by_recipients
+
+
+class FakeSender:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.messages = list()
+        self.closed = False
+
+    def send(self, recipients, subject, html, attachments):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.messages.append((recipients, subject, html, attachments))
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSMTP:
+    """Stands in for smtplib.SMTP and records every message it is given."""
+
+    instances = list()
+
+    def __init__(self, host, port, timeout=None):
+        self.messages = list()
+        FakeSMTP.instances.append(self)
+
+    def send_message(self, message, to_addrs):
+        parsed = message_from_bytes(bytes(message), policy=policy.default)
+        self.messages.append((to_addrs, parsed))
+
+    def quit(self):
+        pass
+
+
+def report(title):
+    return {"title": title, "date": "2024-05-28", "report_data": {"table_names": []}}
+
+
+@pytest.fixture
+def attachment(tmp_path):
+    path = tmp_path / "111_report.csv"
+    path.write_text("VolumeId\nvol-1\n")
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(delivery.time, "sleep", lambda seconds: None)
+
+
+def test_group_by_recipients_shares_identical_selections():
+    first = Delivery("111", ("a@example.com", "b@example.com"), "s", (report("111"),))
+    second = Delivery("222", ("a@example.com",), "s", (report("222"),))
+    groups = group_by_recipients([first, second])
+    assert groups == [
+        (("a@example.com",), [first, second]),
+        (("b@example.com",), [first]),
+    ]
+
+
+def test_digest_sends_one_message_per_recipient_set(tmp_path, attachment):
+    sender = FakeSender()
+    with DeliveryQueue(sender=sender, output_dir=str(tmp_path)) as queue:
+        for account_id in ("111", "222"):
+            queue.put(
+                Delivery(
+                    account_id,
+                    ("a@example.com",),
+                    "s",
+                    (report(f"acct {account_id}"),),
+                    (("r.csv", attachment),),
+                )
+            )
+    assert queue.stats() == {"sent": 1, "retries": 0, "failed": 0}
+    [(recipients, subject, html, attachments)] = sender.messages
+    assert recipients == ["a@example.com"]
+    assert subject == f"{delivery.DIGEST_SUBJECT}: 2 reports"
+    assert "acct 111" in html and "acct 222" in html
+    # The same file queued twice is attached once.
+    assert attachments == [("r.csv", attachment)]
+    assert sender.closed
+
+
+def test_attachments_with_equal_content_are_kept(tmp_path):
+    paths = list()
+    for name in ("111.csv", "222.csv"):
+        (tmp_path / name).write_text("same")
+        paths.append(str(tmp_path / name))
+    queue = DeliveryQueue(sender=FakeSender(), output_dir=str(tmp_path))
+    deliveries = [
+        Delivery(name, ("a@example.com",), "s", (), ((name, path),))
+        for name, path in zip(("111", "222"), paths)
+    ]
+    assert queue._attachments(deliveries) == [("111", paths[0]), ("222", paths[1])]
+    queue.close()
+
+
+def test_transient_errors_are_retried():
+    sender = FakeSender(
+        [
+            smtplib.SMTPServerDisconnected("gone"),
+            smtplib.SMTPResponseException(451, b"try later"),
+        ]
+    )
+    queue = DeliveryQueue(sender=sender, digest=False)
+    queue.put(Delivery("111", ("a@example.com",), "s", (report("111"),)))
+    assert queue.close() == {"sent": 1, "retries": 2, "failed": 0}
+
+
+def test_permanent_errors_are_not_retried():
+    sender = FakeSender([smtplib.SMTPResponseException(550, b"no such user")])
+    queue = DeliveryQueue(sender=sender, digest=False)
+    queue.put(Delivery("111", ("a@example.com",), "s", (report("111"),)))
+    assert queue.close() == {"sent": 0, "retries": 0, "failed": 1}
+    assert sender.messages == []
+
+
+def test_temporary_output_dir_is_removed_on_close():
+    queue = DeliveryQueue(sender=FakeSender())
+    queue.put(Delivery("111", ("a@example.com",), "s", (report("111"),)))
+    output_dir = queue.output_dir
+    queue.close()
+    assert not os.path.exists(output_dir)
+
+
+def test_given_output_dir_is_kept(tmp_path):
+    queue = DeliveryQueue(sender=FakeSender(), output_dir=str(tmp_path))
+    queue.put(Delivery("111", ("a@example.com",), "s", (report("111"),)))
+    queue.close()
+    assert os.listdir(tmp_path)
+
+
+def test_smtp_sender_reuses_one_connection(monkeypatch, attachment):
+    FakeSMTP.instances = list()
+    monkeypatch.setattr(delivery.smtplib, "SMTP", FakeSMTP)
+    sender = SMTPSender("smtp.example.com", from_address="reports@example.com")
+    queue = DeliveryQueue(sender=sender, digest=False)
+    queue.put(
+        Delivery(
+            "111", ("a@example.com",), "s1", (report("111"),), (("r.csv", attachment),)
+        )
+    )
+    queue.put(Delivery("222", ("b@example.com",), "s2", (report("222"),)))
+    assert queue.close() == {"sent": 2, "retries": 0, "failed": 0}
+    assert sender.connections == 1
+    [connection] = FakeSMTP.instances
+    (to_first, first), (to_second, second) = connection.messages
+    assert to_first == ["a@example.com"] and to_second == ["b@example.com"]
+    assert first["From"] == "reports@example.com"
+    assert [part.get_filename() for part in first.iter_attachments()] == ["r.csv"]
+    assert "222" in second.get_body(("html",)).get_content()
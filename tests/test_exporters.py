@@ -0,0 +1,76 @@
+import csv
+import gzip
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from analysis import EBSAnalysis
+from exporters import export_report, report_schema
+from savings import REPORT_COLUMNS
+from timeseries import STAT_COLUMNS
+
+
+def report_row(volume_id, volume_type, state, stats=None, savings=1.5):
+    row = {
+        "VolumeId": volume_id,
+        "Size": 100,
+        "VolumeType": volume_type,
+        "Iops": 3000,
+        "Throughput": 125,
+        "State": state,
+        "InstanceId": "" if state == "available" else "i-1",
+        "CreateTime": "2024-01-01T00:00:00+00:00",
+        "AvailabilityZone": "us-east-1a",
+        "SnapshotId": "",
+        "SavingsPossible": savings,
+        "Region": "us-east-1",
+        "Recommendation": "Convert",
+    }
+    row.update(dict.fromkeys(STAT_COLUMNS, None) if stats is None else stats)
+    return row
+
+
+def reloaded_analysis():
+    stats = dict(zip(STAT_COLUMNS, (12.0, 10.5, 11.25, 0.5, 0.25)))
+    categories = {
+        # Available volumes have no stats, so every stat column is null.
+        "available_volumes": pd.DataFrame(
+            [
+                report_row("vol-1", "gp2", "available"),
+                report_row("vol-2", "io1", "available"),
+            ],
+            columns=REPORT_COLUMNS,
+        ),
+        "gp2_volumes": pd.DataFrame(
+            [
+                report_row(f"vol-{index}", "gp2", "in-use", stats)
+                for index in range(3, 6)
+            ],
+            columns=REPORT_COLUMNS,
+        ),
+    }
+    analysis = EBSAnalysis.from_categories("111111111111", "2024-05-28", categories)
+    return EBSAnalysis.from_json(analysis.to_json(key="key"))
+
+
+@pytest.mark.parametrize("export_format", ["parquet", "csv.gz"])
+def test_reloaded_analysis_exports(tmp_path, export_format):
+    analysis = reloaded_analysis()
+    result = export_report(
+        analysis.categories.values(), str(tmp_path), "ebs_report", export_format
+    )
+    assert result.rows == 5
+    assert result.size > 0
+    if export_format == "parquet":
+        table = pq.read_table(result.path)
+        assert table.schema.remove_metadata() == report_schema()
+        assert table.num_rows == 5
+        assert table["PeakIOPS"].null_count == 2
+        assert table["Size"].to_pylist() == [100] * 5
+    else:
+        with gzip.open(result.path, "rt", newline="") as file:
+            rows = list(csv.reader(file))
+        assert rows[0] == REPORT_COLUMNS
+        assert len(rows) == 6
+        assert [row[0] for row in rows[1:]] == [f"vol-{index}" for index in range(1, 6)]
@@ -0,0 +1,72 @@
+import json
+
+import pandas as pd
+
+from incremental import VolumeDelta, diff_inventories, inventory, unchanged_volume_ids
+from savings import volumes_frame
+
+
+def volume(volume_id, size=100, volume_type="gp2", iops=300, state="in-use"):
+    return {
+        "VolumeId": volume_id,
+        "Size": size,
+        "VolumeType": volume_type,
+        "Iops": iops,
+        "Throughput": 0,
+        "State": state,
+        "CreateTime": "2024-01-01T00:00:00+00:00",
+        "AvailabilityZone": "us-east-1a",
+        "Region": "us-east-1",
+    }
+
+
+PREVIOUS = [volume("vol-kept"), volume("vol-resized"), volume("vol-deleted")]
+CURRENT = [
+    volume("vol-kept"),
+    volume("vol-resized", size=200),
+    volume("vol-new"),
+    volume("vol-retyped", volume_type="gp3"),
+]
+
+
+def roundtrip(frame: pd.DataFrame) -> pd.DataFrame:
+    """The inventory as EBSAnalysis.to_json stores it between runs."""
+    stored = json.loads(frame.to_json(orient="split", index=False))
+    return pd.DataFrame(stored["data"], columns=stored["columns"])
+
+
+def test_diff_inventories():
+    previous = roundtrip(inventory(volumes_frame(PREVIOUS)))
+    delta = diff_inventories(inventory(volumes_frame(CURRENT)), previous, "2024-05-27")
+    assert set(delta.new) == {"vol-new", "vol-retyped"}
+    assert delta.changed == ("vol-resized",)
+    assert delta.deleted == ("vol-deleted",)
+    assert delta.unchanged_count == 1
+    assert delta.summary()["deleted_volumes_count"] == 1
+    assert VolumeDelta.from_dict(json.loads(json.dumps(delta.to_dict()))) == delta
+
+
+def test_unchanged_volume_ids():
+    previous = roundtrip(inventory(volumes_frame(PREVIOUS)))
+    assert unchanged_volume_ids(volumes_frame(CURRENT), previous) == {"vol-kept"}
+
+
+def test_every_config_column_invalidates():
+    previous = roundtrip(inventory(volumes_frame([volume("vol-1")])))
+    for changed in (
+        volume("vol-1", size=101),
+        volume("vol-1", volume_type="gp3"),
+        volume("vol-1", iops=301),
+        volume("vol-1", state="available"),
+        {**volume("vol-1"), "Region": "us-west-2"},
+    ):
+        assert unchanged_volume_ids(volumes_frame([changed]), previous) == set()
+
+
+def test_unchanged_after_reload():
+    frame = volumes_frame(PREVIOUS)
+    previous = roundtrip(inventory(frame))
+    assert unchanged_volume_ids(frame, previous) == {v["VolumeId"] for v in PREVIOUS}
+    delta = diff_inventories(inventory(frame), previous, "2024-05-27")
+    assert (delta.new, delta.changed, delta.deleted) == ((), (), ())
+    assert delta.unchanged_count == len(PREVIOUS)
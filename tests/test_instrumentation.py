@@ -0,0 +1,69 @@
+import json
+
+from instrumentation import Instrumentation
+
+
+def recorded():
+    instrumentation = Instrumentation(labels={"account": "111111111111"})
+    instrumentation.add_span("analyze", 1.5)
+    instrumentation.add_span("analyze", 0.25)
+    instrumentation.incr("cloudwatch_calls", 3, labels={"region": "us-east-1"})
+    instrumentation.incr("cloudwatch_calls", labels={"region": "us-east-1"})
+    instrumentation.incr("unpriced_volumes")
+    instrumentation.gauge("export_rows", 42, labels={"format": "csv.gz"})
+    instrumentation.gauge("export-bytes", 7, labels={"path": 'a "b"\\c\n'})
+    return instrumentation
+
+
+def test_to_prometheus():
+    lines = recorded().to_prometheus(prefix="ebs").splitlines()
+    account = 'account="111111111111"'
+    assert "# TYPE ebs_stage_seconds gauge" in lines
+    assert f'ebs_stage_seconds{{{account},stage="analyze"}} 1.75' in lines
+    assert f'ebs_stage_calls{{{account},stage="analyze"}} 2' in lines
+    assert "# TYPE ebs_cloudwatch_calls_total counter" in lines
+    assert f'ebs_cloudwatch_calls_total{{{account},region="us-east-1"}} 4' in lines
+    assert f"ebs_unpriced_volumes_total{{{account}}} 1" in lines
+    assert "# TYPE ebs_export_rows gauge" in lines
+    assert f'ebs_export_rows{{{account},format="csv.gz"}} 42' in lines
+    # Names are sanitized and label values escaped.
+    assert f'ebs_export_bytes{{{account},path="a \\"b\\"\\\\c\\n"}} 7' in lines
+    # Every family is typed once, before its samples.
+    families = [line.split()[2] for line in lines if line.startswith("# TYPE")]
+    assert len(families) == len(set(families))
+    assert "ebs_peak_rss_bytes" in families
+
+
+def test_write(tmp_path):
+    instrumentation = recorded()
+    paths = instrumentation.write(str(tmp_path / "metrics"), "report", prefix="ebs")
+    assert paths == [
+        str(tmp_path / "metrics" / "report.json"),
+        str(tmp_path / "metrics" / "report.prom"),
+    ]
+    with open(paths[0]) as file:
+        assert json.load(file) == json.loads(json.dumps(instrumentation.to_dict()))
+    with open(paths[1]) as file:
+        assert file.read() == instrumentation.to_prometheus("ebs")
+    # Replaced atomically, so no temporary files are left behind.
+    assert sorted(path.name for path in (tmp_path / "metrics").iterdir()) == [
+        "report.json",
+        "report.prom",
+    ]
+
+
+def test_hooks_receive_every_value_and_failures_are_contained():
+    seen = list()
+
+    def failing(*args):
+        raise RuntimeError("collector down")
+
+    instrumentation = Instrumentation(
+        labels={"account": "1"}, hooks=[failing, lambda *args: seen.append(args)]
+    )
+    instrumentation.incr("calls", 2, labels={"region": "us-east-1"})
+    instrumentation.gauge("rows", 5)
+    assert seen == [
+        ("counter", "calls", 2, {"account": "1", "region": "us-east-1"}),
+        ("gauge", "rows", 5, {"account": "1"}),
+    ]
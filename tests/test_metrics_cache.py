@@ -0,0 +1,51 @@
+import numpy as np
+
+import metrics_cache
+from metrics_cache import MetricsCache
+
+
+def series(count):
+    return {
+        (f"vol-{index}", metric): np.arange(24.0) + index
+        for index in range(count)
+        for metric in ("TotalIOPS", "TotalThroughput")
+    }
+
+
+def test_sqlite_load_returns_only_requested_keys(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics_cache, "LOAD_BATCH_SIZE", 7)
+    cache = MetricsCache("111", path=str(tmp_path / "metrics.sqlite"))
+    stored = series(30)
+    cache.set_many("us-east-1", stored, "window")
+    keys = [(f"vol-{index}", "TotalIOPS") for index in range(0, 30, 2)]
+    found = cache.get_many("us-east-1", [*keys, ("vol-missing", "TotalIOPS")], "window")
+    assert found.keys() == set(keys)
+    for key in keys:
+        np.testing.assert_array_equal(found[key], stored[key])
+    assert (cache.hits, cache.misses) == (len(keys), 1)
+    assert cache.get_many("us-west-2", keys, "window") == {}
+    assert cache.get_many("us-east-1", keys, "other") == {}
+
+
+def test_sqlite_cache_survives_reopen(tmp_path):
+    path = str(tmp_path / "metrics.sqlite")
+    MetricsCache("111", path=path).set_many("us-east-1", series(3), "window")
+    reopened = MetricsCache("111", path=path)
+    assert len(reopened.get_many("us-east-1", list(series(3)), "window")) == 6
+    assert MetricsCache("222", path=path).get_many(
+        "us-east-1", list(series(3)), "window"
+    ) == {}
+
+
+def test_expired_series_are_ignored(tmp_path):
+    cache = MetricsCache("111", path=str(tmp_path / "metrics.sqlite"), ttl=-1)
+    cache.set_many("us-east-1", series(3), "window")
+    assert cache.get_many("us-east-1", list(series(3)), "window") == {}
+
+
+def test_memory_cache_is_bounded():
+    cache = MetricsCache("111", max_memory_series=4)
+    stored = series(5)
+    cache.set_many("us-east-1", stored, "window")
+    found = cache.get_many("us-east-1", list(stored), "window")
+    assert list(found) == list(stored)[-4:]
@@ -0,0 +1,97 @@
+import copy
+import json
+
+import numpy as np
+import pytest
+
+from pricing import PRICING_PATH, PricingSchemaError, compile_pricing
+
+with open(PRICING_PATH) as file:
+    PRICING = json.load(file)
+REGION = next(iter(PRICING["AWSEBS"]))
+
+
+def ebs_prices(pricing):
+    return pricing["AWSEBS"][REGION]
+
+
+def test_shipped_pricing_compiles():
+    index = compile_pricing(PRICING)
+    assert index.ebs.regions == tuple(PRICING["AWSEBS"])
+    assert len(index.version) == 40
+
+
+def test_missing_key():
+    pricing = copy.deepcopy(PRICING)
+    del ebs_prices(pricing)["io2_iops"]["32k_to_64k"]
+    message = rf"AWSEBS\.{REGION}\.io2_iops\.32k_to_64k: missing"
+    with pytest.raises(PricingSchemaError, match=message):
+        compile_pricing(pricing)
+
+
+def test_missing_service():
+    pricing = copy.deepcopy(PRICING)
+    del pricing["AWSVPN"]
+    with pytest.raises(PricingSchemaError, match="AWSVPN: missing"):
+        compile_pricing(pricing)
+
+
+def test_extra_key():
+    pricing = copy.deepcopy(PRICING)
+    ebs_prices(pricing)["st1_perGB"] = 0.045
+    with pytest.raises(PricingSchemaError, match=r"st1_perGB: unexpected key"):
+        compile_pricing(pricing)
+
+
+@pytest.mark.parametrize("value", ["0.08", None, True, {"price": 0.08}])
+def test_non_numeric_price(value):
+    pricing = copy.deepcopy(PRICING)
+    ebs_prices(pricing)["gp3_perGB"] = value
+    with pytest.raises(PricingSchemaError, match=r"gp3_perGB: expected a number"):
+        compile_pricing(pricing)
+
+
+def test_errors_are_reported_together():
+    pricing = copy.deepcopy(PRICING)
+    del ebs_prices(pricing)["gp2_perGB"]
+    ebs_prices(pricing)["io1_iops"] = "free"
+    with pytest.raises(PricingSchemaError) as error:
+        compile_pricing(pricing)
+    assert "gp2_perGB: missing" in str(error.value)
+    assert "io1_iops: expected a number" in str(error.value)
+
+
+def test_gp3_throughput_alias():
+    misspelled = copy.deepcopy(PRICING)
+    spelled = copy.deepcopy(PRICING)
+    for prices in spelled["AWSEBS"].values():
+        prices["gp3_throughput"] = prices.pop("gp3_throughtput")
+    ebs_prices(misspelled)["gp3_throughtput"] = 0.0425
+    ebs_prices(spelled)["gp3_throughput"] = 0.0425
+    for pricing in (misspelled, spelled):
+        assert compile_pricing(pricing).ebs.price(REGION, "gp3_throughput") == 0.0425
+
+
+def test_derived_deltas():
+    ebs = compile_pricing(PRICING).ebs
+    for region, prices in PRICING["AWSEBS"].items():
+        expected = {
+            "gp2_to_gp3_perGB": prices["gp2_perGB"] - prices["gp3_perGB"],
+            "io1_to_gp3_perGB": prices["io1_perGB"] - prices["gp3_perGB"],
+            "io1_to_io2_perGB": prices["io1_perGB"] - prices["io2_perGB"],
+            "io2_to_gp3_perGB": prices["io2_perGB"] - prices["gp3_perGB"],
+            **{
+                f"io1_to_io2_iops.{tier}": prices["io1_iops"] - price
+                for tier, price in prices["io2_iops"].items()
+            },
+        }
+        for field, delta in expected.items():
+            assert ebs.price(region, field) == pytest.approx(delta), (region, field)
+
+
+def test_unknown_regions_get_nan_rows():
+    ebs = compile_pricing(PRICING).ebs
+    rows = ebs.rows([REGION, "xx-nowhere-1"])
+    assert not np.isnan(rows[0]).any()
+    assert np.isnan(rows[1]).all()
+    assert list(ebs.unpriced([REGION, "xx-nowhere-1"])) == [False, True]
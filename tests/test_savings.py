@@ -0,0 +1,242 @@
+import json
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pricing import PRICING_PATH
+from savings import (
+    CATEGORIES,
+    IO1_TO_GP3_RECOMMENDATION,
+    SavingsEngine,
+    volumes_frame,
+)
+from timeseries import series_statistics
+
+with open(PRICING_PATH) as file:
+    EBS_PRICING = json.load(file)["AWSEBS"]
+REGIONS = list(EBS_PRICING)
+IO2_TIERS = (("0_to_32k", 0, 32000), ("32k_to_64k", 32000, 64000))
+
+
+def io2_iops_cost(iops, prices, io1_iops=0.0):
+    """Tiered io2 IOPS cost, less ``io1_iops`` per IOPS."""
+    cost = 0.0
+    for tier, low, high in (*IO2_TIERS, ("64k_greater", 64000, float("inf"))):
+        tier_iops = min(max(iops - low, 0), high - low)
+        cost += tier_iops * (prices["io2_iops"][tier] - io1_iops)
+    return cost
+
+
+def gp3_cost(volume, prices):
+    return (
+        volume["Size"] * prices["gp3_perGB"]
+        + max(volume["Iops"] - 3000, 0) * prices["gp3_iops"]
+        + max(volume["Throughput"] - 125, 0) * prices["gp3_throughtput"]
+    )
+
+
+def current_cost(volume, prices):
+    if volume["VolumeType"] == "gp2":
+        return volume["Size"] * prices["gp2_perGB"]
+    if volume["VolumeType"] == "gp3":
+        return gp3_cost(volume, prices)
+    if volume["VolumeType"] == "io1":
+        return (
+            volume["Size"] * prices["io1_perGB"] + volume["Iops"] * prices["io1_iops"]
+        )
+    if volume["VolumeType"] == "io2":
+        return volume["Size"] * prices["io2_perGB"] + io2_iops_cost(
+            volume["Iops"], prices
+        )
+    return 0.0
+
+
+def reference_report(volumes, volume_iops, long_stopped):
+    """(category, savings, recommendation) per reported volume, one volume at a
+    time in the order of the per-volume loops SavingsEngine replaced."""
+    rows = dict()
+    for volume in volumes:
+        prices = EBS_PRICING[volume["Region"]]
+        measured = volume_iops.get(volume["VolumeId"])
+        below_threshold = volume_iops.get(volume["VolumeId"], float("inf")) <= 2500
+        recommendation = None
+        if volume["State"] == "available":
+            category = "available_volumes"
+        elif volume["VolumeId"] in long_stopped:
+            category = "stopped_instance_volumes"
+        elif measured == 0:
+            category = "zero_iops_volume"
+        elif volume["VolumeType"] == "gp2":
+            category = "gp2_volumes"
+        elif volume["VolumeType"] == "io1":
+            category = "io1_volumes"
+        elif volume["VolumeType"] == "io2" and below_threshold:
+            category = "io2_volumes"
+        else:
+            continue
+
+        if category in (
+            "available_volumes",
+            "stopped_instance_volumes",
+            "zero_iops_volume",
+        ):
+            savings = current_cost(volume, prices)
+        elif category == "gp2_volumes":
+            savings = current_cost(volume, prices) - gp3_cost(volume, prices)
+        elif category == "io1_volumes" and below_threshold:
+            savings = (
+                volume["Size"] * (prices["io1_perGB"] - prices["gp3_perGB"])
+                + volume["Iops"] * prices["io1_iops"]
+            )
+            recommendation = IO1_TO_GP3_RECOMMENDATION
+        elif category == "io1_volumes":
+            savings = volume["Size"] * (
+                prices["io1_perGB"] - prices["io2_perGB"]
+            ) - io2_iops_cost(volume["Iops"], prices, prices["io1_iops"])
+        else:
+            savings = volume["Size"] * (
+                prices["io2_perGB"] - prices["gp3_perGB"]
+            ) + io2_iops_cost(volume["Iops"], prices)
+        rows[volume["VolumeId"]] = (
+            category,
+            savings,
+            recommendation or CATEGORIES[category],
+        )
+    return rows
+
+
+def volume(
+    volume_id, volume_type, size, iops, throughput=0, state="in-use", region=None
+):
+    return {
+        "VolumeId": volume_id,
+        "Size": size,
+        "VolumeType": volume_type,
+        "Iops": iops,
+        "Throughput": throughput,
+        "State": state,
+        "CreateTime": "2024-01-01T00:00:00+00:00",
+        "AvailabilityZone": f"{region or REGIONS[0]}a",
+        "Region": region or REGIONS[0],
+    }
+
+
+def evaluate(volumes, volume_iops, long_stopped=()):
+    frame = volumes_frame(volumes)
+    attachments = pd.DataFrame(
+        {
+            "InstanceId": np.where(
+                frame["VolumeId"].isin(long_stopped), "i-stopped", ""
+            ).astype(object),
+            "LongStopped": frame["VolumeId"].isin(long_stopped).to_numpy(),
+        },
+        index=pd.Index(frame["VolumeId"], name="VolumeId"),
+    )
+    report = SavingsEngine().evaluate(frame, volume_iops, attachments)
+    return {
+        row.VolumeId: (row.Category, row.SavingsPossible, row.Recommendation)
+        for row in report.itertuples()
+    }
+
+
+def assert_matches_reference(volumes, volume_iops, long_stopped=()):
+    expected = reference_report(volumes, volume_iops, set(long_stopped))
+    actual = evaluate(volumes, volume_iops, long_stopped)
+    assert actual.keys() == expected.keys()
+    for volume_id, (category, savings, recommendation) in expected.items():
+        assert actual[volume_id][0] == category, volume_id
+        assert actual[volume_id][1] == pytest.approx(savings), volume_id
+        assert actual[volume_id][2] == recommendation, volume_id
+
+
+def test_random_fleet_matches_per_volume_reference():
+    rng = random.Random(7)
+    volumes, volume_iops, long_stopped = list(), dict(), set()
+    for index in range(2000):
+        volume_id = f"vol-{index}"
+        volume_type = rng.choice(["gp2", "gp3", "io1", "io2", "st1"])
+        volumes.append(
+            volume(
+                volume_id,
+                volume_type,
+                size=rng.randint(1, 16000),
+                iops=rng.choice([0, 100, 3000, 5000, 32000, 50000, 64000, 90000]),
+                throughput=rng.choice([0, 125, 250, 1000]),
+                state=rng.choice(["in-use"] * 9 + ["available"]),
+                region=rng.choice(REGIONS),
+            )
+        )
+        roll = rng.random()
+        if roll < 0.1:
+            volume_iops[volume_id] = 0
+        elif roll < 0.8:
+            volume_iops[volume_id] = rng.choice([100, 2500, 2501, 8000])
+        if rng.random() < 0.05:
+            long_stopped.add(volume_id)
+    assert_matches_reference(volumes, volume_iops, long_stopped)
+
+
+@pytest.mark.parametrize("iops", [16000, 32000, 40000, 64000, 90000])
+def test_io2_tiers(iops):
+    volumes = [
+        volume("vol-idle", "io2", 500, iops, state="available"),
+        volume("vol-io2", "io2", 500, iops),
+        volume("vol-io1", "io1", 500, iops),
+    ]
+    assert_matches_reference(volumes, {"vol-io2": 100, "vol-io1": 8000})
+
+
+def test_io2_tiers_are_priced_separately():
+    prices = EBS_PRICING[REGIONS[0]]
+    savings = evaluate([volume("vol-1", "io2", 1, 70000, state="available")], {})
+    assert savings["vol-1"][1] == pytest.approx(
+        prices["io2_perGB"]
+        + 32000 * prices["io2_iops"]["0_to_32k"]
+        + 32000 * prices["io2_iops"]["32k_to_64k"]
+        + 6000 * prices["io2_iops"]["64k_greater"]
+    )
+
+
+@pytest.mark.parametrize(
+    "iops, throughput", [(3000, 125), (100, 0), (6000, 125), (3000, 500), (9000, 750)]
+)
+def test_gp3_baselines(iops, throughput):
+    volumes = [
+        volume("vol-gp2", "gp2", 1000, iops, throughput),
+        volume("vol-gp3", "gp3", 1000, iops, throughput, state="available"),
+    ]
+    assert_matches_reference(volumes, {"vol-gp2": 500})
+
+
+def test_gp3_baseline_is_free():
+    prices = EBS_PRICING[REGIONS[0]]
+    savings = evaluate([volume("vol-1", "gp2", 100, 3000, 125)], {"vol-1": 500})
+    assert savings["vol-1"][1] == pytest.approx(
+        100 * (prices["gp2_perGB"] - prices["gp3_perGB"])
+    )
+
+
+def test_missing_metrics_are_not_idle():
+    report = evaluate(
+        [volume("vol-io2", "io2", 100, 5000), volume("vol-gp3", "gp3", 100, 3000)], {}
+    )
+    assert report == {}
+
+
+def test_unpriced_regions_have_unknown_savings():
+    report = evaluate([volume("vol-1", "gp2", 100, 300, region="xx-nowhere-1")], {})
+    category, savings, _ = report["vol-1"]
+    assert category == "gp2_volumes"
+    assert np.isnan(savings)
+
+
+@pytest.mark.parametrize("period, operations", [(3600, 15), (300, 1)])
+def test_low_activity_volumes_are_not_idle(period, operations):
+    # A steady trickle of ``operations`` per period, as per-second rates.
+    iops = np.full((1, 14 * 86400 // period), operations / period)
+    stats = series_statistics(["vol-1"], iops, np.zeros_like(iops))
+    report = evaluate([volume("vol-1", "io2", 100, 5000)], stats)
+    assert report["vol-1"][0] == "io2_volumes"
+    assert report["vol-1"][1] > 0
@@ -0,0 +1,77 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from scheduler import ReportScheduler
+
+ACCOUNTS = [SimpleNamespace(accountID=f"{index:012d}") for index in range(6)]
+
+
+class FakeReport:
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+    metrics_written = list()
+
+    def __init__(self, account, date, failing=(), **options):
+        self.account = account
+        self.date = date
+        self.failing = failing
+        self.options = options
+
+    def analyze(self):
+        with FakeReport.lock:
+            FakeReport.running += 1
+            FakeReport.peak = max(FakeReport.peak, FakeReport.running)
+        time.sleep(0.02)
+        with FakeReport.lock:
+            FakeReport.running -= 1
+        if self.account.accountID in self.failing:
+            raise RuntimeError("throttled for good")
+        return {"account": self.account.accountID, **self.options}
+
+    def write_metrics(self, dir_path=None):
+        FakeReport.metrics_written.append(self.account.accountID)
+
+
+def setup_function():
+    FakeReport.running = FakeReport.peak = 0
+    FakeReport.metrics_written = list()
+
+
+def test_failing_account_does_not_stop_the_others():
+    failing = ACCOUNTS[2].accountID
+    results = ReportScheduler(
+        ACCOUNTS,
+        "2024-05-28",
+        FakeReport,
+        action="analyze",
+        report_options={"failing": (failing,)},
+    ).run()
+    assert isinstance(results.pop(failing), RuntimeError)
+    assert set(results) == {account.accountID for account in ACCOUNTS} - {failing}
+    # Metrics are written for failed reports too.
+    assert len(FakeReport.metrics_written) == len(ACCOUNTS)
+
+
+def test_accounts_run_concurrently_up_to_the_limit():
+    ReportScheduler(
+        ACCOUNTS, "2024-05-28", FakeReport, action="analyze", max_concurrent_accounts=2
+    ).run()
+    assert FakeReport.peak == 2
+
+
+def test_options_and_callable_actions():
+    results = ReportScheduler(
+        ACCOUNTS[:1],
+        "2024-05-28",
+        FakeReport,
+        action=lambda report: report.options,
+        write_metrics=False,
+    ).run()
+    assert results[ACCOUNTS[0].accountID] == {
+        "max_concurrent_regions": 8,
+        "max_concurrent_requests": 4,
+        "hooks": None,
+    }
+    assert FakeReport.metrics_written == []
@@ -0,0 +1,35 @@
+import json
+from types import SimpleNamespace
+
+from service_context import ServiceContext
+
+ACCOUNT = SimpleNamespace(
+    accountID="111111111111", aws_enabled_regions=["us-east-1", "us-west-2"]
+)
+
+
+def write_inventory(root, region, reservations):
+    path = root / ACCOUNT.accountID / "2024-05-28" / region / "instances.json"
+    path.parent.mkdir(parents=True)
+    path.write_text(json.dumps({"Reservations": reservations}))
+
+
+def test_streaming_inventory_feeds_convert_item_by_item(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_inventory(tmp_path, "us-east-1", [{"ReservationId": "r-1"}])
+    write_inventory(tmp_path, "us-west-2", [{"ReservationId": "r-2"}])
+    context = ServiceContext(ACCOUNT, "2024-05-28", persist=False)
+    seen = list()
+
+    def convert(items):
+        # An iterator, not a loaded list.
+        assert not isinstance(items, list)
+        for item in items:
+            seen.append((item["ReservationId"], item["Region"]))
+        return len(seen)
+
+    assert context.inventory("instances.json", "Reservations", convert, True) == 2
+    assert seen == [("r-1", "us-east-1"), ("r-2", "us-west-2")]
+    # Computed once per (file, root element, convert).
+    assert context.inventory("instances.json", "Reservations", convert, True) == 2
+    assert len(seen) == 2
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pandas as pd
+
+from snapshots import SnapshotStore
+
+ACCOUNT_ID = "111111111111"
+DATE = "2024-05-28"
+REGIONS = ["us-east-1", "us-west-2"]
+
+
+def volume(volume_id, volume_type="gp2", state="in-use", region="us-east-1"):
+    return {
+        "VolumeId": volume_id,
+        "Size": 100,
+        "VolumeType": volume_type,
+        "Iops": 300,
+        "State": state,
+        "CreateTime": "2024-01-01T00:00:00+00:00",
+        "AvailabilityZone": f"{region}a",
+    }
+
+
+def write_day(root, region, volumes, reservations=()):
+    region_path = root / ACCOUNT_ID / DATE / region
+    region_path.mkdir(parents=True, exist_ok=True)
+    (region_path / "volumes.json").write_text(json.dumps({"Volumes": volumes}))
+    (region_path / "instances.json").write_text(
+        json.dumps({"Reservations": list(reservations)})
+    )
+
+
+def test_categorical_columns_load_as_categoricals(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_day(tmp_path, "us-east-1", [volume("vol-1"), volume("vol-2", "io1")])
+    write_day(tmp_path, "us-west-2", [volume("vol-3", "gp3", "available", "us-west-2")])
+    store = SnapshotStore(ACCOUNT_ID, DATE)
+    # One batch per volume, so later batches extend the first one's dictionaries.
+    store.ingest(REGIONS, chunk_size=1)
+
+    frames = list(store.iter_volume_frames())
+    assert len(frames) == 3
+    frame = pd.concat(frames, ignore_index=True)
+    for column in ("VolumeType", "State", "AvailabilityZone", "Region"):
+        assert isinstance(frame[column].dtype, pd.CategoricalDtype), column
+    assert list(frame["VolumeId"]) == ["vol-1", "vol-2", "vol-3"]
+    assert list(frame["VolumeType"]) == ["gp2", "io1", "gp3"]
+    assert list(frame["State"]) == ["in-use", "in-use", "available"]
+    assert list(frame["Region"]) == ["us-east-1", "us-east-1", "us-west-2"]
+
+
+def test_redumped_day_makes_snapshot_stale(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_day(tmp_path, "us-east-1", [volume("vol-1")])
+    store = SnapshotStore(ACCOUNT_ID, DATE)
+    assert not store.is_current(REGIONS)
+    store.ingest(REGIONS)
+    assert store.is_current(REGIONS)
+
+    write_day(tmp_path, "us-east-1", [volume("vol-1"), volume("vol-2")])
+    path = tmp_path / ACCOUNT_ID / DATE / "us-east-1" / "volumes.json"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert store.exists()
+    assert not store.is_current(REGIONS)
+
+    store.ingest(REGIONS)
+    assert store.is_current(REGIONS)
+    assert store.read_volumes()["VolumeId"].to_pylist() == ["vol-1", "vol-2"]
+
+
+def test_snapshot_without_source_json_is_current(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_day(tmp_path, "us-east-1", [volume("vol-1")])
+    store = SnapshotStore(ACCOUNT_ID, DATE)
+    store.ingest(REGIONS)
+    for file_name in ("volumes.json", "instances.json"):
+        (tmp_path / ACCOUNT_ID / DATE / "us-east-1" / file_name).unlink()
+    assert store.is_current(REGIONS)
@@ -0,0 +1,115 @@
+import pytest
+
+import throttling
+from benchmark import FakeThrottlingError
+from throttling import (
+    AdaptiveRateLimiter,
+    ThrottledError,
+    call_with_backoff,
+    get_rate_limiter,
+    is_throttling_error,
+)
+
+
+class ClientError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code, "Message": code}}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    delays = list()
+    monkeypatch.setattr(throttling.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(throttling.time, "sleep", delays.append)
+    return delays
+
+
+def flaky(errors, result="ok"):
+    errors = list(errors)
+    calls = list()
+
+    def call():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    return call, calls
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (ClientError("ThrottlingException"), True),
+        (ClientError("RequestLimitExceeded"), True),
+        (FakeThrottlingError(), True),
+        (ThrottledError(), True),
+        (ClientError("AccessDenied"), False),
+        (ValueError("boom"), False),
+    ],
+)
+def test_is_throttling_error(error, expected):
+    assert is_throttling_error(error) is expected
+
+
+def test_throttles_are_retried_with_exponential_backoff(no_sleep):
+    call, calls = flaky([ClientError("Throttling")] * 3)
+    assert call_with_backoff(call, base_delay=0.5) == "ok"
+    assert len(calls) == 4
+    assert no_sleep == [0.5, 1.0, 2.0]
+
+
+def test_throttles_slow_the_rate_limiter():
+    call, _ = flaky([ClientError("Throttling")] * 3)
+    limiter = AdaptiveRateLimiter(rate=1000, max_rate=1000, increase=0)
+    call_with_backoff(call, rate_limiter=limiter)
+    assert limiter.throttles == 3
+    assert limiter.rate == 125
+
+
+def test_backoff_delay_is_capped(no_sleep):
+    call, _ = flaky([ClientError("Throttling")] * 5)
+    call_with_backoff(call, base_delay=1.0, max_delay=3.0)
+    assert no_sleep == [1.0, 2.0, 3.0, 3.0, 3.0]
+
+
+def test_other_errors_are_not_retried():
+    call, calls = flaky([ClientError("AccessDenied")])
+    with pytest.raises(ClientError):
+        call_with_backoff(call)
+    assert len(calls) == 1
+
+
+def test_gives_up_after_max_attempts():
+    call, calls = flaky([ClientError("Throttling")] * 10)
+    with pytest.raises(ClientError):
+        call_with_backoff(call, max_attempts=3)
+    assert len(calls) == 3
+
+
+def test_rate_backs_off_multiplicatively_and_recovers_additively():
+    limiter = AdaptiveRateLimiter(rate=8.0, min_rate=1.5, max_rate=9.0, increase=0.5)
+    limiter.on_throttle()
+    assert limiter.rate == 4.0
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.rate == 1.5
+    limiter.on_success()
+    assert limiter.rate == 2.0
+    for _ in range(50):
+        limiter.on_success()
+    assert limiter.rate == 9.0
+    assert limiter.throttles == 3
+
+
+def test_success_raises_the_rate_after_a_call():
+    limiter = AdaptiveRateLimiter(rate=1000, max_rate=2000, increase=1.0)
+    call_with_backoff(lambda: None, rate_limiter=limiter)
+    assert limiter.rate == 1001
+
+
+def test_limiters_are_shared_per_account_service_and_region():
+    limiter = get_rate_limiter("test-shared", "cloudwatch", "us-east-1")
+    assert get_rate_limiter("test-shared", "cloudwatch", "us-east-1") is limiter
+    assert get_rate_limiter("test-shared", "cloudwatch", "us-west-2") is not limiter
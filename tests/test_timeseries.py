@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from timeseries import BYTES_PER_MIB, align, grid_size, series_statistics, to_series
+
+START = datetime(2024, 5, 1, tzinfo=timezone.utc)
+END = START + timedelta(hours=6)
+PERIOD = 3600
+
+
+def hours(*offsets):
+    return [START + timedelta(hours=offset) for offset in offsets]
+
+
+def test_grid_size():
+    assert grid_size(START, END, PERIOD) == 6
+    assert grid_size(START, END, 300) == 72
+    assert grid_size(END, START, PERIOD) == 0
+
+
+def test_align_places_values_in_their_buckets():
+    series = {
+        "a": to_series(hours(0, 2, 5), [1.0, 2.0, 3.0]),
+        # Datapoints outside the window are dropped.
+        "b": to_series(hours(-1, 1, 6), [9.0, 4.0, 9.0]),
+    }
+    matrix = align(series, ["a", "b", "missing"], START, END, PERIOD)
+    np.testing.assert_array_equal(
+        matrix,
+        [
+            [1.0, 0.0, 2.0, 0.0, 0.0, 3.0],
+            [0.0, 4.0, 0.0, 0.0, 0.0, 0.0],
+            [0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+        ],
+    )
+
+
+def test_align_uses_key_order():
+    series = {"a": to_series(hours(0), [1.0]), "b": to_series(hours(1), [2.0])}
+    matrix = align(series, ["b", "a"], START, END, PERIOD)
+    assert matrix[0, 1] == 2.0 and matrix[1, 0] == 1.0
+
+
+def test_align_without_keys():
+    assert align({}, [], START, END, PERIOD).shape == (0, 6)
+
+
+def test_series_statistics():
+    rng = np.random.default_rng(0)
+    iops = rng.random((3, 336)) * 4000
+    throughput = rng.random((3, 336)) * 200 * BYTES_PER_MIB
+    stats = series_statistics(["a", "b", "c"], iops, throughput)
+    assert stats.index.tolist() == ["a", "b", "c"]
+    for row, volume_id in enumerate(stats.index):
+        expected = {
+            "PeakIOPS": iops[row].max(),
+            "P95IOPS": np.percentile(iops[row], 95),
+            "P99IOPS": np.percentile(iops[row], 99),
+            "PeakThroughput": throughput[row].max() / BYTES_PER_MIB,
+            "P95Throughput": np.percentile(throughput[row], 95) / BYTES_PER_MIB,
+        }
+        for column, value in expected.items():
+            assert stats.loc[volume_id, column] == pytest.approx(value, abs=0.005)
+
+
+def test_series_statistics_of_empty_grid():
+    stats = series_statistics(["a"], np.empty((1, 0)), np.empty((1, 0)))
+    assert stats.loc["a"].tolist() == [0.0] * 5
@@ -0,0 +1,109 @@
+import random
+import threading
+import time
+
+THROTTLING_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+}
+
+
+class ThrottledError(Exception):
+    pass
+
+
+def is_throttling_error(error: Exception) -> bool:
+    if isinstance(error, ThrottledError):
+        return True
+    response = getattr(error, "response", None) or {}
+    return response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose rate backs off multiplicatively on throttling and
+    recovers additively on success (AIMD)."""
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        min_rate: float = 0.5,
+        max_rate: float = 50.0,
+        increase: float = 0.5,
+    ):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.throttles = 0
+        self._tokens = 1.0
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    max(self.rate, 1.0), self._tokens + (now - self._updated_at) * self.rate
+                )
+                self._updated_at = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+
+
+_rate_limiters = dict()
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(account_id: str, service_name: str, region: str) -> AdaptiveRateLimiter:
+    # API rate limits are enforced per account and region, so every report
+    # running against the same pair shares one limiter.
+    key = (account_id, service_name, region)
+    with _rate_limiters_lock:
+        if key not in _rate_limiters:
+            _rate_limiters[key] = AdaptiveRateLimiter()
+        return _rate_limiters[key]
+
+
+def call_with_backoff(
+    func,
+    rate_limiter: AdaptiveRateLimiter | None = None,
+    max_attempts: int = 8,
+    base_delay: float = 0.5,
+    max_delay: float = 30.0,
+):
+    for attempt in range(max_attempts):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            result = func()
+        except Exception as e:
+            if not is_throttling_error(e):
+                raise
+            if rate_limiter is not None:
+                rate_limiter.on_throttle()
+            if attempt == max_attempts - 1:
+                raise
+            delay = min(max_delay, base_delay * 2**attempt)
+            time.sleep(random.uniform(delay / 2, delay))
+            continue
+        if rate_limiter is not None:
+            rate_limiter.on_success()
+        return result
@@ -0,0 +1,140 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Combined series summed server-side with metric math, so CloudWatch returns
+# one series per volume instead of separate read and write series.
+SERIES_METRICS = {
+    "TotalIOPS": ("VolumeReadOps", "VolumeWriteOps"),
+    "TotalThroughput": ("VolumeReadBytes", "VolumeWriteBytes"),
+}
+IOPS_SERIES = "TotalIOPS"
+THROUGHPUT_SERIES = "TotalThroughput"
+STAT_COLUMNS = ["PeakIOPS", "P95IOPS", "P99IOPS", "PeakThroughput", "P95Throughput"]
+BYTES_PER_MIB = 1024 * 1024
+# A series is a pair of float arrays: epoch-second timestamps and values.
+EMPTY_SERIES = (np.empty(0), np.empty(0))
+
+
+def to_series(timestamps: list, values: list) -> tuple:
+    return (
+        np.fromiter(
+            map(datetime.timestamp, timestamps), dtype=float, count=len(timestamps)
+        ),
+        np.asarray(values, dtype=float),
+    )
+
+
+def concat_series(series: list) -> tuple:
+    if not series:
+        return EMPTY_SERIES
+    if len(series) == 1:
+        return series[0]
+    return (
+        np.concatenate([timestamps for timestamps, _ in series]),
+        np.concatenate([values for _, values in series]),
+    )
+
+
+def query_count(metric_name: str) -> int:
+    """GetMetricData queries needed for one volume's ``metric_name``."""
+    return len(SERIES_METRICS[metric_name]) + 1 if metric_name in SERIES_METRICS else 1
+
+
+def metric_queries(
+    query_id: str, volume_id: str, metric_name: str, period: int, stat: str
+) -> list:
+    """Queries for one (volume, metric) pair; only ``query_id`` returns data.
+
+    Combined series are the per-second rate ``(read + write) / PERIOD``, with
+    periods missing from either side counted as zero.
+    """
+
+    def metric_stat(name):
+        return {
+            "Metric": {
+                "Namespace": "AWS/EBS",
+                "MetricName": name,
+                "Dimensions": [{"Name": "VolumeId", "Value": volume_id}],
+            },
+            "Period": period,
+            "Stat": stat,
+        }
+
+    if metric_name not in SERIES_METRICS:
+        return [
+            {"Id": query_id, "MetricStat": metric_stat(metric_name), "ReturnData": True}
+        ]
+    parts = {
+        f"{query_id}_{index}": name
+        for index, name in enumerate(SERIES_METRICS[metric_name])
+    }
+    first = next(iter(parts))
+    return [
+        *(
+            {"Id": part_id, "MetricStat": metric_stat(name), "ReturnData": False}
+            for part_id, name in parts.items()
+        ),
+        {
+            "Id": query_id,
+            "Expression": f"({' + '.join(f'FILL({part_id}, 0)' for part_id in parts)})"
+            f" / PERIOD({first})",
+            "ReturnData": True,
+        },
+    ]
+
+
+def grid_size(start_time, end_time, period: int) -> int:
+    return max(int((end_time.timestamp() - start_time.timestamp()) // period), 0)
+
+
+def align(series: dict, keys: list, start_time, end_time, period: int) -> np.ndarray:
+    """Lay out the series of ``keys`` on the window's grid of ``period``-second
+    buckets, one row per key; buckets without a datapoint are zero.
+
+    Rows of the grid are what is cached and compared, so timestamps never
+    need to be kept once a series is aligned.
+    """
+    start = start_time.timestamp()
+    periods = grid_size(start_time, end_time, period)
+    selected = [series.get(key, EMPTY_SERIES) for key in keys]
+    timestamps, values = concat_series([EMPTY_SERIES, *selected])
+    counts = np.fromiter(
+        (len(timestamps) for timestamps, _ in selected),
+        dtype=np.int64,
+        count=len(selected),
+    )
+    rows = np.repeat(np.arange(len(keys)), counts)
+    columns = ((timestamps - start) // period).astype(np.int64)
+    in_window = (columns >= 0) & (columns < periods)
+    matrix = np.zeros((len(keys), periods))
+    matrix[rows[in_window], columns[in_window]] = values[in_window]
+    return matrix
+
+
+def series_statistics(
+    volume_ids: list, iops: np.ndarray, throughput: np.ndarray
+) -> pd.DataFrame:
+    """Peak and percentile IOPS and throughput (MiB/s) per volume, computed
+    across all volumes at once from aligned (volumes x periods) arrays.
+
+    Values are left unrounded: a few operations spread over a period are a
+    small but non-zero rate, and must not read as an idle volume.
+    """
+    if iops.shape[1] == 0:
+        iops = np.zeros((len(volume_ids), 1))
+    if throughput.shape[1] == 0:
+        throughput = np.zeros((len(volume_ids), 1))
+    iops_p95, iops_p99 = np.percentile(iops, [95, 99], axis=1)
+    throughput = throughput / BYTES_PER_MIB
+    return pd.DataFrame(
+        {
+            "PeakIOPS": iops.max(axis=1),
+            "P95IOPS": iops_p95,
+            "P99IOPS": iops_p99,
+            "PeakThroughput": throughput.max(axis=1),
+            "P95Throughput": np.percentile(throughput, 95, axis=1),
+        },
+        index=pd.Index(volume_ids, name="VolumeId"),
+    )
@@ -0,0 +1,93 @@
+import sys
+from operator import attrgetter
+
+
+class VolumeRecord:
+    """The fields of a volumes.json entry the report uses.
+
+    Tags, attachments and the other boto fields are dropped, and the
+    low-cardinality strings are interned so every volume of a region shares
+    one copy of them. Records are built from, and never write back to, the
+    source dicts. Fields can also be read as ``record["State"]``.
+    """
+
+    __slots__ = (
+        "VolumeId",
+        "Size",
+        "VolumeType",
+        "Iops",
+        "Throughput",
+        "State",
+        "CreateTime",
+        "AvailabilityZone",
+        "SnapshotId",
+        "Region",
+    )
+
+    def __init__(
+        self,
+        VolumeId: str,
+        Size: int,
+        VolumeType: str,
+        Iops: int,
+        Throughput: int,
+        State: str,
+        CreateTime: str,
+        AvailabilityZone: str,
+        SnapshotId: str,
+        Region: str,
+    ):
+        self.VolumeId = VolumeId
+        self.Size = Size
+        self.VolumeType = sys.intern(VolumeType)
+        self.Iops = Iops
+        self.Throughput = Throughput
+        self.State = sys.intern(State)
+        self.CreateTime = CreateTime
+        self.AvailabilityZone = sys.intern(AvailabilityZone)
+        self.SnapshotId = SnapshotId
+        self.Region = sys.intern(Region)
+
+    @classmethod
+    def from_volume(cls, volume: dict):
+        if isinstance(volume, cls):
+            return volume
+        return cls(
+            volume["VolumeId"],
+            int(volume["Size"]),
+            volume["VolumeType"],
+            int(volume.get("Iops") or 0),
+            int(volume.get("Throughput") or 0),
+            volume["State"],
+            str(volume["CreateTime"]),
+            volume["AvailabilityZone"],
+            volume.get("SnapshotId") or "",
+            volume.get("Region", ""),
+        )
+
+    def __getitem__(self, field: str):
+        try:
+            return getattr(self, field)
+        except AttributeError:
+            raise KeyError(field) from None
+
+    def get(self, field: str, default=None):
+        return getattr(self, field, default)
+
+    def astuple(self) -> tuple:
+        return _astuple(self)
+
+    def __repr__(self) -> str:
+        return f"VolumeRecord({self.VolumeId!r}, {self.VolumeType!r}, {self.State!r})"
+
+
+_astuple = attrgetter(*VolumeRecord.__slots__)
+
+
+def compact_volumes(volumes):
+    for volume in volumes:
+        yield VolumeRecord.from_volume(volume)
+
+
+def volume_records(volumes) -> list:
+    return list(compact_volumes(volumes))